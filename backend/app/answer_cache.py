@@ -0,0 +1,146 @@
+# backend/app/answer_cache.py
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+import hashlib
+import json
+import threading
+import time
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class MongoAnswerCacheBackend:
+    """Persistent answer cache stored in a MongoDB collection
+
+    Entries expire through a TTL index on `expires_at`, so the cache survives
+    restarts and is shared between workers.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not create answer cache TTL index: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        doc = self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        return doc["answer"] if doc else None
+
+    def set(self, key: str, answer: str, ttl_seconds: int):
+        self.collection.replace_one(
+            {"_id": key},
+            {"_id": key, "answer": answer, "expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)},
+            upsert=True
+        )
+
+class AnswerCache:
+    """In-process LRU + TTL cache for generated RAG answers
+
+    Keys combine the normalized query, the ordered retrieved chunk ids, the
+    model and the prompt version, so a changed corpus or prompt never serves a
+    stale answer. An optional backend is consulted on local misses.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: int = 3600, backend=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def make_key(self, query: str, search_results: List[Dict], model: str, prompt_version: str) -> str:
+        """Build a cache key from the query and the retrieved chunk set"""
+        chunk_ids = [
+            f"{result.get('document_id', '')}:{result.get('chunk_id', '')}"
+            for result in search_results
+        ]
+        raw = json.dumps([self.normalize_query(query), chunk_ids, model, prompt_version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                answer, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return answer
+                del self._entries[key]
+
+        if self.backend is not None:
+            try:
+                answer = self.backend.get(key)
+            except Exception as e:
+                logger.warning(f"⚠️ Answer cache backend read failed: {e}")
+                answer = None
+            if answer is not None:
+                self._store_local(key, answer)
+                with self._lock:
+                    self.hits += 1
+                return answer
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, answer: str):
+        self._store_local(key, answer)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, answer, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"⚠️ Answer cache backend write failed: {e}")
+
+    def _store_local(self, key: str, answer: str):
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return cache size and hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": self.backend is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+def create_answer_cache() -> Optional[AnswerCache]:
+    """Create the answer cache configured in settings (None when disabled)"""
+    if not settings.rag_cache_enabled:
+        return None
+
+    backend = None
+    if settings.rag_cache_persistent:
+        from app.database import db
+        backend = MongoAnswerCacheBackend(db.get_collection(settings.rag_cache_collection))
+
+    return AnswerCache(
+        max_entries=settings.rag_cache_max_entries,
+        ttl_seconds=settings.rag_cache_ttl_seconds,
+        backend=backend
+    )
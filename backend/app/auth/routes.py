@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, status, Depends
+from starlette.concurrency import run_in_threadpool
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timedelta
-from bson import ObjectId
 import logging
 import traceback
-import os
+
+from app.database import db
 
 from .schemas import UserSignup, UserLogin, Token
 from .models import User, UserInDB
@@ -20,35 +22,10 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
-# ✅ STANDALONE DATABASE CONNECTION
-def get_database():
-    """Get MongoDB database - standalone connection"""
-    from motor.motor_asyncio import AsyncIOMotorClient
-    
-    # Get settings directly
-    mongodb_url = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-    database_name = os.getenv("DATABASE_NAME", "document_search")
-    
-    logger.info(f"🔗 Connecting to MongoDB: {mongodb_url}")
-    logger.info(f"📦 Database: {database_name}")
-    try:
-        client = AsyncIOMotorClient(mongodb_url)
-        db = client[database_name]
-        return db
-    except Exception as e:
-        logger.warning(f"Failed to connect using MONGODB_URL '{mongodb_url}': {e}. Falling back to localhost.")
-        try:
-            client = AsyncIOMotorClient("mongodb://localhost:27017")
-            db = client[database_name]
-            logger.info("✅ Connected to local MongoDB at mongodb://localhost:27017")
-            return db
-        except Exception as e2:
-            logger.error(f"Could not establish any MongoDB connection: {e2}")
-            raise
-
-# Create database connection
-db = get_database()
-logger.info(f"✅ Auth routes database initialized")
+# Users live in the shared MongoDB client; the email index makes these lookups cheap
+async def find_user_by_email(email: str):
+    """Look up a user by email on the shared connection pool"""
+    return await run_in_threadpool(db.users.find_one, {"email": email})
 
 @router.post("/signup", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def signup(user_data: UserSignup):
@@ -56,11 +33,10 @@ async def signup(user_data: UserSignup):
     
     try:
         logger.info(f"📝 Signup attempt for email: {user_data.email}")
-        logger.info(f"🔍 Database object: {db}")
         
         # Check if user already exists
         logger.info("🔍 Checking if user exists...")
-        existing_user = await db.users.find_one({"email": user_data.email})
+        existing_user = await find_user_by_email(user_data.email)
         
         if existing_user:
             logger.warning(f"⚠️ Email already registered: {user_data.email}")
@@ -86,8 +62,14 @@ async def signup(user_data: UserSignup):
         }
         
         logger.info("💾 Inserting into database...")
-        # Insert into database
-        result = await db.users.insert_one(user_dict)
+        # Insert into database (the unique email index catches concurrent signups)
+        try:
+            result = await run_in_threadpool(db.users.insert_one, user_dict)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
         
         logger.info(f"✅ User created successfully with ID: {result.inserted_id}")
         
@@ -114,7 +96,7 @@ async def login(credentials: UserLogin):
         logger.info(f"🔑 Login attempt for email: {credentials.email}")
         
         # Find user by email
-        user = await db.users.find_one({"email": credentials.email})
+        user = await find_user_by_email(credentials.email)
         
         if not user:
             logger.warning(f"⚠️ User not found: {credentials.email}")
@@ -169,7 +151,7 @@ async def get_current_user(email: str = Depends(verify_token)):
     try:
         logger.info(f"👤 Fetching user data for: {email}")
         
-        user = await db.users.find_one({"email": email})
+        user = await find_user_by_email(email)
         
         if not user:
             logger.warning(f"⚠️ User not found: {email}")
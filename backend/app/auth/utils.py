@@ -14,8 +14,14 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
 
+# Comma-separated emails allowed to use debug and profiling features
+ADMIN_EMAILS = {
+    email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()
+}
+
 # Security scheme
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -82,3 +88,32 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security))
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+
+def get_optional_user_email(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> Optional[str]:
+    """Return the email of the authenticated user, or None for anonymous requests."""
+    if credentials is None:
+        return None
+    
+    try:
+        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        return payload.get("sub")
+    except JWTError:
+        return None
+
+
+def is_admin(email: Optional[str]) -> bool:
+    """Return True if the email belongs to a configured admin."""
+    return email is not None and email.lower() in ADMIN_EMAILS
+
+
+def get_admin_email(email: str = Depends(verify_token)) -> str:
+    """Require an authenticated admin."""
+    if not is_admin(email):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return email
@@ -1,7 +1,15 @@
 # backend/app/config.py
 
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from typing import Optional
+import logging
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Hosted OpenAI embedding models, named by .env files written before embeddings ran
+# locally; Sentence Transformers cannot load them
+HOSTED_EMBEDDING_MODEL_PREFIX = "text-embedding-"
 
 class Settings(BaseSettings):
     """Application configuration settings"""
@@ -10,6 +18,27 @@ class Settings(BaseSettings):
     mongodb_url: str = "mongodb://localhost:27017"  # Added default
     database_name: str = "document_search"
     collection_name: str = "document_chunks"
+    documents_collection_name: str = "documents"  # One catalog row per document
+    stats_collection_name: str = "corpus_stats"  # Incrementally maintained counters
+    users_collection_name: str = "users"
+    
+    # MongoDB Connection Pool (one shared client for search, ingestion and auth)
+    mongodb_max_pool_size: int = 50
+    mongodb_min_pool_size: int = 0
+    mongodb_max_idle_time_ms: int = 300000
+    mongodb_server_selection_timeout_ms: int = 5000
+    mongodb_connect_timeout_ms: int = 5000
+    mongodb_socket_timeout_ms: int = 0  # 0 means no socket timeout
+    mongodb_compressors: str = ""  # e.g. "zstd,snappy,zlib"
+    mongodb_ping_cache_seconds: float = 10.0  # Reuse a successful ping for readiness checks
+    
+    # Search Telemetry
+    search_events_collection: str = "search_events"
+    search_rollups_collection: str = "search_rollups"
+    search_events_buffer_size: int = 10000
+    search_events_batch_size: int = 500
+    search_events_flush_seconds: float = 2.0
+    search_events_ttl_days: int = 30  # 0 keeps events forever
     
     # OpenAI Configuration (optional if using Gemini)
     openai_api_key: Optional[str] = None  # Made optional
@@ -20,18 +49,90 @@ class Settings(BaseSettings):
     # Gemini API (your existing)
     gemini_api_key: Optional[str] = None
     
+    # Embedding Settings ("local" sentence-transformers or "fake" for offline benchmarks)
+    embedding_provider: str = "local"
+    fake_embedding_latency_ms: int = 0  # Simulated model time per encode call
+    embedding_server_url: str = ""  # "http://127.0.0.1:8100" or "unix:///path/to/socket"; empty = in-process
+    embedding_server_timeout_ms: int = 10000
+    embedding_server_retry_seconds: float = 30.0  # In-process fallback period after a server failure
+    embedding_server_fallback: bool = True  # False: fail requests instead of loading the model locally
+    embedding_batch_max_size: int = 64  # Embedding server: max texts per model call
+    embedding_batch_wait_ms: int = 5  # Embedding server: how long a batch waits for more requests
+    
+    # LLM Settings ("gemini" or "fake" for local testing without an API key)
+    llm_provider: str = "gemini"
+    llm_model: str = "models/gemini-2.5-flash"
+    fake_llm_answer: str = "This is a canned answer from the local fake LLM based on the retrieved documents."
+    fake_llm_latency_ms: int = 0  # Delay before the first token
+    fake_llm_token_delay_ms: int = 0  # Delay between streamed tokens
+    fake_llm_error_rate: float = 0.0  # Fraction of fake calls that raise
+    
+    # LLM Call Governor
+    llm_max_concurrency: int = 4
+    llm_timeout_seconds: float = 20.0
+    llm_queue_timeout_seconds: float = 2.0  # Max wait for a free LLM slot
+    llm_hedge_delay_ms: int = 0  # 0 disables hedged requests
+    llm_breaker_failure_threshold: int = 5
+    llm_breaker_reset_seconds: float = 30.0
+    
+    # RAG Answer Cache
+    rag_cache_enabled: bool = True
+    rag_cache_max_entries: int = 1000
+    rag_cache_ttl_seconds: int = 3600
+    rag_cache_persistent: bool = False  # Also store answers in MongoDB
+    rag_cache_collection: str = "rag_answer_cache"
+    
+    # RAG Context Packing
+    rag_context_token_budget: int = 2000  # Max tokens of retrieved text per prompt
+    rag_tokenizer_encoding: str = "cl100k_base"
+    
     # Application Settings
     max_file_size: int = 10485760  # 10MB
     chunk_size: int = 500
     chunk_overlap: int = 50
-    embedding_model: str = "text-embedding-3-small"
-    embedding_dimensions: int = 1536
+    content_compression: str = "none"  # Chunk text storage: "none", "zlib" or "zstd" (see app.content_compression)
+    content_dictionaries_collection: str = "content_dictionaries"  # Trained zstd dictionaries
+    content_search_terms: bool = True  # Keep compressed chunks' distinct words in plain text for the $text index
+    dedup_threshold: float = 0.7  # Shingle Jaccard similarity at which a chunk counts as a near-duplicate (0 disables)
+    dedup_shingle_size: int = 3  # Words per shingle
+    dedup_bands: int = 20  # MinHash LSH bands...
+    dedup_band_rows: int = 5  # ...of this many rows each (signature length = bands * rows)
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL  # Sentence Transformers model; change it on a live corpus with app.reembedding
+    reembed_batch_size: int = 64  # Chunks re-embedded per batch by the re-embedding job
+    reembed_max_chunks_per_second: float = 50.0  # Throttle for the re-embedding job (0 = unthrottled)
+    reembed_poll_seconds: float = 10.0  # How often API workers check the job's progress
+    reembed_switch_grace_seconds: float = 300.0  # Time workers get to switch before old embeddings are overwritten
     
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = 8000
+    warmup_on_startup: bool = False  # Load models and tokenizer before reporting ready
+    log_level: str = "INFO"
+    log_format: str = "text"  # "text" or "json"
+    log_queue_size: int = 10000  # Records beyond this are dropped rather than blocking requests
+    log_sample_rate: float = 0.01  # Fraction of per-result debug logs that are emitted
+    gzip_minimum_size: int = 1024  # Compress responses at least this many bytes (0 disables gzip)
+    metrics_enabled: bool = True  # Per-request HTTP metrics; stage histograms are always recorded
+    profile_dir: str = "profiles"  # Saved request profiles (cProfile .prof files)
+    profile_max_files: int = 50
+    profile_sample_rate: float = 0.0  # Fraction of search/upload requests profiled in the background
     
     # Search Configuration
+    vector_store_backend: str = "mongo"  # "mongo" (collection scan), "numpy" (in-memory matrix), "int8", "pca", "shared" or "sharded"
+    int8_rescore_candidates: int = 200  # "int8" backend: approximate hits rescored exactly
+    pca_dimensions: int = 96  # "pca" backend: dimensions of the first-pass projection
+    pca_rescore_candidates: int = 200  # "pca" backend: first-pass hits rescored at full dimension
+    pca_projection_path: str = ""  # Fitted projection (python -m app.pca); empty = fit at startup, not saved
+    rescore_vectors_dir: str = ""  # "int8"/"pca" backends: where float32 vectors for rescoring are mapped from; empty = temp dir
+    index_snapshot_path: str = ""  # Snapshot of the in-memory index for fast restarts; empty disables
+    index_snapshot_interval_seconds: int = 300  # Rewritten this often when the corpus changed (0: only at shutdown)
+    shared_index_dir: str = ""  # Where the "shared" backend maps its index from; empty = /dev/shm
+    search_shards: int = 4  # Local partitions searched in parallel by the "sharded" backend
+    shard_urls: str = ""  # Comma-separated remote shard instances; replaces the local partitions
+    shard_partition: str = ""  # "i/N": index only partition i of N (when serving as a remote shard)
+    shard_timeout_ms: int = 1000  # Shards slower than this are left out of the results
+    shard_token: str = ""  # Shared secret for the /shard endpoints (sent as X-Shard-Token)
+    shard_sync_interval_seconds: float = 30.0  # How often in-process indexes and remote shards catch up with MongoDB (0 disables)
     top_k_results: int = 5
     similarity_threshold: float = 0.7
     
@@ -48,6 +149,18 @@ class Settings(BaseSettings):
     # ✅ NEW: Frontend URL
     frontend_url: str = "http://localhost:3000"
     
+    @field_validator("embedding_model")
+    @classmethod
+    def _local_embedding_model(cls, value: str) -> str:
+        if value.startswith(HOSTED_EMBEDDING_MODEL_PREFIX):
+            logging.getLogger(__name__).warning(
+                f"⚠️  EMBEDDING_MODEL={value} is a hosted OpenAI model, which this version does not call; "
+                f"using {DEFAULT_EMBEDDING_MODEL}. Remove EMBEDDING_MODEL (and EMBEDDING_DIMENSIONS) from .env "
+                f"to silence this warning"
+            )
+            return DEFAULT_EMBEDDING_MODEL
+        return value
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
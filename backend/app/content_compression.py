@@ -0,0 +1,254 @@
+# backend/app/content_compression.py
+"""Compressed storage for chunk text
+
+With CONTENT_COMPRESSION set, new chunks store their text as `content_z`
+(compressed bytes) and `content_codec` instead of `content`. zstd uses the
+newest dictionary trained on the corpus when there is one, which matters for
+chunk-sized records; zlib is used when zstandard is not installed.
+Readers call `decode(chunk)`, which handles both layouts, and only do so
+for the chunks they return.
+
+The $text index cannot read compressed bytes, so with CONTENT_SEARCH_TERMS
+(the default) a compressed chunk also keeps its distinct words, lowercased,
+in `search_terms`, which the index covers next to `content`. That costs
+most of the saving on prose; without it, keyword search only sees
+plain-text chunks.
+
+Usage (from backend/):
+    python -m app.content_compression --train      # train a zstd dictionary on stored chunks
+    python -m app.content_compression --compress   # re-encode stored chunks with CONTENT_COMPRESSION
+    python -m app.content_compression --decompress # back to plain text (before turning compression off)
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+from bson import Binary
+from pymongo import DESCENDING, UpdateOne
+import argparse
+import logging
+import random
+import re
+import threading
+import zlib
+from app.config import settings
+from app.database import db, MongoDB
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is in requirements.txt
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("none", "zlib", "zstd")
+
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+# Fields a reader must project to decode a chunk's text
+CONTENT_FIELDS = {"content": 1, "content_z": 1, "content_codec": 1}
+
+_WORD = re.compile(r"\w+")
+
+def search_terms(text: str) -> str:
+    """The text's distinct lowercased words in first-seen order (enough for $text, not for phrases)"""
+    return " ".join(dict.fromkeys(_WORD.findall(text.lower())))
+
+class ContentCodec:
+    """Encodes chunk text for storage and decodes it back
+
+    `content_codec` on a chunk is "zlib", "zstd" or "zstd:<dictionary id>".
+    Dictionaries are kept forever in their own collection, since chunks
+    encoded with them may still exist; they are fetched once per process.
+    """
+
+    def __init__(self, codec: Optional[str] = None, database: Optional[MongoDB] = None):
+        codec = codec or settings.content_compression
+        if codec not in CODECS:
+            raise ValueError(f"Unknown content compression '{codec}': expected one of {', '.join(CODECS)}")
+        if codec == "zstd" and zstandard is None:
+            logger.warning("⚠️  zstandard is not installed, compressing chunk content with zlib")
+            codec = "zlib"
+        self.codec = codec
+        self.database = database or db
+        self.dictionary_id: Optional[int] = None
+        self._compressor = None
+        self._dictionaries: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+        self._local = threading.local()  # zstd (de)compressors are not thread-safe
+
+    @property
+    def dictionaries(self):
+        return self.database.get_collection(settings.content_dictionaries_collection)
+
+    def load(self):
+        """Pick up the newest trained dictionary (zstd only)"""
+        if self.codec != "none" and not settings.content_search_terms:
+            logger.warning("⚠️  Chunk content is compressed without CONTENT_SEARCH_TERMS: keyword search, "
+                           "including the search deadline fallback, will not find compressed chunks")
+        if self.codec != "zstd":
+            return
+        latest = self.dictionaries.find_one({}, sort=[("trained_at", DESCENDING)])
+        if latest is not None:
+            dictionary = self._dictionary(latest["_id"], latest)
+            self.dictionary_id = latest["_id"]
+            self._local = threading.local()
+            logger.info("✅ Content compression dictionary loaded", extra={
+                "dictionary_id": self.dictionary_id, "bytes": len(dictionary.as_bytes())
+            })
+
+    def _dictionary(self, dictionary_id: int, doc: Optional[dict] = None):
+        dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            doc = doc or self.dictionaries.find_one({"_id": dictionary_id})
+            if doc is None:
+                raise ValueError(f"Content compression dictionary {dictionary_id} is missing")
+            dictionary = zstandard.ZstdCompressionDict(bytes(doc["data"]))
+            self._dictionaries[dictionary_id] = dictionary
+        return dictionary
+
+    def _zstd_compressor(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            dictionary = self._dictionary(self.dictionary_id) if self.dictionary_id is not None else None
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+            self._local.compressor = compressor
+        return compressor
+
+    def _zstd_decompressor(self, dictionary_id: Optional[int]):
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        decompressor = decompressors.get(dictionary_id)
+        if decompressor is None:
+            dictionary = self._dictionary(dictionary_id) if dictionary_id is not None else None
+            decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+            decompressors[dictionary_id] = decompressor
+        return decompressor
+
+    def encode(self, text: str) -> dict:
+        """The fields to store for `text`"""
+        if self.codec == "none":
+            return {"content": text}
+        data = text.encode("utf-8")
+        if self.codec == "zlib":
+            fields = {"content_z": Binary(zlib.compress(data, ZLIB_LEVEL)), "content_codec": "zlib"}
+        else:
+            tag = f"zstd:{self.dictionary_id}" if self.dictionary_id is not None else "zstd"
+            fields = {"content_z": Binary(self._zstd_compressor().compress(data)), "content_codec": tag}
+        if settings.content_search_terms:
+            fields["search_terms"] = search_terms(text)
+        return fields
+
+    def encode_chunks(self, chunks: List[dict]):
+        """Replace `content` with its encoded fields on chunks about to be inserted"""
+        if self.codec == "none":
+            return
+        for chunk in chunks:
+            chunk.update(self.encode(chunk.pop("content", "")))
+
+    def decode(self, chunk: dict) -> str:
+        """A stored chunk's text, whichever way it was stored"""
+        if "content" in chunk:
+            return chunk["content"]
+        data = chunk.get("content_z")
+        if data is None:
+            return ""
+        codec = chunk.get("content_codec", "zlib")
+        if codec == "zlib":
+            return zlib.decompress(data).decode("utf-8")
+        if zstandard is None:
+            raise RuntimeError("A chunk is zstd-compressed but zstandard is not installed")
+        _, _, dictionary_id = codec.partition(":")
+        return self._zstd_decompressor(int(dictionary_id) if dictionary_id else None).decompress(data).decode("utf-8")
+
+    def train(self, samples: List[str], size: int) -> int:
+        """Train a dictionary on sample chunk texts, store it and start using it; returns its id"""
+        if zstandard is None:
+            raise RuntimeError("Training a dictionary needs zstandard")
+        dictionary = zstandard.train_dictionary(size, [text.encode("utf-8") for text in samples])
+        dictionary_id = dictionary.dict_id()
+        self.dictionaries.replace_one({"_id": dictionary_id}, {
+            "_id": dictionary_id,
+            "data": Binary(dictionary.as_bytes()),
+            "samples": len(samples),
+            "trained_at": datetime.utcnow()
+        }, upsert=True)
+        self._dictionaries[dictionary_id] = dictionary
+        self.dictionary_id = dictionary_id
+        self._local = threading.local()
+        return dictionary_id
+
+    def current_tag(self) -> Optional[str]:
+        """`content_codec` of a chunk encoded now (None when stored as plain text)"""
+        if self.codec == "none":
+            return None
+        if self.codec == "zstd" and self.dictionary_id is not None:
+            return f"zstd:{self.dictionary_id}"
+        return self.codec
+
+def sample_texts(database: MongoDB, codec: ContentCodec, count: int, seed: int = 0) -> List[str]:
+    """Up to `count` chunk texts spread over the collection"""
+    total = database.collection.estimated_document_count()
+    step = max(total // max(count, 1), 1)
+    offset = random.Random(seed).randrange(step)
+    cursor = database.collection.find({}, CONTENT_FIELDS).sort("_id", 1)
+    return [codec.decode(chunk) for index, chunk in enumerate(cursor) if index % step == offset][:count]
+
+def reencode(database: MongoDB, codec: ContentCodec, batch_size: int = 500) -> int:
+    """Re-encode every chunk not stored with the codec's current encoding; returns how many changed"""
+    tag = codec.current_tag()
+    if tag is None:
+        query = {"content": {"$exists": False}}
+    else:
+        query = {"$or": [
+            {"content_codec": {"$ne": tag}},
+            # Compressed before search terms were kept (or with them turned off since)
+            {"search_terms": {"$exists": not settings.content_search_terms}}
+        ]}
+    changed, last_id = 0, None
+    while True:
+        page = dict(query)
+        if last_id is not None:
+            page["_id"] = {"$gt": last_id}
+        batch = list(database.collection.find(page, CONTENT_FIELDS).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return changed
+        updates = []
+        for chunk in batch:
+            fields = codec.encode(codec.decode(chunk))
+            if "content" in fields:
+                unset = {"content_z": "", "content_codec": "", "search_terms": ""}
+            else:
+                unset = {"content": ""} if "search_terms" in fields else {"content": "", "search_terms": ""}
+            updates.append(UpdateOne({"_id": chunk["_id"]}, {"$set": fields, "$unset": unset}))
+        database.collection.bulk_write(updates, ordered=False)
+        changed += len(batch)
+        last_id = batch[-1]["_id"]
+
+# Global codec for chunk content
+content_codec = ContentCodec()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train", action="store_true", help="Train a zstd dictionary on stored chunks")
+    parser.add_argument("--samples", type=int, default=5000, help="Chunks to train on")
+    parser.add_argument("--dictionary-size", type=int, default=32768, help="Dictionary size in bytes")
+    parser.add_argument("--compress", action="store_true", help="Re-encode stored chunks with CONTENT_COMPRESSION")
+    parser.add_argument("--decompress", action="store_true", help="Store every chunk as plain text again")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    if not (args.train or args.compress or args.decompress):
+        parser.error("pass --train, --compress or --decompress")
+
+    codec = ContentCodec("none") if args.decompress else content_codec
+    codec.load()
+    if args.train:
+        if codec.codec != "zstd":
+            raise SystemExit("Set CONTENT_COMPRESSION=zstd (and install zstandard) to train a dictionary")
+        samples = sample_texts(db, codec, args.samples)
+        print(f"✅ Dictionary {codec.train(samples, args.dictionary_size)} trained on {len(samples)} chunks")
+    if args.compress or args.decompress:
+        print(f"✅ {reencode(db, codec, args.batch_size)} chunks re-encoded ({codec.current_tag() or 'plain text'})")
+
+if __name__ == "__main__":
+    main()
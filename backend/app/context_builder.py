@@ -0,0 +1,156 @@
+# backend/app/context_builder.py
+
+from typing import List, Dict, Optional
+import logging
+import re
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Word/punctuation pattern used when tiktoken is unavailable
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+class ContextBuilder:
+    """Pack retrieved chunks into a token-budgeted LLM context
+
+    Adjacent chunks of the same document are merged and the words they share
+    through chunk_overlap are removed, then merged passages are added in score
+    order until the token budget is spent.
+    """
+
+    def __init__(self, token_budget: int = 2000, chunk_overlap: int = 50,
+                 encoding_name: str = "cl100k_base", min_passage_tokens: int = 32):
+        self.token_budget = token_budget
+        self.chunk_overlap = chunk_overlap
+        self.encoding_name = encoding_name
+        self.min_passage_tokens = min_passage_tokens
+        self._encoding = None
+        self._encoding_failed = False
+
+    def _get_encoding(self):
+        """Lazily load the tiktoken encoding (None if unavailable)"""
+        if self._encoding is None and not self._encoding_failed:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                self._encoding_failed = True
+                logger.warning(f"⚠️ Tokenizer '{self.encoding_name}' unavailable, using word-based estimate: {e}")
+        return self._encoding
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the configured tokenizer"""
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text))
+        # Rough estimate: words and punctuation marks
+        return len(_TOKEN_PATTERN.findall(text))
+
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        """Cut text down to at most max_tokens tokens"""
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return encoding.decode(encoding.encode(text)[:max_tokens])
+        end = 0
+        for idx, match in enumerate(_TOKEN_PATTERN.finditer(text)):
+            if idx == max_tokens:
+                break
+            end = match.end()
+        return text[:end]
+
+    def _strip_overlap(self, previous: str, following: str) -> str:
+        """Remove the leading words of `following` that repeat the end of `previous`"""
+        prev_words = previous.split()
+        next_words = following.split()
+        max_k = min(self.chunk_overlap, len(prev_words), len(next_words))
+        for k in range(max_k, 0, -1):
+            if prev_words[-k:] == next_words[:k]:
+                return " ".join(next_words[k:])
+        return following
+
+    def _merge_adjacent(self, search_results: List[Dict]) -> List[Dict]:
+        """Merge runs of consecutive chunks from the same document into passages"""
+        by_document = {}
+        for result in search_results:
+            by_document.setdefault(result.get('document_id', ''), []).append(result)
+
+        passages = []
+        for chunks in by_document.values():
+            chunks.sort(key=lambda r: r.get('chunk_id', 0))
+            current = None
+            for chunk in chunks:
+                content = chunk.get('content', '')
+                score = chunk.get('similarity_score', 0.0)
+                if current is not None and chunk.get('chunk_id', 0) == current['last_chunk_id'] + 1:
+                    addition = self._strip_overlap(current['last_content'], content)
+                    if addition:
+                        current['content'] += " " + addition
+                    current['last_chunk_id'] = chunk.get('chunk_id', 0)
+                    current['last_content'] = content
+                    current['score'] = max(current['score'], score)
+                    current['chunks'] += 1
+                else:
+                    current = {
+                        'file_name': chunk.get('file_name', 'Unknown'),
+                        'content': content,
+                        'score': score,
+                        'last_chunk_id': chunk.get('chunk_id', 0),
+                        'last_content': content,
+                        'chunks': 1
+                    }
+                    passages.append(current)
+
+        passages.sort(key=lambda p: p['score'], reverse=True)
+        return passages
+
+    def build(self, search_results: List[Dict], token_budget: Optional[int] = None) -> Dict:
+        """Build the context block for a prompt
+
+        Returns a dict with the context text and usage stats: tokens used,
+        chunks used, passages, and whether any passage was truncated.
+        """
+        budget = token_budget or self.token_budget
+        passages = self._merge_adjacent(search_results)
+
+        blocks = []
+        tokens_used = 0
+        chunks_used = 0
+        truncated = False
+        separator_tokens = self.count_tokens("\n\n")
+
+        for passage in passages:
+            header = f"Document: {passage['file_name']}\n"
+            block = header + passage['content']
+            cost = self.count_tokens(block) + (separator_tokens if blocks else 0)
+            remaining = budget - tokens_used
+
+            if cost <= remaining:
+                blocks.append(block)
+                tokens_used += cost
+                chunks_used += passage['chunks']
+                continue
+
+            # Fill what is left of the budget with the start of this passage
+            room = remaining - self.count_tokens(header) - (separator_tokens if blocks else 0)
+            if room >= self.min_passage_tokens:
+                block = header + self.truncate_to_tokens(passage['content'], room)
+                blocks.append(block)
+                tokens_used += self.count_tokens(block) + (separator_tokens if len(blocks) > 1 else 0)
+                chunks_used += passage['chunks']
+                truncated = True
+
+        return {
+            "context": "\n\n".join(blocks),
+            "tokens_used": tokens_used,
+            "token_budget": budget,
+            "chunks_used": chunks_used,
+            "passages": len(blocks),
+            "truncated": truncated
+        }
+
+# Global context builder instance
+context_builder = ContextBuilder(
+    token_budget=settings.rag_context_token_budget,
+    chunk_overlap=settings.chunk_overlap,
+    encoding_name=settings.rag_tokenizer_encoding
+)
@@ -1,34 +1,120 @@
 # backend/app/database.py
 
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
 from app.config import settings
+from collections import Counter
+from datetime import datetime, timedelta
+from os.path import splitext
+from typing import Optional
+import threading
+import time
 import logging
-import numpy as np
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# _id of the counters document in the stats collection
+CORPUS_STATS_ID = "corpus"
+
+# _id of the stats document held by the worker rebuilding the catalog, and how long it holds it
+CATALOG_REBUILD_ID = "catalog_rebuild"
+CATALOG_REBUILD_LEASE = timedelta(minutes=10)
+
+# MONGODB_URL prefix for an in-memory stand-in (benchmarks and load tests; needs mongomock)
+IN_MEMORY_URL_PREFIX = "mongomock://"
+
+def file_type_of(file_name: str) -> str:
+    """File extension without the dot, used as the catalog document type"""
+    ext = splitext(file_name or '')[1].lower().lstrip('.')
+    return ext or "unknown"
+
 class MongoDB:
-    """MongoDB connection manager"""
+    """MongoDB connection manager shared by search, ingestion and auth
+    
+    The client is created on first use with the pool, timeout and compression
+    options from settings. Readiness checks reuse the last successful ping for
+    a short while instead of pinging on every call.
+    """
+    
+    def __init__(self, url: Optional[str] = None, database_name: Optional[str] = None):
+        self.url = url or settings.mongodb_url
+        self.database_name = database_name or settings.database_name
+        self._client = None
+        self._database = None
+        self._collections = {}
+        self._lock = threading.Lock()
+        self._last_ping = 0.0
+        self._indexes_ready = False
+    
+    def _client_options(self) -> dict:
+        """Connection pool, timeout and compression options"""
+        options = {
+            "maxPoolSize": settings.mongodb_max_pool_size,
+            "minPoolSize": settings.mongodb_min_pool_size,
+            "maxIdleTimeMS": settings.mongodb_max_idle_time_ms,
+            "serverSelectionTimeoutMS": settings.mongodb_server_selection_timeout_ms,
+            "connectTimeoutMS": settings.mongodb_connect_timeout_ms,
+            "socketTimeoutMS": settings.mongodb_socket_timeout_ms or None,
+            "retryWrites": True
+        }
+        if settings.mongodb_compressors:
+            options["compressors"] = settings.mongodb_compressors
+        return options
+    
+    def get_client(self) -> MongoClient:
+        """Return the shared client, creating it on first use"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    if self.url.startswith(IN_MEMORY_URL_PREFIX):
+                        import mongomock
+                        self._client = mongomock.MongoClient()
+                    else:
+                        self._client = MongoClient(self.url, **self._client_options())
+                    self._database = self._client[self.database_name]
+        return self._client
+    
+    @property
+    def client(self) -> MongoClient:
+        return self.get_client()
+    
+    @property
+    def db(self):
+        self.get_client()
+        return self._database
+    
+    def get_collection(self, name: str):
+        """Return a cached handle to a collection of the application database"""
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self.db[name]
+            self._collections[name] = collection
+        return collection
+    
+    @property
+    def collection(self):
+        return self.get_collection(settings.collection_name)
+    
+    @property
+    def documents(self):
+        return self.get_collection(settings.documents_collection_name)
+    
+    @property
+    def stats(self):
+        return self.get_collection(settings.stats_collection_name)
     
-    def __init__(self):
-        self.client = None
-        self.db = None
-        self.collection = None
+    @property
+    def users(self):
+        return self.get_collection(settings.users_collection_name)
     
     def connect(self):
-        """Establish connection to MongoDB"""
+        """Establish connection to MongoDB and prepare indexes"""
         try:
-            self.client = MongoClient(settings.mongodb_url)
-            # Test the connection
-            self.client.admin.command('ping')
-            
-            self.db = self.client[settings.database_name]
-            self.collection = self.db[settings.collection_name]
+            if not self.is_ready(max_age=0):
+                return False
             
-            # Create vector search index if not exists
             self._create_vector_index()
+            self.rebuild_document_catalog()
             
             logger.info("✅ Successfully connected to MongoDB")
             return True
@@ -37,6 +123,27 @@ class MongoDB:
             logger.error(f"❌ Failed to connect to MongoDB: {e}")
             return False
     
+    def is_ready(self, max_age: Optional[float] = None) -> bool:
+        """Return True if the database answered a ping within max_age seconds
+        
+        Creates the required indexes after the first successful ping.
+        """
+        if max_age is None:
+            max_age = settings.mongodb_ping_cache_seconds
+        if self._last_ping and time.monotonic() - self._last_ping < max_age:
+            return True
+        
+        try:
+            self.client.admin.command('ping')
+        except Exception as e:
+            logger.error(f"❌ MongoDB ping failed: {e}")
+            return False
+        
+        self._last_ping = time.monotonic()
+        if not self._indexes_ready:
+            self.ensure_indexes()
+        return True
+    
     def _create_vector_index(self):
         """Create vector search index on embedding field"""
         try:
@@ -45,10 +152,49 @@ class MongoDB:
         except Exception as e:
             logger.warning(f"⚠️ Could not create vector index: {e}")
     
+    def ensure_indexes(self):
+        """Create the indexes lookups depend on (idempotent)"""
+        try:
+            # Chunks: per-document lookups/deletes and keyword search
+            self.collection.create_index("document_id")
+            self.collection.create_index([("document_id", ASCENDING), ("chunk_id", ASCENDING)])
+            self._ensure_text_index()
+            
+            # Near-duplicate detection: candidate lookup by LSH band, canonical -> duplicates
+            self.collection.create_index("lsh_bands")
+            self.collection.create_index("duplicate_of", sparse=True)
+            
+            # Catch-ups of in-memory indexes: chunks created or promoted since a point in time
+            self.collection.create_index("created_at")
+            self.collection.create_index("promoted_at", sparse=True)
+            
+            # Document catalog
+            self.documents.create_index([("upload_date", DESCENDING)])
+            self.documents.create_index("owner")
+            
+            # Users: login and signup look up by email
+            self.users.create_index("email", unique=True)
+            
+            self._indexes_ready = True
+            logger.info("✅ MongoDB indexes ready")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not create indexes: {e}")
+    
+    def _ensure_text_index(self):
+        """One $text index over plain `content` and compressed chunks' `search_terms`"""
+        if "content_text" in self.collection.index_information():
+            # A collection may only have one text index; this one predates search_terms
+            self.collection.drop_index("content_text")
+        self.collection.create_index([("content", TEXT), ("search_terms", TEXT)])
+    
     def close(self):
         """Close MongoDB connection"""
-        if self.client:
-            self.client.close()
+        if self._client:
+            self._client.close()
+            self._client = None
+            self._database = None
+            self._collections = {}
+            self._last_ping = 0.0
             logger.info("MongoDB connection closed")
     
     def insert_chunk(self, chunk_data: dict):
@@ -69,100 +215,144 @@ class MongoDB:
             logger.error(f"Error inserting chunks: {e}")
             raise
     
-    def vector_search(self, query_embedding: list, top_k: int = 5):
-        """Perform vector similarity search using manual cosine similarity"""
+    def add_document_to_catalog(self, document_id: str, file_name: str, file_size: int,
+                                total_chunks: int, owner: Optional[str] = None,
+                                upload_date: Optional[datetime] = None):
+        """Record an uploaded document in the catalog and update the counters"""
+        file_type = file_type_of(file_name)
         try:
-            # Get all documents from database
-            all_docs = list(self.collection.find({}))
-            
-            if not all_docs:
-                logger.warning("⚠️  No documents found in database")
-                return []
-            
-            logger.info(f"🔍 Searching through {len(all_docs)} document chunks...")
-            
-            # Calculate cosine similarity manually for each document
-            results_with_scores = []
-            query_vec = np.array(query_embedding)
-            
-            for doc in all_docs:
-                if 'embedding' in doc and doc['embedding']:
-                    try:
-                        doc_vec = np.array(doc['embedding'])
-                        
-                        # Calculate cosine similarity
-                        dot_product = np.dot(query_vec, doc_vec)
-                        query_norm = np.linalg.norm(query_vec)
-                        doc_norm = np.linalg.norm(doc_vec)
-                        
-                        if query_norm > 0 and doc_norm > 0:
-                            similarity = dot_product / (query_norm * doc_norm)
-                        else:
-                            similarity = 0.0
-                        
-                        results_with_scores.append({
-                            'document_id': doc.get('document_id', ''),
-                            'file_name': doc.get('file_name', 'Unknown'),
-                            'chunk_id': doc.get('chunk_id', 0),
-                            'content': doc.get('content', ''),
-                            'metadata': doc.get('metadata', {}),
-                            'similarity_score': float(similarity),
-                            'score': float(similarity),
-                            'embedding': doc['embedding']  # Keep for later use
-                        })
-                    except Exception as e:
-                        logger.warning(f"Error processing document chunk: {e}")
-                        continue
-            
-            # Sort by similarity score (highest first)
-            results_with_scores.sort(key=lambda x: x['similarity_score'], reverse=True)
-            
-            # Return top-k results
-            top_results = results_with_scores[:top_k]
-            
-            if top_results:
-                logger.info(f"✅ Found {len(top_results)} results (top score: {top_results[0]['similarity_score']:.4f})")
-            else:
-                logger.info("⚠️  No matching results found")
-            
-            return top_results
-            
+            self.documents.insert_one({
+                "_id": document_id,
+                "file_name": file_name,
+                "file_size": file_size,
+                "file_type": file_type,
+                "total_chunks": total_chunks,
+                "owner": owner,
+                "upload_date": upload_date or datetime.utcnow()
+            })
+            self._update_counters(1, total_chunks, file_size, file_type)
         except Exception as e:
-            logger.error(f"❌ Vector search failed: {e}")
-            # Fallback: Return recent documents if search fails
-            try:
-                fallback_results = list(self.collection.find({}).limit(top_k))
-                logger.info(f"Using fallback: returning {len(fallback_results)} recent documents")
-                return fallback_results
-            except:
-                return []
+            logger.error(f"Error updating document catalog: {e}")
+            raise
     
-    def get_all_documents(self):
-        """Get list of all unique documents"""
+    def _update_counters(self, documents: int, chunks: int, size: int, file_type: str):
+        """Apply an increment (or decrement) to the corpus counters"""
+        self.stats.update_one(
+            {"_id": CORPUS_STATS_ID},
+            {"$inc": {
+                "total_documents": documents,
+                "total_chunks": chunks,
+                "total_bytes": size,
+                f"documents_by_type.{file_type}": documents,
+                "generation": 1
+            }},
+            upsert=True
+        )
+    
+    def get_corpus_stats(self) -> dict:
+        """Read the incrementally maintained corpus counters"""
+        stats = self.stats.find_one({"_id": CORPUS_STATS_ID})
+        return stats or {}
+    
+    def rebuild_document_catalog(self, force: bool = False):
+        """Backfill the catalog and counters from the chunks collection
+        
+        Runs once when the catalog is empty but chunks exist (e.g. data loaded
+        before the catalog was introduced), or on demand with force=True.
+        Workers starting together race for a lease in the stats collection;
+        only the winner rebuilds. Entries are upserted and the counters set
+        from the totals, so a rebuild cut short can simply run again.
+        """
         try:
+            if not force and (self.documents.estimated_document_count() > 0
+                              or self.collection.estimated_document_count() == 0):
+                return
+            if not self._claim_catalog_rebuild():
+                logger.info("📚 Another worker is rebuilding the document catalog")
+                return
+            if not force and self.documents.estimated_document_count() > 0:
+                # Another worker finished the rebuild before this one got the lease
+                self.stats.delete_one({"_id": CATALOG_REBUILD_ID})
+                return
+            
+            logger.info("📚 Rebuilding document catalog from chunks...")
             pipeline = [
                 {
                     "$group": {
                         "_id": "$document_id",
                         "file_name": {"$first": "$file_name"},
+                        "file_size": {"$first": "$metadata.file_size"},
                         "total_chunks": {"$sum": 1},
                         "upload_date": {"$first": "$created_at"}
                     }
-                },
-                {"$sort": {"upload_date": -1}}
+                }
             ]
             
-            results = list(self.collection.aggregate(pipeline))
-            return results
+            totals, by_type, seen = Counter(), Counter(), []
+            for doc in self.collection.aggregate(pipeline):
+                entry = {
+                    "_id": doc["_id"],
+                    "file_name": doc.get("file_name") or "",
+                    "file_size": doc.get("file_size") or 0,
+                    "file_type": file_type_of(doc.get("file_name")),
+                    "total_chunks": doc.get("total_chunks", 0),
+                    "owner": None,
+                    "upload_date": doc.get("upload_date") or datetime.utcnow()
+                }
+                self.documents.replace_one({"_id": entry["_id"]}, entry, upsert=True)
+                seen.append(entry["_id"])
+                totals.update(total_documents=1, total_chunks=entry["total_chunks"], total_bytes=entry["file_size"])
+                by_type[entry["file_type"]] += 1
+            self.documents.delete_many({"_id": {"$nin": seen}})
+            self.stats.update_one(
+                {"_id": CORPUS_STATS_ID},
+                {"$set": {
+                    "total_documents": totals["total_documents"],
+                    "total_chunks": totals["total_chunks"],
+                    "total_bytes": totals["total_bytes"],
+                    "documents_by_type": dict(by_type)
+                }, "$inc": {"generation": 1}},
+                upsert=True
+            )
+            self.stats.delete_one({"_id": CATALOG_REBUILD_ID})
+            logger.info(f"✅ Document catalog rebuilt with {len(seen)} documents")
+        except Exception as e:
+            logger.error(f"Error rebuilding document catalog: {e}")
+    
+    def _claim_catalog_rebuild(self) -> bool:
+        """Take the rebuild lease unless another worker holds an unexpired one"""
+        now = datetime.utcnow()
+        try:
+            self.stats.update_one(
+                {"_id": CATALOG_REBUILD_ID, "lease_until": {"$lt": now}},
+                {"$set": {"lease_until": now + CATALOG_REBUILD_LEASE, "started_at": now}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+    
+    def get_all_documents(self):
+        """Get list of all documents from the catalog"""
+        try:
+            return list(self.documents.find({}).sort("upload_date", DESCENDING))
             
         except Exception as e:
             logger.error(f"Error fetching documents: {e}")
             return []
     
     def delete_document(self, document_id: str):
-        """Delete all chunks of a document"""
+        """Delete all chunks of a document and its catalog entry"""
         try:
             result = self.collection.delete_many({"document_id": document_id})
+            catalog_entry = self.documents.find_one_and_delete({"_id": document_id})
+            if catalog_entry:
+                self._update_counters(
+                    -1,
+                    -catalog_entry.get("total_chunks", 0),
+                    -catalog_entry.get("file_size", 0),
+                    catalog_entry.get("file_type", "unknown")
+                )
             return result.deleted_count
         except Exception as e:
             logger.error(f"Error deleting document: {e}")
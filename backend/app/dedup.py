@@ -0,0 +1,262 @@
+# backend/app/dedup.py
+"""Near-duplicate chunk detection at ingest (MinHash LSH over word shingles)
+
+Canonical chunks carry `lsh_bands`, one hash per band of their MinHash
+signature, in a multikey index. A new chunk whose bands collide with a
+stored chunk's (or an earlier chunk's of the same upload) is compared with
+it on exact shingle Jaccard similarity. Past the threshold it is stored with
+`duplicate_of` pointing at the canonical chunk and no embedding, so it is
+neither embedded nor indexed.
+
+Backfill bands for chunks stored before deduplication (from backend/):
+    python -m app.dedup --backfill
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+import argparse
+import hashlib
+import logging
+import re
+import zlib
+import numpy as np
+from app.config import settings
+from app.content_compression import CONTENT_FIELDS, content_codec
+from app.database import db, MongoDB
+from app.metrics import duplicate_chunks
+
+logger = logging.getLogger(__name__)
+
+# Universal hashing modulo a prime just below 2**32; a, b < 2**31 keep a*x + b inside uint64
+_PRIME = np.uint64(4294967291)
+
+# Candidates verified per chunk (boilerplate can collide with many chunks)
+MAX_CANDIDATES = 50
+
+_WORD = re.compile(r"\w+")
+
+# Vector fields a promoted duplicate inherits (the next_* ones exist during a model switch, see app.reembedding)
+VECTOR_FIELDS = ("embedding", "embedding_model", "next_embedding", "next_embedding_model")
+
+def shingles(text: str, size: int) -> set:
+    """crc32 hashes of the text's lowercased word `size`-grams"""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class NearDuplicateDetector:
+    """Marks chunks that nearly repeat an already stored chunk
+
+    With b bands of r rows, chunks at Jaccard similarity s share a band with
+    probability 1 - (1 - s**r)**b: with the defaults (20 x 5), 97% of pairs
+    at 0.7 and 99.9% at 0.8. Candidates are then verified exactly.
+    """
+
+    def __init__(self, database: Optional[MongoDB] = None, threshold: Optional[float] = None,
+                 bands: Optional[int] = None, rows: Optional[int] = None,
+                 shingle_size: Optional[int] = None, seed: int = 1):
+        self.database = database or db
+        self.threshold = settings.dedup_threshold if threshold is None else threshold
+        self.bands = bands or settings.dedup_bands
+        self.rows = rows or settings.dedup_band_rows
+        self.shingle_size = shingle_size or settings.dedup_shingle_size
+        rng = np.random.default_rng(seed)
+        permutations = self.bands * self.rows
+        self._a = rng.integers(1, 2 ** 31, permutations, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 31, permutations, dtype=np.uint64)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def signature(self, shingle_hashes: set) -> np.ndarray:
+        hashes = np.fromiter(shingle_hashes, dtype=np.uint64, count=len(shingle_hashes))
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def band_keys(self, shingle_hashes: set) -> List[int]:
+        """One signed 64-bit key per band, salted with the band number so bands never collide"""
+        if not shingle_hashes:
+            return []
+        rows = self.signature(shingle_hashes).reshape(self.bands, self.rows)
+        return [
+            int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8, salt=index.to_bytes(2, "little")).digest(),
+                           "little", signed=True)
+            for index, band in enumerate(rows)
+        ]
+
+    def mark(self, chunks: List[dict]) -> int:
+        """Set `_id` and either `lsh_bands` or `duplicate_of` on each chunk; returns the duplicates found
+
+        Chunks of one upload are checked against each other as well as against
+        the stored corpus.
+        """
+        if not self.enabled:
+            return 0
+        pending = []  # (chunk, shingles, band keys) of this upload's canonical chunks
+        duplicates = 0
+        for chunk in chunks:
+            chunk.setdefault("_id", ObjectId())
+            chunk_shingles = shingles(chunk.get("content", ""), self.shingle_size)
+            keys = self.band_keys(chunk_shingles)
+            canonical = self._match_pending(chunk_shingles, keys, pending) or self._match_stored(chunk_shingles, keys)
+            if canonical is None:
+                chunk["lsh_bands"] = keys
+                pending.append((chunk, chunk_shingles, set(keys)))
+            else:
+                chunk["duplicate_of"] = canonical
+                duplicates += 1
+        if duplicates:
+            duplicate_chunks.inc(amount=duplicates)
+        return duplicates
+
+    def _match_pending(self, chunk_shingles: set, keys: List[int], pending: list) -> Optional[ObjectId]:
+        for candidate, candidate_shingles, candidate_keys in pending:
+            if candidate_keys.intersection(keys) and jaccard(chunk_shingles, candidate_shingles) >= self.threshold:
+                return candidate["_id"]
+        return None
+
+    def _match_stored(self, chunk_shingles: set, keys: List[int]) -> Optional[ObjectId]:
+        if not keys:
+            return None
+        cursor = self.database.collection.find(
+            {"lsh_bands": {"$in": keys}}, CONTENT_FIELDS
+        ).limit(MAX_CANDIDATES)
+        best, best_similarity = None, self.threshold
+        for candidate in cursor:
+            similarity = jaccard(chunk_shingles, shingles(content_codec.decode(candidate), self.shingle_size))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate["_id"], similarity
+        return best
+
+    def canonical_ids(self, document_id: str) -> list:
+        """Ids of a document's canonical chunks (the ones duplicates can point at)"""
+        return [chunk["_id"] for chunk in self.database.collection.find(
+            {"document_id": document_id, "lsh_bands": {"$exists": True}}, {"_id": 1}
+        )]
+
+    def promote_duplicates(self, document_id: str) -> List[dict]:
+        """Keep other documents' duplicates searchable before a document is deleted
+
+        For each of the document's chunks that other documents' chunks point
+        at, the first such duplicate takes over its embedding and bands and
+        becomes canonical; the rest are pointed at it. Returns the promoted
+        chunks, which the vector store must index.
+        """
+        collection = self.database.collection
+        canonical_ids = self.canonical_ids(document_id)
+        if not canonical_ids:
+            return []
+        heirs = {}
+        for duplicate in collection.find(
+            {"duplicate_of": {"$in": canonical_ids}, "document_id": {"$ne": document_id}},
+            {"duplicate_of": 1}
+        ).sort("_id", 1):
+            heirs.setdefault(duplicate["duplicate_of"], duplicate["_id"])
+        if not heirs:
+            return []
+
+        now = datetime.utcnow()
+        inherited = {field: 1 for field in ("lsh_bands",) + VECTOR_FIELDS}
+        for canonical in collection.find({"_id": {"$in": list(heirs)}}, inherited):
+            heir = heirs[canonical["_id"]]
+            update = {"$set": {"lsh_bands": canonical.get("lsh_bands", []), "promoted_at": now},
+                      "$unset": {"duplicate_of": ""}}
+            for field in VECTOR_FIELDS:
+                if canonical.get(field):
+                    update["$set"][field] = canonical[field]
+            collection.update_one({"_id": heir}, update)
+            collection.update_many({"duplicate_of": canonical["_id"], "_id": {"$ne": heir}},
+                                   {"$set": {"duplicate_of": heir}})
+        promoted = list(collection.find(
+            {"_id": {"$in": list(heirs.values())}},
+            {"embedding": 1, "next_embedding": 1, "document_id": 1, "file_name": 1}
+        ))
+        logger.info("♻️  Promoted duplicates of a deleted document", extra={
+            "document_id": document_id, "promoted": len(promoted)
+        })
+        return promoted
+
+    def dangling(self, canonical_ids: list) -> List[dict]:
+        """Stored duplicates of any of `canonical_ids` whose canonical chunk no longer exists
+
+        An upload links its duplicates before it embeds and inserts them, so a
+        document deleted in between can miss them in promote_duplicates. Both
+        sides check afterwards: the upload for the canonicals it linked to, the
+        delete for the chunks it removed. Returned with decoded `content`, to be
+        embedded and passed to restore().
+        """
+        if not canonical_ids:
+            return []
+        collection = self.database.collection
+        existing = {chunk["_id"] for chunk in collection.find({"_id": {"$in": canonical_ids}}, {"_id": 1})}
+        missing = [chunk_id for chunk_id in canonical_ids if chunk_id not in existing]
+        if not missing:
+            return []
+        chunks = list(collection.find(
+            {"duplicate_of": {"$in": missing}},
+            {"document_id": 1, "file_name": 1, **CONTENT_FIELDS}
+        ))
+        for chunk in chunks:
+            chunk["content"] = content_codec.decode(chunk)
+        return chunks
+
+    def restore(self, chunks: List[dict]) -> int:
+        """Make embedded dangling duplicates canonical: store their bands and vectors, drop `duplicate_of`"""
+        if not chunks:
+            return 0
+        now = datetime.utcnow()
+        updates = []
+        for chunk in chunks:
+            update = {"lsh_bands": self.band_keys(shingles(chunk["content"], self.shingle_size)), "promoted_at": now}
+            update.update({field: chunk[field] for field in VECTOR_FIELDS if chunk.get(field)})
+            updates.append(UpdateOne({"_id": chunk["_id"], "duplicate_of": {"$exists": True}},
+                                     {"$set": update, "$unset": {"duplicate_of": ""}}))
+        self.database.collection.bulk_write(updates, ordered=False)
+        logger.info("♻️  Restored duplicates whose canonical chunk was deleted", extra={"restored": len(chunks)})
+        return len(chunks)
+
+    def backfill(self, batch_size: int = 1000) -> int:
+        """Compute bands for canonical chunks stored before deduplication existed"""
+        collection = self.database.collection
+        cursor = collection.find(
+            {"lsh_bands": {"$exists": False}, "duplicate_of": {"$exists": False}}, CONTENT_FIELDS
+        )
+        updated, batch = 0, []
+        for chunk in cursor:
+            keys = self.band_keys(shingles(content_codec.decode(chunk), self.shingle_size))
+            batch.append((chunk["_id"], keys))
+            if len(batch) >= batch_size:
+                updated += self._write_bands(batch)
+                batch = []
+        if batch:
+            updated += self._write_bands(batch)
+        return updated
+
+    def _write_bands(self, batch: list) -> int:
+        self.database.collection.bulk_write(
+            [UpdateOne({"_id": chunk_id}, {"$set": {"lsh_bands": keys}}) for chunk_id, keys in batch],
+            ordered=False
+        )
+        return len(batch)
+
+# Global detector for the upload pipeline
+duplicate_detector = NearDuplicateDetector()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true", help="Compute LSH bands for chunks that have none")
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.error("nothing to do (pass --backfill)")
+    print(f"✅ Bands written for {duplicate_detector.backfill()} chunks")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,11 @@
 # backend/app/document_processor.py
 
-import PyPDF2
-import docx
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 import re
 from pathlib import Path
+from app.request_trace import RequestTrace
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DocumentProcessor:
@@ -38,6 +36,7 @@ class DocumentProcessor:
         """Extract text from PDF"""
         text = ""
         try:
+            import PyPDF2
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 for page_num, page in enumerate(pdf_reader.pages):
@@ -45,7 +44,7 @@ class DocumentProcessor:
                     if page_text:
                         text += f"\n--- Page {page_num + 1} ---\n{page_text}"
             
-            logger.info(f"✅ Extracted {len(text)} characters from PDF")
+            logger.info("✅ Extracted text", extra={"format": "pdf", "characters": len(text)})
             return text
             
         except Exception as e:
@@ -55,10 +54,11 @@ class DocumentProcessor:
     def _extract_from_docx(self, file_path: str) -> str:
         """Extract text from DOCX"""
         try:
+            import docx
             doc = docx.Document(file_path)
             text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
             
-            logger.info(f"✅ Extracted {len(text)} characters from DOCX")
+            logger.info("✅ Extracted text", extra={"format": "docx", "characters": len(text)})
             return text
             
         except Exception as e:
@@ -71,7 +71,7 @@ class DocumentProcessor:
             with open(file_path, 'r', encoding='utf-8') as file:
                 text = file.read()
             
-            logger.info(f"✅ Extracted {len(text)} characters from TXT")
+            logger.info("✅ Extracted text", extra={"format": "txt", "characters": len(text)})
             return text
             
         except Exception as e:
@@ -132,20 +132,26 @@ class DocumentProcessor:
                 "word_count": current_size
             })
         
-        logger.info(f"✅ Created {len(chunks)} chunks from document")
+        logger.info("✅ Chunked document", extra={"chunks": len(chunks)})
         return chunks
     
-    def process_document(self, file_path: str, file_type: str) -> List[Dict[str, any]]:
+    def process_document(self, file_path: str, file_type: str,
+                         trace: Optional[RequestTrace] = None) -> List[Dict[str, any]]:
         """Complete document processing pipeline"""
         try:
+            if trace is None:
+                trace = RequestTrace(pipeline="upload")
+            
             # Extract text
-            text = self.extract_text(file_path, file_type)
+            with trace.stage("extraction"):
+                text = self.extract_text(file_path, file_type)
             
             if not text or len(text.strip()) < 10:
                 raise ValueError("Extracted text is too short or empty")
             
             # Chunk text
-            chunks = self.chunk_text(text)
+            with trace.stage("chunking"):
+                chunks = self.chunk_text(text)
             
             return chunks
             
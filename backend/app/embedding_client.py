@@ -0,0 +1,81 @@
+# backend/app/embedding_client.py
+
+from typing import List, Optional
+from urllib.parse import urlparse
+import http.client
+import socket
+import threading
+import numpy as np
+from app.responses import dumps
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket"""
+
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class EmbeddingServerError(Exception):
+    """The embedding server could not be reached or answered with an error"""
+
+class EmbeddingServerClient:
+    """Client for app.embedding_server with one keep-alive connection per thread
+
+    `url` is "http://host:port" or "unix:///path/to/socket".
+    """
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+        parsed = urlparse(url)
+        if parsed.scheme == "unix":
+            self._connect = lambda: _UnixHTTPConnection(parsed.path, timeout)
+        elif parsed.scheme == "http":
+            self._connect = lambda: http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=timeout)
+        else:
+            raise ValueError(f"Unsupported embedding server URL '{url}': use http:// or unix://")
+        self._local = threading.local()
+
+    def _request(self, method: str, path: str, body: bytes = None) -> http.client.HTTPResponse:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        # A kept-alive connection may have been closed by the server; retry once on a fresh one
+        for attempt in (0, 1):
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = self._local.connection = self._connect()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.body = response.read()
+                return response
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                self._local.connection = None
+                if attempt or not isinstance(e, (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)):
+                    raise EmbeddingServerError(f"Embedding server {self.url} unreachable: {e}") from e
+
+    def embed(self, texts: List[str], model: Optional[str] = None) -> np.ndarray:
+        """Embed texts on the server; returns a float32 matrix with one row per text
+
+        With `model` given, vectors from a server running another model are
+        refused rather than mixed into an index built with `model`.
+        """
+        response = self._request("POST", "/embed", dumps({"texts": texts}))
+        if response.status != 200:
+            raise EmbeddingServerError(f"Embedding server returned {response.status}: {response.body[:200]!r}")
+        served = response.getheader("X-Embedding-Model")
+        if model is not None and served != model:
+            raise EmbeddingServerError(f"Embedding server runs model {served!r}, expected {model!r}")
+        dimensions = int(response.getheader("X-Embedding-Dimensions"))
+        return np.frombuffer(response.body, dtype=np.float32).reshape(len(texts), dimensions)
+
+    def health(self) -> bool:
+        try:
+            return self._request("GET", "/health").status == 200
+        except EmbeddingServerError:
+            return False
@@ -0,0 +1,164 @@
+# backend/app/embedding_server.py
+"""Standalone embedding server shared by the API workers on a host
+
+Owns the only copy of the embedding model and batches concurrent requests
+into single encode calls. Point the API at it with EMBEDDING_SERVER_URL.
+
+Usage (from backend/):
+    python -m app.embedding_server --port 8100
+    python -m app.embedding_server --uds /tmp/embedding.sock
+"""
+
+from typing import List
+from fastapi import FastAPI, Response
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+import argparse
+import asyncio
+import logging
+import time
+import numpy as np
+
+from app.config import settings
+from app.logging_config import configure_logging
+
+configure_logging()
+
+from app.embedding_service import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+class EmbedRequest(BaseModel):
+    texts: List[str] = Field(min_length=1)
+
+class DynamicBatcher:
+    """Coalesces concurrent embed requests into one model call
+
+    The first waiting request opens a batch. Requests that arrive within
+    `max_wait_ms`, or while the previous batch is still encoding, join it,
+    up to `max_batch_size` texts.
+    """
+
+    def __init__(self, encode, max_batch_size: int, max_wait_ms: int):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.texts = 0
+        self.encode_seconds = 0.0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            start = time.perf_counter()
+            try:
+                vectors = np.asarray(await run_in_threadpool(self.encode, texts), dtype=np.float32)
+            except Exception as e:
+                logger.error(f"❌ Embedding batch failed: {e}", exc_info=True)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.encode_seconds += time.perf_counter() - start
+            self.batches += 1
+            self.texts += len(texts)
+
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
+
+# Always runs the model in this process, whatever EMBEDDING_SERVER_URL says
+embedding_service = EmbeddingService(use_server=False)
+batcher = DynamicBatcher(
+    lambda texts: embedding_service.model.encode(texts),
+    max_batch_size=settings.embedding_batch_max_size,
+    max_wait_ms=settings.embedding_batch_wait_ms
+)
+
+app = FastAPI(title="Embedding Server", version="1.0.0")
+
+@app.on_event("startup")
+async def startup_event():
+    await run_in_threadpool(embedding_service.warm_up)
+    batcher.start()
+    logger.info("✅ Embedding server ready", extra=embedding_service.get_embedding_info())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await batcher.stop()
+
+@app.post("/embed")
+async def embed(request: EmbedRequest):
+    """Embeddings as raw little-endian float32 rows, one per input text"""
+    vectors = await batcher.embed(request.texts)
+    info = embedding_service.get_embedding_info()
+    return Response(
+        content=np.ascontiguousarray(vectors, dtype="<f4").tobytes(),
+        media_type="application/octet-stream",
+        headers={"X-Embedding-Dimensions": str(vectors.shape[1]), "X-Embedding-Model": info["model"]}
+    )
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy", "model": embedding_service.get_embedding_info()}
+
+@app.get("/stats")
+async def stats():
+    return batcher.stats()
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--uds", help="Listen on this Unix socket instead of host:port")
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, uds=args.uds, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,52 @@
 # backend/app/embedding_service.py
 
-from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Optional
 import logging
+import time
+from app.config import settings
+from app.embedding_client import EmbeddingServerClient, EmbeddingServerError
+from app.metrics import embedding_fallbacks
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class EmbeddingService:
-    """Generate embeddings using local Sentence Transformers (FREE - No API key needed)"""
+    """Generate embeddings using local Sentence Transformers (FREE - No API key needed)
     
-    def __init__(self):
+    With EMBEDDING_SERVER_URL set, texts are sent to the shared embedding
+    server (app.embedding_server) and the model is only loaded in-process
+    if the server fails, after which the server is retried every
+    EMBEDDING_SERVER_RETRY_SECONDS.
+    
+    `model_name` defaults to EMBEDDING_MODEL; app.reembedding switches the
+    API's service to another model during a live model upgrade.
+    """
+    
+    def __init__(self, use_server: bool = True, model_name: Optional[str] = None):
         # Defer heavy model load until first use to speed up API startup
+        self.model_name = model_name or settings.embedding_model
         self.model = None
         self.dimensions = None
+        self.server = None
+        self._server_down_until = 0.0
+        if use_server and settings.embedding_server_url:
+            self.server = EmbeddingServerClient(
+                settings.embedding_server_url, timeout=settings.embedding_server_timeout_ms / 1000
+            )
         logger.info("EmbeddingService initialized (model load deferred)")
 
     def _ensure_model_loaded(self):
         if self.model is None:
-            logger.info("Loading local embedding model on first use...")
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            if settings.embedding_provider == "fake":
+                from app.fake_embedder import FakeSentenceTransformer
+                self.model = FakeSentenceTransformer(latency_ms=settings.fake_embedding_latency_ms,
+                                                     model_name=self.model_name)
+                self.dimensions = self.model.dimensions
+                logger.info("🧪 Using deterministic fake embedder")
+                return
+            
+            logger.info(f"Loading local embedding model {self.model_name} on first use...")
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.model_name)
             # set dimensions after model is loaded
             try:
                 sample = self.model.encode("test")
@@ -28,20 +55,45 @@ class EmbeddingService:
                 self.dimensions = 384
             logger.info("✅ Local embedding model loaded successfully!")
     
+    def warm_up(self):
+        """Load the model ahead of the first request, unless the embedding server is up"""
+        if self.server is not None and self.server.health():
+            return
+        self._ensure_model_loaded()
+    
+    def _encode(self, texts):
+        """Embed on the embedding server when one is configured and up, else in-process"""
+        if self.server is not None and time.monotonic() >= self._server_down_until:
+            try:
+                vectors = self.server.embed(texts if isinstance(texts, list) else [texts], model=self.model_name)
+                self.dimensions = vectors.shape[1]
+                return vectors if isinstance(texts, list) else vectors[0]
+            except EmbeddingServerError as e:
+                if not settings.embedding_server_fallback:
+                    raise
+                embedding_fallbacks.inc()
+                self._server_down_until = time.monotonic() + settings.embedding_server_retry_seconds
+                logger.warning("⚠️  Embedding server failed, using the in-process model", extra={"error": str(e)})
+        
+        self._ensure_model_loaded()
+        return self.model.encode(texts)
+    
+    def switch_model(self, other: "EmbeddingService"):
+        """Embed with `other`'s model from now on (its model is reused, not reloaded)"""
+        self.model, self.dimensions, self.model_name = other.model, other.dimensions, other.model_name
+        logger.info("🔁 Embedding model switched", extra={"model": self.model_name})
+    
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
         try:
-            # lazy-load model if required
-            self._ensure_model_loaded()
-
             text = text.replace("\n", " ").strip()
             
             if len(text) == 0:
                 raise ValueError("Text is empty")
             
-            embedding = self.model.encode(text)
+            embedding = self._encode(text)
             
-            logger.info(f"✅ Generated embedding of dimension {len(embedding)}")
+            logger.debug("✅ Generated embedding", extra={"dimensions": len(embedding)})
             return embedding.tolist()
             
         except Exception as e:
@@ -51,18 +103,15 @@ class EmbeddingService:
     def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for multiple texts"""
         try:
-            # lazy-load model if required
-            self._ensure_model_loaded()
-
             cleaned_texts = [text.replace("\n", " ").strip() for text in texts]
             cleaned_texts = [text for text in cleaned_texts if text]
             
             if not cleaned_texts:
                 raise ValueError("No valid texts to embed")
             
-            embeddings = self.model.encode(cleaned_texts)
+            embeddings = self._encode(cleaned_texts)
             
-            logger.info(f"✅ Generated {len(embeddings)} embeddings in batch")
+            logger.debug("✅ Generated embeddings in batch", extra={"count": len(embeddings)})
             return [emb.tolist() for emb in embeddings]
             
         except Exception as e:
@@ -71,12 +120,14 @@ class EmbeddingService:
     
     def get_embedding_info(self) -> dict:
         """Get information about the embedding model"""
+        fake = settings.embedding_provider == "fake"
         return {
-            "model": "all-MiniLM-L6-v2",
+            "model": self.model_name,
             "dimensions": self.dimensions or 384,
             "type": "local",
-            "provider": "sentence-transformers",
-            "loaded": bool(self.model is not None)
+            "provider": "fake" if fake else "sentence-transformers",
+            "loaded": bool(self.model is not None),
+            "server": settings.embedding_server_url if self.server is not None else None
         }
 
 # Global embedding service instance (won't load model until used)
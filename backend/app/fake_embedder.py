@@ -0,0 +1,51 @@
+# backend/app/fake_embedder.py
+
+from typing import Dict, List, Tuple, Union
+import hashlib
+import re
+import time
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+class FakeSentenceTransformer:
+    """Deterministic offline stand-in for SentenceTransformer
+
+    Each word is hashed to a signed dimension (feature hashing), so texts that
+    share words get similar vectors and the same text always gets the same
+    vector. No model download, no torch, identical results on every machine.
+    Each `model_name` hashes words differently, so switching the configured
+    model behaves like switching to a genuinely different model.
+    """
+
+    def __init__(self, dimensions: int = 384, latency_ms: int = 0, model_name: str = ""):
+        self.dimensions = dimensions
+        self.latency = latency_ms / 1000
+        self._salt = hashlib.blake2b(model_name.encode("utf-8"), digest_size=16).digest()
+        self._features: Dict[str, Tuple[int, float]] = {}
+
+    def _feature(self, word: str) -> Tuple[int, float]:
+        feature = self._features.get(word)
+        if feature is None:
+            digest = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8, salt=self._salt).digest(), "little")
+            feature = (digest % self.dimensions, 1.0 if digest >> 63 else -1.0)
+            self._features[word] = feature
+        return feature
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            index, sign = self._feature(word)
+            vector[index] += sign
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def encode(self, sentences: Union[str, List[str]]) -> np.ndarray:
+        """Embed one text (1-D array) or a list of texts (2-D array)"""
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(sentences, str):
+            return self._embed(sentences)
+        if not sentences:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return np.stack([self._embed(text) for text in sentences])
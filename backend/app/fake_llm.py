@@ -0,0 +1,69 @@
+# backend/app/fake_llm.py
+
+import random
+import time
+from typing import Iterator, List, Optional
+from app.config import settings
+
+class FakeChunk:
+    """A single piece of generated text, shaped like a Gemini response chunk"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeStream:
+    """Iterable streaming response that can be cancelled mid-way"""
+
+    def __init__(self, tokens: List[str], token_delay: float):
+        self._tokens = tokens
+        self._token_delay = token_delay
+        self.cancelled = False
+        self.tokens_sent = 0
+
+    def __iter__(self) -> Iterator[FakeChunk]:
+        for token in self._tokens:
+            if self.cancelled:
+                return
+            if self._token_delay:
+                time.sleep(self._token_delay)
+            self.tokens_sent += 1
+            yield FakeChunk(token)
+
+    def cancel(self):
+        """Stop producing tokens (mirrors cancelling an upstream stream)"""
+        self.cancelled = True
+
+class FakeGenerativeModel:
+    """Local stand-in for google.generativeai.GenerativeModel
+
+    Returns a canned answer, either in one piece or as a stream of word tokens,
+    so RAG and streaming code paths can be exercised without an API key.
+    Latency and a random error rate can be injected to simulate a struggling
+    provider.
+    """
+
+    def __init__(self, answer: Optional[str] = None, latency_ms: Optional[int] = None,
+                 token_delay_ms: Optional[int] = None, error_rate: Optional[float] = None):
+        self.answer = answer if answer is not None else settings.fake_llm_answer
+        self.latency = (settings.fake_llm_latency_ms if latency_ms is None else latency_ms) / 1000
+        self.token_delay = (settings.fake_llm_token_delay_ms if token_delay_ms is None else token_delay_ms) / 1000
+        self.error_rate = settings.fake_llm_error_rate if error_rate is None else error_rate
+        self.calls = 0
+        self.last_stream: Optional[FakeStream] = None
+
+    def _tokens(self) -> List[str]:
+        words = self.answer.split(" ")
+        return [word if idx == 0 else " " + word for idx, word in enumerate(words)]
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        """Generate the canned answer, optionally as a token stream"""
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("Injected fake LLM failure")
+
+        if stream:
+            self.last_stream = FakeStream(self._tokens(), self.token_delay)
+            return self.last_stream
+        return FakeChunk(self.answer)
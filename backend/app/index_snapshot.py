@@ -0,0 +1,198 @@
+# backend/app/index_snapshot.py
+
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import json
+import logging
+import os
+import time
+import numpy as np
+from app.config import settings
+from app.database import db, MongoDB
+from app.embedding_service import EmbeddingService, embedding_service
+from app.vector_store import VectorStore, FileLock, vector_store
+
+logger = logging.getLogger(__name__)
+
+# 2: the header records synced_at, from which a restore replays
+FORMAT_VERSION = 2
+
+def write_snapshot(path: str, store: VectorStore, generation: int, model: str):
+    """Write the store's index to `path` atomically
+
+    The file is an uncompressed .npz: a JSON header (format version, corpus
+    generation, creation time, the store's synced_at, engine, embedding model)
+    plus the normalized float32 vectors and the chunk id, document id and
+    file name of every row.
+    """
+    created_at = datetime.utcnow()
+    matrix, ids, document_ids, file_names = store.export_state()
+    header = {
+        "format_version": FORMAT_VERSION,
+        "generation": generation,
+        "created_at": created_at.isoformat(),
+        # Chunks created after this may be missing: this process only saw its own uploads since
+        "synced_at": (store.synced_at or created_at).isoformat(),
+        "engine": store.name,
+        "embedding_model": model,
+        "vectors": len(ids),
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(
+        tmp_path,
+        header=np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8),
+        vectors=np.ascontiguousarray(matrix, dtype=np.float32),
+        ids=np.array([str(row_id) for row_id in ids], dtype=str),
+        document_ids=np.array(document_ids, dtype=str),
+        file_names=np.array(file_names, dtype=str)
+    )
+    os.replace(tmp_path, path)
+
+def read_header(path: str) -> Optional[dict]:
+    """The snapshot's header, or None if there is no readable snapshot of this format version"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes())
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"⚠️  Ignoring unreadable index snapshot {path}: {e}")
+        return None
+    if header.get("format_version") != FORMAT_VERSION:
+        logger.warning(f"⚠️  Ignoring index snapshot {path}: format version {header.get('format_version')}")
+        return None
+    return header
+
+def restore(path: str, store: VectorStore, model: str, database: Optional[MongoDB] = None) -> Optional[dict]:
+    """Load a snapshot into the store and catch it up with the database
+
+    Documents no longer in the catalog are dropped, and chunks created (or
+    promoted from duplicates) since the snapshot's synced_at are replayed.
+    The corpus generation alone cannot tell whether that is needed: a worker
+    only indexes its own uploads, so its snapshot can carry the latest
+    generation and still lack other workers' chunks. Returns what was done,
+    or None without a usable snapshot (including one of vectors from another
+    embedding model than `model`).
+    """
+    database = database or db
+    header = read_header(path)
+    if header is None:
+        return None
+    if header.get("embedding_model") != model:
+        logger.info("Index snapshot is from another embedding model, rebuilding",
+                    extra={"snapshot_model": header.get("embedding_model"), "model": model})
+        return None
+
+    # Drop documents deleted since the snapshot before building the index
+    live_documents = [doc["_id"] for doc in database.documents.find({}, {"_id": 1})]
+    with np.load(path) as data:
+        document_ids = data["document_ids"]
+        keep = np.isin(document_ids, live_documents) if len(document_ids) else np.zeros(0, dtype=bool)
+        ids = [ObjectId(row_id) if ObjectId.is_valid(row_id) else row_id for row_id in data["ids"][keep].tolist()]
+        store.restore_state(data["vectors"][keep], ids, document_ids[keep].tolist(), data["file_names"][keep].tolist())
+    removed = int(len(keep) - keep.sum())
+
+    started = datetime.utcnow()
+    generation = database.get_corpus_stats().get("generation", 0)
+    replayed = store.replay(datetime.fromisoformat(header["synced_at"]) - store.CATCH_UP_MARGIN)
+    store.synced_at = started
+
+    return {
+        "snapshot_generation": header["generation"],
+        "corpus_generation": generation,
+        "snapshot_vectors": header["vectors"],
+        "replayed": replayed,
+        "removed": removed
+    }
+
+class IndexSnapshotter:
+    """Restores the vector index from a snapshot at startup and keeps the snapshot fresh
+
+    A background task rewrites the snapshot every `interval` seconds when the
+    corpus generation changed, and once more at shutdown. Several workers
+    share one file: a lock serializes writers, and a worker skips writing
+    when the file already holds the current generation.
+    """
+
+    def __init__(self, store: VectorStore, service: EmbeddingService, path: str, interval: float,
+                 database: Optional[MongoDB] = None):
+        self.store = store
+        self.service = service
+        self.path = path
+        self.interval = interval
+        self.database = database or db
+        self.status = {"enabled": bool(path) and store.supports_snapshots, "path": path or None}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.status["enabled"]
+
+    def load(self):
+        """Restore from the snapshot if there is one, else build the index from the database"""
+        started = time.monotonic()
+        restored = restore(self.path, self.store, self.service.model_name, self.database) if self.enabled else None
+        if restored is None:
+            self.store.load()
+        else:
+            logger.info("✅ Vector index restored from snapshot", extra=restored)
+            self.status["restored"] = restored
+        self.status["load_seconds"] = round(time.monotonic() - started, 3)
+
+    def save(self) -> bool:
+        """Write a snapshot unless the file already holds the current generation and model"""
+        if not self.enabled:
+            return False
+        model = self.service.model_name
+        with FileLock(f"{self.path}.lock"):
+            generation = self.database.get_corpus_stats().get("generation", 0)
+            header = read_header(self.path)
+            if header is not None and header["generation"] == generation and header.get("embedding_model") == model:
+                return False
+            started = time.monotonic()
+            # Pick up other workers' changes first, so the snapshot's synced_at stays recent
+            self.store.sync()
+            write_snapshot(self.path, self.store, generation, model)
+        self.status.update(
+            last_written=datetime.utcnow().isoformat(),
+            last_generation=generation,
+            write_seconds=round(time.monotonic() - started, 3)
+        )
+        logger.info("💾 Index snapshot written", extra={"generation": generation, "vectors": self.store.count()})
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(self.save)
+            except Exception as e:
+                logger.error(f"❌ Index snapshot failed: {e}", exc_info=True)
+
+    def start(self):
+        """Start the periodic snapshot task (call from the running event loop)"""
+        if self.enabled and self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic task and write a final snapshot"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.enabled:
+            try:
+                await run_in_threadpool(self.save)
+            except Exception as e:
+                logger.error(f"❌ Index snapshot failed: {e}", exc_info=True)
+
+# Global snapshotter for the app's vector store
+index_snapshots = IndexSnapshotter(
+    vector_store, embedding_service, settings.index_snapshot_path, settings.index_snapshot_interval_seconds
+)
@@ -0,0 +1,285 @@
+# backend/app/llm_governor.py
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional
+import threading
+import time
+import logging
+from app.config import settings
+from app.metrics import llm_call_seconds, llm_queue_wait_seconds
+
+logger = logging.getLogger(__name__)
+
+class LLMUnavailableError(Exception):
+    """Raised when an LLM call is rejected, times out or the circuit is open"""
+
+# Marks the end of a stream read on a reader thread
+_END = object()
+
+class StreamSlot:
+    """A held streaming slot: the deadline to respect and whether the caller cancelled it"""
+
+    def __init__(self, deadline: float, breaker: "CircuitBreaker"):
+        self.deadline = deadline
+        self.cancelled = False
+        self._breaker = breaker
+
+    def cancel(self):
+        """Record that the caller stopped the stream (not a provider failure)"""
+        self.cancelled = True
+        self._breaker.cancel_trial()
+
+class CircuitBreaker:
+    """Classic closed / open / half-open circuit breaker"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call may go to the provider"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                # Let a single trial call through
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def cancel_trial(self):
+        """Give back a half-open trial that never reached the provider"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("✅ LLM circuit breaker closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"⚠️ LLM circuit breaker opened after {self.consecutive_failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+class LLMGovernor:
+    """Guard LLM calls with a concurrency limit, deadline, hedging and a circuit breaker
+
+    A call waits at most queue_timeout for one of max_concurrency slots and at
+    most timeout for a response. A slot stays taken until the underlying call
+    really finishes, so a hung provider cannot pile up more than
+    max_concurrency threads. With hedge_delay set, a second identical call is
+    started if the first has not answered by then, and the first response wins.
+    """
+
+    def __init__(self, max_concurrency: int = 4, timeout: float = 20.0,
+                 queue_timeout: float = 2.0, hedge_delay: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.hedge_delay = hedge_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        # Streams are read here, so a provider that stalls mid-stream cannot outlive the deadline
+        self._readers = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-stream")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.counters = {
+            "calls": 0, "successes": 0, "failures": 0, "timeouts": 0,
+            "rejected": 0, "hedges": 0, "hedge_wins": 0
+        }
+
+    @classmethod
+    def from_settings(cls) -> "LLMGovernor":
+        return cls(
+            max_concurrency=settings.llm_max_concurrency,
+            timeout=settings.llm_timeout_seconds,
+            queue_timeout=settings.llm_queue_timeout_seconds,
+            hedge_delay=settings.llm_hedge_delay_ms / 1000 if settings.llm_hedge_delay_ms else None,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.llm_breaker_failure_threshold,
+                reset_timeout=settings.llm_breaker_reset_seconds
+            )
+        )
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _acquire(self, timeout: float) -> bool:
+        with self._lock:
+            self.queue_depth += 1
+        started = time.monotonic()
+        try:
+            acquired = self._slots.acquire(timeout=max(timeout, 0))
+        finally:
+            with self._lock:
+                self.queue_depth -= 1
+        llm_queue_wait_seconds.observe(time.monotonic() - started)
+        if acquired:
+            with self._lock:
+                self.in_flight += 1
+        return acquired
+
+    def _release(self, *_):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _submit(self, fn: Callable, args, kwargs):
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._release)
+        return future
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise LLMUnavailableError("LLM circuit breaker is open")
+
+    def call(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """Run fn under the governor and return its result
+
+        Raises LLMUnavailableError when the circuit is open, no slot frees up in
+        time or the deadline passes; provider errors are re-raised as-is.
+        """
+        self._count("calls")
+        self._check_breaker()
+
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        if not self._acquire(min(self.queue_timeout, deadline - time.monotonic())):
+            self._count("rejected")
+            self.breaker.cancel_trial()
+            raise LLMUnavailableError("Too many concurrent LLM calls")
+
+        started = time.monotonic()
+        futures = [self._submit(fn, args, kwargs)]
+
+        if self.hedge_delay is not None:
+            wait(futures, timeout=min(self.hedge_delay, max(deadline - time.monotonic(), 0)))
+            if not futures[0].done() and time.monotonic() < deadline and self._acquire(0):
+                self._count("hedges")
+                futures.append(self._submit(fn, args, kwargs))
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        self._count("hedge_wins")
+                    self._count("successes")
+                    self.breaker.record_success()
+                    llm_call_seconds.observe(time.monotonic() - started, "call", "success")
+                    return future.result()
+                error = future.exception()
+
+        if error is not None and not pending:
+            self._count("failures")
+            self.breaker.record_failure()
+            llm_call_seconds.observe(time.monotonic() - started, "call", "error")
+            raise error
+
+        self._count("timeouts")
+        self.breaker.record_failure()
+        llm_call_seconds.observe(time.monotonic() - started, "call", "timeout")
+        raise LLMUnavailableError("LLM call exceeded its deadline")
+
+    @contextmanager
+    def stream_slot(self, timeout: Optional[float] = None):
+        """Hold a slot for a streaming call; the caller reports the outcome
+
+        Yields a StreamSlot carrying the absolute monotonic deadline the stream
+        should respect. Call its cancel() before leaving early on a client's
+        request, so the call is recorded as cancelled rather than completed.
+        """
+        self._count("calls")
+        self._check_breaker()
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        if not self._acquire(self.queue_timeout):
+            self._count("rejected")
+            self.breaker.cancel_trial()
+            raise LLMUnavailableError("Too many concurrent LLM calls")
+        started = time.monotonic()
+        slot = StreamSlot(deadline, self.breaker)
+        outcome = "error"
+        try:
+            yield slot
+            outcome = "cancelled" if slot.cancelled else "completed"
+        except GeneratorExit:
+            outcome = "cancelled"
+            raise
+        finally:
+            llm_call_seconds.observe(time.monotonic() - started, "stream", outcome)
+            self._release()
+
+    def read(self, fn: Callable, *args, deadline: float, **kwargs):
+        """Run fn on a reader thread, giving up at `deadline` even if it never returns
+
+        Meant for the pieces of a streaming call inside stream_slot: opening
+        the stream and fetching each chunk. On timeout the caller should abort
+        the stream, which normally unblocks the reader thread.
+        """
+        future = self._readers.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            future.cancel()
+            raise LLMUnavailableError("LLM stream exceeded its deadline")
+
+    def iterate(self, stream: Iterable, deadline: float) -> Iterator:
+        """Yield a provider stream's chunks, raising LLMUnavailableError once `deadline` passes"""
+        chunks = iter(stream)
+        while True:
+            chunk = self.read(next, chunks, _END, deadline=deadline)
+            if chunk is _END:
+                return
+            yield chunk
+
+    def record_success(self):
+        self._count("successes")
+        self.breaker.record_success()
+
+    def record_failure(self, timed_out: bool = False):
+        self._count("timeouts" if timed_out else "failures")
+        self.breaker.record_failure()
+
+    def stats(self) -> dict:
+        """Return queue depth, in-flight calls, breaker state and counters"""
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "queue_depth": self.queue_depth,
+                "breaker_state": self.breaker.state,
+                "consecutive_failures": self.breaker.consecutive_failures,
+                "hedging": self.hedge_delay is not None,
+                **self.counters
+            }
@@ -0,0 +1,100 @@
+# backend/app/logging_config.py
+
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from app.config import settings
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+class StructuredFormatter(logging.Formatter):
+    """Renders `extra` fields after the message, as key=value pairs or as JSON"""
+
+    def __init__(self, json_output: bool = False):
+        super().__init__("%(levelname)s:%(name)s:%(message)s")
+        self.json_output = json_output
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = _extra_fields(record)
+        if self.json_output:
+            entry = {
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+                **fields
+            }
+            if record.exc_info:
+                entry["exception"] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+
+        line = super().format(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting or waiting
+
+    Formatting happens on the listener thread. When the queue is full the
+    record is dropped and counted instead of stalling the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+def configure_logging():
+    """Route all logging through a bounded queue to a background writer (idempotent)"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(StructuredFormatter(json_output=settings.log_format == "json"))
+
+    log_queue = queue.Queue(maxsize=settings.log_queue_size)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(settings.log_level.upper())
+
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Write out queued records and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+def log_sampled(logger: logging.Logger, level: int = logging.DEBUG) -> bool:
+    """True for a LOG_SAMPLE_RATE fraction of calls when the level is enabled"""
+    return logger.isEnabledFor(level) and random.random() < settings.log_sample_rate
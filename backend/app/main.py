@@ -1,40 +1,69 @@
 # backend/app/main.py
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi import APIRouter, FastAPI, File, UploadFile, HTTPException, Query, Request, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, FileResponse
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from contextlib import nullcontext
+from bson import ObjectId
 import os
 import uuid
 import time
+import threading
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 import logging
 
 from app.config import settings
+from app.logging_config import configure_logging, stop_logging, dropped_records
+
+# Configure logging before the other app modules create their loggers and log
+configure_logging()
+
 from app.models import (
     DocumentUploadResponse, SearchQuery, SearchResponse, 
-    SearchResult, HealthCheckResponse, DocumentListResponse,
-    DocumentMetadata
+    HealthCheckResponse, DocumentListResponse,
+    DocumentMetadata, ShardSearchRequest, ShardAddRequest, ShardDeleteRequest
 )
 from app.database import db
 from app.document_processor import DocumentProcessor
+from app.dedup import duplicate_detector
+from app.content_compression import content_codec
 from app.embedding_service import embedding_service
 from app.search_service import search_service
+from app.vector_store import vector_store
+from app.index_snapshot import index_snapshots
+from app.shard_sync import shard_sync
+from app.reembedding import embedding_migration
 from app.rag_service import rag_service
+from app.request_trace import RequestTrace
+from app.search_events import search_events
+from app.metrics import metrics, http_requests, http_request_seconds
+from app.profiling import request_profiler, stage_breakdown
+from app.responses import FastJSONResponse, SelectiveGZipMiddleware, dumps
 
 # ✅ Import auth routes
 from app.auth import routes as auth_routes
+from app.auth.utils import get_optional_user_email, get_admin_email, is_admin
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Enterprise AI Search System",
     description="AI-powered document search with RAG and authentication",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
+# Compress large JSON bodies; SSE is excluded so events are not buffered
+if settings.gzip_minimum_size > 0:
+    app.add_middleware(
+        SelectiveGZipMiddleware,
+        minimum_size=settings.gzip_minimum_size,
+        excluded_paths=("/search/stream",)
+    )
+
 # ✅ ENHANCED CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -45,6 +74,24 @@ app.add_middleware(
     expose_headers=["*"]  # Expose all headers
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests by handler and status and time them until the response starts"""
+    if not settings.metrics_enabled:
+        return await call_next(request)
+    
+    start = time.monotonic()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        endpoint = request.scope.get("endpoint")
+        handler = endpoint.__name__ if endpoint is not None else "unmatched"
+        http_request_seconds.observe(time.monotonic() - start, request.method, handler)
+        http_requests.inc(request.method, handler, str(status))
+
 # Create uploads directory
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -58,18 +105,50 @@ doc_processor = DocumentProcessor(
 # ✅ Setup auth router
 app.include_router(auth_routes.router)
 
+# Seconds spent in each startup phase, reported by /info
+startup_timings = {}
+
+def _warm_up():
+    """Load the embedding model, LLM client and tokenizer before serving traffic"""
+    embedding_service.warm_up()
+    embedding_service.generate_embedding("warm up")
+    rag_service.warm_up()
+
 @app.on_event("startup")
 async def startup_event():
     """Connect to database on startup"""
     logger.info("🚀 Starting Enterprise AI Search System...")
+    started = time.monotonic()
     db.connect()
-    logger.info("✅ API is ready!")
+    content_codec.load()
+    embedding_migration.load()
+    index_snapshots.load()
+    index_snapshots.start()
+    embedding_migration.start()
+    shard_sync.start()
+    rag_service.setup_cache()
+    search_events.start()
+    
+    # Uvicorn only accepts requests once startup finishes, so /health turns
+    # healthy after the warm-up rather than on the first slow request
+    if settings.warmup_on_startup:
+        warmup_started = time.monotonic()
+        await run_in_threadpool(_warm_up)
+        startup_timings["warmup_seconds"] = round(time.monotonic() - warmup_started, 3)
+    
+    startup_timings["startup_seconds"] = round(time.monotonic() - started, 3)
+    logger.info("✅ API is ready!", extra=startup_timings)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close database connection on shutdown"""
     logger.info("👋 Shutting down...")
+    await search_events.stop()
+    await shard_sync.stop()
+    await embedding_migration.stop()
+    await index_snapshots.stop()
     db.close()
+    stop_logging()
 
 @app.get("/", tags=["Health"])
 async def root():
@@ -84,13 +163,8 @@ async def root():
 @app.get("/health", response_model=HealthCheckResponse, tags=["Health"])
 async def health_check():
     """Health check endpoint"""
-    try:
-        # Check database connection
-        db.client.admin.command('ping')
-        db_connected = True
-    except Exception as e:
-        logger.error(f"Database health check failed: {e}")
-        db_connected = False
+    # Reuses a recent successful ping instead of pinging on every call
+    db_connected = await run_in_threadpool(db.is_ready)
     
     return HealthCheckResponse(
         status="healthy" if db_connected else "unhealthy",
@@ -98,11 +172,48 @@ async def health_check():
         timestamp=datetime.utcnow()
     )
 
+def _check_debug_access(user: Optional[str], debug: bool, profile: bool):
+    """Debug breakdowns and profiles expose internals, so only admins get them"""
+    if (debug or profile) and not is_admin(user):
+        raise HTTPException(status_code=403, detail="debug and profile are restricted to admins")
+
+def _profiled(label: str, requested: bool):
+    """Profile the block if asked to, or if this request is picked for background sampling"""
+    if requested or request_profiler.should_sample():
+        return request_profiler.profile(label)
+    return nullcontext()
+
+def _debug_info(trace: RequestTrace, profile_run, **extra) -> dict:
+    info = stage_breakdown(trace, **extra)
+    if profile_run is not None:
+        info["profile"] = profile_run.to_dict()
+    return info
+
+def _restore_dangling_duplicates(canonical_ids: list) -> int:
+    """Embed and index stored duplicates of `canonical_ids` whose canonical chunk is gone"""
+    dangling = duplicate_detector.dangling(canonical_ids)
+    if not dangling:
+        return 0
+    model_name = embedding_service.model_name
+    embeddings = embedding_service.generate_embeddings_batch([chunk["content"] for chunk in dangling])
+    for chunk, embedding in zip(dangling, embeddings):
+        chunk["embedding"] = embedding
+        chunk["embedding_model"] = model_name
+    embedding_migration.dual_write(dangling)
+    duplicate_detector.restore(dangling)
+    vector_store.add(dangling)
+    return len(dangling)
+
 @app.post("/upload", response_model=DocumentUploadResponse, tags=["Documents"])
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(file: UploadFile = File(...),
+                          owner: Optional[str] = Depends(get_optional_user_email),
+                          debug: bool = Query(False, description="Return a stage timing breakdown (admins only)"),
+                          profile: bool = Query(False, description="Profile this request (admins only)")):
     """Upload and process a document"""
+    _check_debug_access(owner, debug, profile)
     start_time = time.time()
     file_path = None
+    trace = RequestTrace(pipeline="upload")
     
     try:
         # Validate file type
@@ -134,38 +245,62 @@ async def upload_document(file: UploadFile = File(...)):
         
         logger.info(f"📄 Processing document: {file.filename}")
         
-        # Process document (extract and chunk)
-        chunks = doc_processor.process_document(file_path, file.content_type)
+        with _profiled("upload", profile) as profile_run:
+            # Process document (extract and chunk)
+            chunks = doc_processor.process_document(file_path, file.content_type, trace=trace)
         
-        if not chunks:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not extract text from document"
-            )
+            if not chunks:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Could not extract text from document"
+                )
         
-        # Generate embeddings for chunks
-        chunk_texts = [chunk['content'] for chunk in chunks]
-        embeddings = embedding_service.generate_embeddings_batch(chunk_texts)
-        
-        # Prepare data for database
-        chunks_data = []
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            chunk_data = {
-                "document_id": document_id,
-                "file_name": file.filename,
-                "chunk_id": chunk['chunk_id'],
-                "content": chunk['content'],
-                "embedding": embedding,
-                "metadata": {
-                    "word_count": chunk.get('word_count', 0),
-                    "file_size": len(contents)
-                },
-                "created_at": datetime.utcnow()
-            }
-            chunks_data.append(chunk_data)
+            # Prepare data for database
+            chunks_data = []
+            for chunk in chunks:
+                chunk_data = {
+                    "document_id": document_id,
+                    "file_name": file.filename,
+                    "chunk_id": chunk['chunk_id'],
+                    "content": chunk['content'],
+                    "metadata": {
+                        "word_count": chunk.get('word_count', 0),
+                        "file_size": len(contents)
+                    },
+                    "created_at": datetime.utcnow()
+                }
+                chunks_data.append(chunk_data)
+        
+            # Link near-duplicates to their canonical chunk instead of embedding them again
+            with trace.stage("dedup"):
+                duplicate_count = duplicate_detector.mark(chunks_data)
+            canonical_chunks = [chunk for chunk in chunks_data if "duplicate_of" not in chunk]
         
-        # Insert into database
-        db.insert_chunks(chunks_data)
+            # Generate embeddings for chunks
+            chunk_texts = [chunk['content'] for chunk in canonical_chunks]
+            with trace.stage("embedding"):
+                model_name = embedding_service.model_name
+                embeddings = embedding_service.generate_embeddings_batch(chunk_texts) if chunk_texts else []
+                for chunk, embedding in zip(canonical_chunks, embeddings):
+                    chunk["embedding"] = embedding
+                    chunk["embedding_model"] = model_name
+                # While the corpus is being re-embedded, new chunks get the new model's vector too
+                embedding_migration.dual_write(canonical_chunks)
+        
+            # Insert into database
+            with trace.stage("insert"):
+                content_codec.encode_chunks(chunks_data)
+                db.insert_chunks(chunks_data)
+                vector_store.add(canonical_chunks)
+                # A canonical chunk may have been deleted while this upload was embedding
+                _restore_dangling_duplicates(list({chunk["duplicate_of"] for chunk in chunks_data if "duplicate_of" in chunk}))
+                db.add_document_to_catalog(
+                    document_id=document_id,
+                    file_name=file.filename,
+                    file_size=len(contents),
+                    total_chunks=len(chunks_data),
+                    owner=owner
+                )
         
         # Clean up temporary file
         if os.path.exists(file_path):
@@ -181,7 +316,9 @@ async def upload_document(file: UploadFile = File(...)):
             document_id=document_id,
             file_name=file.filename,
             chunks_created=len(chunks),
-            processing_time=round(processing_time, 2)
+            duplicate_chunks=duplicate_count,
+            processing_time=round(processing_time, 2),
+            debug=_debug_info(trace, profile_run) if debug or profile else None
         )
         
     except HTTPException:
@@ -196,9 +333,36 @@ async def upload_document(file: UploadFile = File(...)):
                 pass
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+def _format_result(result: dict, include_content: bool = True, snippet_chars: Optional[int] = None) -> dict:
+    """Shape a raw search hit as a SearchResult, without building the model
+    
+    Results are serialized straight from these dicts, so the field names
+    must stay in sync with SearchResult.
+    """
+    formatted = {
+        'file_name': result.get('file_name', 'Unknown'),
+        'chunk_id': result.get('chunk_id', 0),
+        'similarity_score': round(result.get('similarity_score', 0.0), 4),
+        'metadata': result.get('metadata', {})
+    }
+    if include_content:
+        content = result.get('content', '')
+        if snippet_chars and len(content) > snippet_chars:
+            content = content[:snippet_chars].rstrip() + "…"
+        formatted['content'] = content
+    return formatted
+
+def _sse_event(event: str, data: dict) -> str:
+    """Encode a single Server-Sent Event"""
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
 @app.post("/search", response_model=SearchResponse, tags=["Search"])
-async def search_documents(search_query: SearchQuery):
+async def search_documents(search_query: SearchQuery,
+                           user: Optional[str] = Depends(get_optional_user_email),
+                           debug: bool = Query(False, description="Return a stage timing breakdown (admins only)"),
+                           profile: bool = Query(False, description="Profile this request (admins only)")):
     """Search documents using semantic search"""
+    _check_debug_access(user, debug, profile)
     start_time = time.time()
     
     try:
@@ -206,41 +370,148 @@ async def search_documents(search_query: SearchQuery):
         top_k = search_query.top_k or settings.top_k_results
         use_rag = search_query.use_rag
         
-        logger.info(f"🔍 Searching for: '{query}'")
+        trace = RequestTrace(deadline_ms=search_query.deadline_ms)
         
-        # Perform search
-        results = search_service.search(query, top_k=top_k)
+        logger.info("🔍 Search", extra={"query": query, "top_k": top_k, "use_rag": use_rag})
         
-        # Format results
-        search_results = [
-            SearchResult(
-                content=result.get('content', ''),
-                file_name=result.get('file_name', 'Unknown'),
-                chunk_id=result.get('chunk_id', 0),
-                similarity_score=round(result.get('similarity_score', 0.0), 4),
-                metadata=result.get('metadata', {})
-            )
-            for result in results
-        ]
+        with _profiled("search", profile) as profile_run:
+            # Perform search
+            results = search_service.search(query, top_k=top_k, trace=trace)
         
-        # Generate RAG answer if requested
-        rag_answer = None
-        if use_rag and results:
-            rag_answer = rag_service.generate_answer(query, results)
+            # Format results
+            search_results = [
+                _format_result(result, search_query.include_content, search_query.snippet_chars)
+                for result in results
+            ]
+        
+            # Generate RAG answer if requested
+            rag_answer = None
+            rag_usage = {}
+            if use_rag and results:
+                # Only serve cached answers if the LLM would overrun the deadline
+                rag_timeout = trace.remaining() if trace.can_run("rag") else 0.0
+                with trace.stage("rag"):
+                    rag_answer = rag_service.generate_answer(
+                        query, results, usage=rag_usage, timeout=rag_timeout
+                    )
+                if rag_usage.get("degraded"):
+                    trace.degrade("rag")
         
         processing_time = time.time() - start_time
         
-        return SearchResponse(
+        search_events.record(
             query=query,
-            results=search_results,
-            total_results=len(search_results),
-            processing_time=round(processing_time, 2),
-            rag_answer=rag_answer
+            latency=processing_time,
+            stage_timings=trace.timings,
+            result_count=len(search_results),
+            cache_hit=bool(rag_usage.get("cache_hit")),
+            degraded_stages=trace.degraded_stages
         )
         
+        # Already in SearchResponse shape; returning the response directly
+        # skips re-validating every result through the response model
+        return FastJSONResponse({
+            "query": query,
+            "results": search_results,
+            "total_results": len(search_results),
+            "processing_time": round(processing_time, 2),
+            "rag_answer": rag_answer,
+            "rag_context_tokens": rag_usage.get("context_tokens"),
+            "degraded_stages": list(trace.degraded_stages),
+            "debug": _debug_info(
+                trace, profile_run,
+                rag_cache_hit=bool(rag_usage.get("cache_hit")),
+                rag_context_tokens=rag_usage.get("context_tokens")
+            ) if debug or profile else None
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ Search error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+@app.post("/search/stream", tags=["Search"])
+async def search_documents_stream(search_query: SearchQuery, request: Request):
+    """Search documents and stream the RAG answer as Server-Sent Events
+    
+    Events: `results` (sent as soon as retrieval finishes), `token` (answer
+    text as it is generated), `fallback` (summary used when the LLM is
+    unavailable or fails) and `done`.
+    """
+    start_time = time.time()
+    query = search_query.query
+    top_k = search_query.top_k or settings.top_k_results
+    use_rag = search_query.use_rag
+    
+    trace = RequestTrace(deadline_ms=search_query.deadline_ms)
+    
+    try:
+        logger.info("🔍 Streaming search", extra={"query": query, "top_k": top_k, "use_rag": use_rag})
+        results = await run_in_threadpool(search_service.search, query, top_k, trace)
+        search_results = [
+            _format_result(result, search_query.include_content, search_query.snippet_chars)
+            for result in results
+        ]
     except Exception as e:
         logger.error(f"❌ Search error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    
+    retrieval_time = time.time() - start_time
+    
+    async def event_stream():
+        yield _sse_event("results", {
+            "query": query,
+            "results": search_results,
+            "total_results": len(search_results),
+            "retrieval_time": round(retrieval_time, 2),
+            "degraded_stages": list(trace.degraded_stages)
+        })
+        
+        rag_usage = {}
+        if use_rag and results:
+            cancel_event = threading.Event()
+            rag_timeout = trace.remaining() if trace.can_run("rag") else 0.0
+            answer_events = rag_service.stream_answer(
+                query, results, cancel_event=cancel_event, usage=rag_usage, timeout=rag_timeout
+            )
+            try:
+                async for event, text in iterate_in_threadpool(answer_events):
+                    if await request.is_disconnected():
+                        logger.info("🔌 Client disconnected, aborting answer stream")
+                        return
+                    yield _sse_event(event, {"text": text})
+            finally:
+                # Stop the upstream LLM call if we are leaving early
+                cancel_event.set()
+                try:
+                    answer_events.close()
+                except ValueError:
+                    # Generator is still running in the worker thread; it will
+                    # observe cancel_event on its next chunk
+                    pass
+        
+        if rag_usage.get("degraded"):
+            trace.degrade("rag")
+        processing_time = time.time() - start_time
+        search_events.record(
+            query=query,
+            latency=processing_time,
+            stage_timings=trace.timings,
+            result_count=len(search_results),
+            cache_hit=bool(rag_usage.get("cache_hit")),
+            degraded_stages=trace.degraded_stages
+        )
+        
+        yield _sse_event("done", {
+            "processing_time": round(processing_time, 2),
+            "rag_context_tokens": rag_usage.get("context_tokens"),
+            "degraded_stages": trace.degraded_stages
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/documents", response_model=DocumentListResponse, tags=["Documents"])
 async def list_documents():
@@ -253,9 +524,11 @@ async def list_documents():
             DocumentMetadata(
                 document_id=doc['_id'],
                 file_name=doc.get('file_name', 'Unknown'),
-                file_size=0,
-                upload_date=doc.get('upload_date', datetime.utcnow()),
-                total_chunks=doc.get('total_chunks', 0)
+                file_size=doc.get('file_size', 0),
+                upload_date=doc.get('upload_date') or datetime.utcnow(),
+                total_chunks=doc.get('total_chunks', 0),
+                file_type=doc.get('file_type'),
+                owner=doc.get('owner')
             )
             for doc in documents
         ]
@@ -276,7 +549,13 @@ async def delete_document(document_id: str):
     """Delete a document and all its chunks"""
     try:
         logger.info(f"🗑️  Deleting document: {document_id}")
+        canonical_ids = duplicate_detector.canonical_ids(document_id)
+        promoted = duplicate_detector.promote_duplicates(document_id)
         deleted_count = db.delete_document(document_id)
+        vector_store.delete(document_id)
+        vector_store.add(promoted)
+        # Duplicates an upload stored after the promotion above
+        _restore_dangling_duplicates(canonical_ids)
         
         if deleted_count == 0:
             raise HTTPException(status_code=404, detail="Document not found")
@@ -295,27 +574,124 @@ async def delete_document(document_id: str):
         logger.error(f"❌ Error deleting document: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
 
+def _check_shard_token(x_shard_token: Optional[str] = Header(None)):
+    """When SHARD_TOKEN is set, only coordinators that send it may use the shard endpoints"""
+    if settings.shard_token and x_shard_token != settings.shard_token:
+        raise HTTPException(status_code=403, detail="Invalid shard token")
+
+# Served only by instances started with SHARD_PARTITION (see the router include below)
+shard_router = APIRouter(prefix="/shard", tags=["Sharding"], dependencies=[Depends(_check_shard_token)])
+
+@shard_router.post("/search")
+async def shard_search(request: ShardSearchRequest):
+    """Top-k hits from this instance's partition, for a sharded coordinator"""
+    results = await run_in_threadpool(vector_store.search, request.embedding, request.top_k, request.filters)
+    return FastJSONResponse({"results": results})
+
+@shard_router.post("/add")
+async def shard_add(request: ShardAddRequest):
+    """Index chunks the coordinator inserted; chunks outside this partition are skipped"""
+    ids = [ObjectId(chunk_id) if ObjectId.is_valid(chunk_id) else chunk_id for chunk_id in request.ids]
+    chunks = await run_in_threadpool(lambda: list(db.collection.find({"_id": {"$in": ids}})))
+    return {"added": await run_in_threadpool(vector_store.add, chunks)}
+
+@shard_router.post("/delete")
+async def shard_delete(request: ShardDeleteRequest):
+    """Drop a deleted document from this instance's partition"""
+    return {"deleted": await run_in_threadpool(vector_store.delete, request.document_id)}
+
+@shard_router.get("/stats")
+async def shard_stats():
+    return vector_store.stats()
+
+if settings.shard_partition:
+    app.include_router(shard_router)
+
 @app.get("/info", tags=["Info"])
 async def get_info():
     """Get system information"""
     return {
-        "embedding_model": settings.embedding_model,
-        "embedding_dimensions": settings.embedding_dimensions,
+        "embedding_model": embedding_service.model_name,
+        "embedding_dimensions": embedding_service.get_embedding_info()["dimensions"],
+        "embedding_migration": embedding_migration.status,
+        # Remote shards are asked for their counts over HTTP
+        "vector_store": await run_in_threadpool(vector_store.stats),
+        "index_snapshot": index_snapshots.status,
+        "shard_sync": shard_sync.status,
         "chunk_size": settings.chunk_size,
         "chunk_overlap": settings.chunk_overlap,
         "max_file_size_mb": settings.max_file_size / 1024 / 1024,
         "supported_formats": ["PDF", "TXT", "DOCX"],
         "cors_enabled": True,
+        "rag_answer_cache": rag_service.get_cache_stats(),
+        "llm_governor": rag_service.get_governor_stats(),
+        "startup": startup_timings,
         "api_version": "1.0.0"
     }
 
+def _collect_runtime_metrics():
+    """Gauges and counters read from the services at scrape time"""
+    index = vector_store.stats()
+    governor = rag_service.get_governor_stats()
+    cache = rag_service.get_cache_stats()
+    events = search_events.stats()
+    
+    yield "vector_store_vectors", "gauge", "Vectors held by the vector store", [
+        ({"backend": index["backend"]}, index["vectors"])
+    ]
+    yield "llm_in_flight", "gauge", "LLM calls currently running", [({}, governor["in_flight"])]
+    yield "llm_queue_depth", "gauge", "LLM calls waiting for a slot", [({}, governor["queue_depth"])]
+    yield "llm_calls_total", "counter", "LLM calls by outcome", [
+        ({"outcome": outcome}, governor[outcome])
+        for outcome in ("successes", "failures", "timeouts", "rejected", "hedges", "hedge_wins")
+    ]
+    yield "llm_breaker_open", "gauge", "1 while the LLM circuit breaker is not closed", [
+        ({}, int(governor["breaker_state"] != "closed"))
+    ]
+    if cache.get("enabled"):
+        yield "rag_cache_lookups_total", "counter", "RAG answer cache lookups by result", [
+            ({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])
+        ]
+        yield "rag_cache_entries", "gauge", "Answers held in the RAG cache", [({}, cache["entries"])]
+    yield "search_events_pending", "gauge", "Search events waiting to be flushed", [({}, events["pending"])]
+    yield "search_events_dropped_total", "counter", "Search events dropped before reaching storage", [
+        ({}, events["dropped"])
+    ]
+    yield "log_records_dropped_total", "counter", "Log records dropped because the log queue was full", [
+        ({}, dropped_records())
+    ]
+
+metrics.register_collector(_collect_runtime_metrics)
+
+@app.get("/metrics", tags=["Info"])
+async def get_metrics():
+    """Expose metrics in the Prometheus text format"""
+    # Collectors may block (a sharded coordinator asks its remote shards for counts)
+    body = await run_in_threadpool(metrics.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profiles", tags=["Debug"])
+async def list_profiles(admin: str = Depends(get_admin_email)):
+    """List saved request profiles (admins only)"""
+    return {
+        "profiles": await run_in_threadpool(request_profiler.list_profiles),
+        "profiler": request_profiler.stats()
+    }
+
+@app.get("/debug/profiles/{profile_id}", tags=["Debug"])
+async def download_profile(profile_id: str, admin: str = Depends(get_admin_email)):
+    """Download a saved profile; open it with `python -m pstats` or snakeviz (admins only)"""
+    path = request_profiler.path_for(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
 
 @app.get("/analytics/stats", tags=["Analytics"])
 async def analytics_stats():
     """Return basic analytics stats for the frontend dashboard"""
     try:
         # If DB not connected, return sensible defaults
-        if db.collection is None:
+        if not await run_in_threadpool(db.is_ready):
             return {
                 "total_documents": 0,
                 "total_searches": 0,
@@ -323,26 +699,19 @@ async def analytics_stats():
                 "recent_searches": []
             }
 
-        # Total unique documents (grouped by document_id)
-        unique_docs = db.collection.distinct("document_id")
-        total_documents = len(unique_docs) if unique_docs else 0
-
-        # Documents by file extension (count chunks per extension as approximation)
-        docs = list(db.collection.find({}, {"file_name": 1}))
-        from os.path import splitext
-        types_count = {}
-        for d in docs:
-            fname = d.get('file_name') or ''
-            ext = splitext(fname)[1].lower() if fname else 'unknown'
-            types_count[ext] = types_count.get(ext, 0) + 1
-
-        documents_by_type = [{"type": k if k else "unknown", "count": v} for k, v in types_count.items()]
-
-        # Recent searches: not tracked yet, return empty list
-        recent_searches = []
+        # Counters are maintained on upload/delete, so this is a single read
+        corpus_stats = db.get_corpus_stats()
+        total_documents = corpus_stats.get("total_documents", 0)
+        
+        documents_by_type = [
+            {"type": f".{file_type}" if file_type != "unknown" else "unknown", "count": count}
+            for file_type, count in corpus_stats.get("documents_by_type", {}).items()
+            if count > 0
+        ]
 
-        # Total searches placeholder (could be implemented by logging searches)
-        total_searches = 0
+        # Search telemetry is buffered in-process and flushed in the background
+        recent_searches = search_events.recent_searches()
+        total_searches = search_events.total_searches()
 
         return {
             "total_documents": total_documents,
@@ -356,6 +725,21 @@ async def analytics_stats():
         # Return the error message in the response to aid local debugging
         return JSONResponse(status_code=500, content={"detail": f"Failed to compute analytics stats: {str(e)}"})
 
+@app.get("/analytics/searches", tags=["Analytics"])
+async def analytics_searches(granularity: str = Query("hour", pattern="^(minute|hour)$"),
+                             limit: int = Query(24, ge=1, le=1440)):
+    """Return pre-aggregated search rollups (count, results, cache hits, latency sums)"""
+    try:
+        rollups = await run_in_threadpool(search_events.get_rollups, granularity, limit)
+        return {
+            "granularity": granularity,
+            "rollups": rollups,
+            "telemetry": search_events.stats()
+        }
+    except Exception as e:
+        logger.error(f"❌ Search analytics error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to load search analytics: {str(e)}")
+
 # ✅ Add OPTIONS handler for preflight requests
 @app.options("/{full_path:path}")
 async def options_handler(full_path: str):
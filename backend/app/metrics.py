@@ -0,0 +1,184 @@
+# backend/app/metrics.py
+
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import math
+import threading
+
+# Seconds; covers sub-millisecond stages up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}"
+            for key, value in values
+        ]
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three additions under a lock"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [per-bucket counts, sum, count]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+
+        lines = []
+        for key, counts, total, count in snapshot:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+# A collector returns (name, kind, documentation, [(labels, value), ...]) tuples
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text format
+
+    Hot paths update counters and histograms directly. Values that already
+    live elsewhere (index size, queue depth, cache hits) are read by
+    collectors only when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Optional[Tuple[float, ...]] = None) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+# Global registry and the metrics recorded on hot paths
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "pipeline_stage_seconds",
+    "Time spent in each search or upload pipeline stage",
+    ("pipeline", "stage")
+)
+stage_errors = metrics.counter(
+    "pipeline_stage_errors_total",
+    "Exceptions raised out of a pipeline stage",
+    ("pipeline", "stage")
+)
+llm_call_seconds = metrics.histogram(
+    "llm_call_seconds",
+    "LLM call latency by mode (call or stream) and outcome",
+    ("mode", "outcome")
+)
+llm_queue_wait_seconds = metrics.histogram(
+    "llm_queue_wait_seconds",
+    "Time spent waiting for a free LLM concurrency slot"
+)
+llm_first_token_seconds = metrics.histogram(
+    "llm_first_token_seconds",
+    "Time from starting an LLM stream to its first token"
+)
+http_request_seconds = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response starts",
+    ("method", "handler")
+)
+http_requests = metrics.counter(
+    "http_requests_total",
+    "HTTP requests by handler and status code",
+    ("method", "handler", "status")
+)
+shard_failures = metrics.counter(
+    "search_shard_failures_total",
+    "Shard searches that failed or missed their timeout, and shard writes that failed",
+    ("shard", "reason")
+)
+duplicate_chunks = metrics.counter(
+    "ingest_duplicate_chunks_total",
+    "Uploaded chunks linked to a near-duplicate instead of being embedded"
+)
+embedding_fallbacks = metrics.counter(
+    "embedding_server_fallbacks_total",
+    "Embedding calls served in-process because the embedding server failed"
+)
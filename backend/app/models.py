@@ -11,7 +11,9 @@ class DocumentUploadResponse(BaseModel):
     document_id: str
     file_name: str
     chunks_created: int
+    duplicate_chunks: int = 0  # Near-duplicates linked to an existing chunk instead of being embedded
     processing_time: float
+    debug: Optional[Dict[str, Any]] = None  # Stage breakdown and profile, admins only
 
 class DocumentMetadata(BaseModel):
     """Metadata for uploaded documents"""
@@ -20,6 +22,8 @@ class DocumentMetadata(BaseModel):
     upload_date: datetime
     total_chunks: int
     document_id: str
+    file_type: Optional[str] = None
+    owner: Optional[str] = None
 
 class ChunkData(BaseModel):
     """Model for document chunks stored in database"""
@@ -36,10 +40,13 @@ class SearchQuery(BaseModel):
     query: str
     top_k: Optional[int] = 5
     use_rag: Optional[bool] = True
+    deadline_ms: Optional[int] = Field(default=None, gt=0)  # Latency budget for the whole request
+    include_content: bool = True  # False drops chunk text from results (file, score and metadata only)
+    snippet_chars: Optional[int] = Field(default=None, gt=0)  # Truncate chunk text to this many characters
 
 class SearchResult(BaseModel):
     """Model for individual search results"""
-    content: str
+    content: Optional[str] = None  # Omitted when the query sets include_content=false
     file_name: str
     chunk_id: int
     similarity_score: float
@@ -52,6 +59,23 @@ class SearchResponse(BaseModel):
     total_results: int
     processing_time: float
     rag_answer: Optional[str] = None
+    rag_context_tokens: Optional[int] = None
+    degraded_stages: List[str] = []  # Stages skipped or cut short to meet deadline_ms, and missed shards
+    debug: Optional[Dict[str, Any]] = None  # Stage breakdown and profile, admins only
+
+class ShardSearchRequest(BaseModel):
+    """Query forwarded by a sharded coordinator to one shard"""
+    embedding: List[float]
+    top_k: int = Field(gt=0)
+    filters: Optional[Dict[str, Any]] = None
+
+class ShardAddRequest(BaseModel):
+    """Chunks the coordinator just inserted that belong to this shard"""
+    ids: List[str]
+
+class ShardDeleteRequest(BaseModel):
+    """Document the coordinator just deleted"""
+    document_id: str
 
 class DocumentListResponse(BaseModel):
     """Response for listing all documents"""
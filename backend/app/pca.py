@@ -0,0 +1,105 @@
+# backend/app/pca.py
+"""PCA projection for the "pca" vector store's reduced-dimension first pass
+
+Usually fitted offline on the stored embeddings:
+
+Usage (from backend/):
+    python -m app.pca --dimensions 96 --output pca_projection.npz
+"""
+
+from typing import Optional
+import argparse
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class PCAProjection:
+    """Top principal components of a set of embeddings
+
+    Corpus vectors are centered before projecting; queries are not. For a
+    query q, q·x = q·mean + q·(x - mean) and the first term is the same for
+    every x, so ranking by the projected second term keeps the order.
+    """
+
+    VERSION = 1
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained_variance: float, fitted_on: int):
+        self.mean = mean.astype(np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)  # (input dims, reduced dims)
+        self.explained_variance = float(explained_variance)
+        self.fitted_on = int(fitted_on)
+
+    @property
+    def input_dimensions(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def dimensions(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dimensions: int, max_samples: int = 100000, seed: int = 0) -> "PCAProjection":
+        """Fit on up to max_samples rows (covariance eigendecomposition)"""
+        if len(vectors) > max_samples:
+            vectors = vectors[np.random.default_rng(seed).choice(len(vectors), max_samples, replace=False)]
+        vectors = np.asarray(vectors, dtype=np.float64)
+        mean = vectors.mean(axis=0)
+        centered = vectors - mean
+        covariance = centered.T @ centered / max(len(vectors) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1][:dimensions]
+        explained = eigenvalues[order].sum() / max(eigenvalues.sum(), 1e-12)
+        return cls(mean, eigenvectors[:, order], explained, len(vectors))
+
+    def project_corpus(self, vectors: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray((vectors - self.mean) @ self.components, dtype=np.float32)
+
+    def project_query(self, query: np.ndarray) -> np.ndarray:
+        return query @ self.components
+
+    def save(self, path: str):
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, version=self.VERSION, mean=self.mean, components=self.components,
+                 explained_variance=self.explained_variance, fitted_on=self.fitted_on)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["PCAProjection"]:
+        """The saved projection, or None if there is none or it is from another format version"""
+        if not path or not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if int(data["version"]) != cls.VERSION:
+                logger.warning(f"⚠️  Ignoring PCA projection {path}: format version {int(data['version'])}")
+                return None
+            return cls(data["mean"], data["components"], data["explained_variance"], data["fitted_on"])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dimensions", type=int, default=None, help="Reduced dimensions (default: PCA_DIMENSIONS)")
+    parser.add_argument("--max-samples", type=int, default=100000)
+    parser.add_argument("--output", help="Where to save it (default: PCA_PROJECTION_PATH)")
+    args = parser.parse_args()
+
+    from app.config import settings
+    from app.database import db
+
+    output = args.output or settings.pca_projection_path
+    if not output:
+        raise SystemExit("Pass --output or set PCA_PROJECTION_PATH")
+    cursor = db.collection.find({"embedding": {"$exists": True}}, {"embedding": 1})
+    vectors = np.asarray([doc["embedding"] for doc in cursor if doc.get("embedding")], dtype=np.float32)
+    if not len(vectors):
+        raise SystemExit("No embeddings in the database to fit on")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+
+    projection = PCAProjection.fit(vectors / norms, args.dimensions or settings.pca_dimensions, args.max_samples)
+    projection.save(output)
+    print(f"✅ {projection.input_dimensions} -> {projection.dimensions} dimensions, "
+          f"{projection.explained_variance:.1%} of variance, fitted on {projection.fitted_on} vectors: {output}")
+
+if __name__ == "__main__":
+    main()
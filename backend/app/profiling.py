@@ -0,0 +1,171 @@
+# backend/app/profiling.py
+
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import uuid
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_ID = re.compile(r"^[a-z]+-[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+class ProfileRun:
+    """Outcome of one profiled block"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.profile_id: Optional[str] = None
+        self.skipped_reason: Optional[str] = None
+        self.top_functions: List[Dict] = []
+
+    def to_dict(self) -> dict:
+        if self.profile_id is None:
+            return {"profile_id": None, "skipped": self.skipped_reason}
+        return {
+            "profile_id": self.profile_id,
+            "download": f"/debug/profiles/{self.profile_id}",
+            "top_functions": self.top_functions
+        }
+
+class RequestProfiler:
+    """cProfile a single request and keep the result on disk for download
+
+    Only one request is profiled at a time: the interpreter allows a single
+    active profiler, and profiling is meant for the odd slow request, not
+    every request. Requests are also sampled at `sample_rate` so latency
+    outliers get captured without anyone asking for a profile.
+    """
+
+    def __init__(self, directory: str = "profiles", max_files: int = 50, sample_rate: float = 0.0):
+        self.directory = directory
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self._busy = threading.Lock()
+        self.captured = 0
+        self.skipped = 0
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, label: str):
+        """Profile the block; yields a ProfileRun filled in when the block exits"""
+        run = ProfileRun(label)
+        if not self._busy.acquire(blocking=False):
+            run.skipped_reason = "another request is being profiled"
+            self.skipped += 1
+            yield run
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # Another profiling tool (e.g. a debugger) already owns the hook
+                run.skipped_reason = str(e)
+                self.skipped += 1
+                yield run
+                return
+            try:
+                yield run
+            finally:
+                profiler.disable()
+            self._save(profiler, run)
+        finally:
+            self._busy.release()
+
+    def _save(self, profiler: cProfile.Profile, run: ProfileRun):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profile_id = f"{run.label}-{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+            profiler.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+            run.profile_id = profile_id
+            run.top_functions = self._top_functions(profiler)
+            self.captured += 1
+            self._prune()
+            logger.info(f"🔬 Saved profile {profile_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not save profile: {e}")
+            run.skipped_reason = f"could not save profile: {e}"
+
+    @staticmethod
+    def _top_functions(profiler: cProfile.Profile, limit: int = 10) -> List[Dict]:
+        """Functions with the most cumulative time, for a quick look without downloading"""
+        stats = pstats.Stats(profiler).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [
+            {
+                "function": f"{os.path.basename(file_name)}:{line}({function})",
+                "calls": calls,
+                "own_ms": round(own * 1000, 2),
+                "cumulative_ms": round(cumulative * 1000, 2)
+            }
+            for (file_name, line, function), (_, calls, own, cumulative, _) in ranked
+        ]
+
+    def _prune(self):
+        files = sorted(
+            (os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".prof")),
+            key=os.path.getmtime
+        )
+        for path in files[:-self.max_files] if self.max_files else []:
+            os.remove(path)
+
+    def path_for(self, profile_id: str) -> Optional[str]:
+        """Path of a saved profile, or None for unknown or malformed ids"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.prof")
+        return path if os.path.exists(path) else None
+
+    def list_profiles(self) -> List[Dict]:
+        """Saved profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".prof"):
+                path = os.path.join(self.directory, name)
+                profiles.append({
+                    "profile_id": name[:-len(".prof")],
+                    "size": os.path.getsize(path),
+                    "created_at": datetime.utcfromtimestamp(os.path.getmtime(path))
+                })
+        profiles.sort(key=lambda profile: profile["created_at"], reverse=True)
+        return profiles
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "captured": self.captured,
+            "skipped": self.skipped,
+            "busy": self._busy.locked()
+        }
+
+def stage_breakdown(trace, **extra) -> dict:
+    """Stage-by-stage timing of a request, including time not covered by any stage"""
+    total = trace.elapsed()
+    staged = sum(trace.timings.values())
+    return {
+        "total_ms": round(total * 1000, 2),
+        "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in trace.timings.items()},
+        "unstaged_ms": round(max(total - staged, 0.0) * 1000, 2),
+        "degraded_stages": list(trace.degraded_stages),
+        **extra
+    }
+
+# Global request profiler
+request_profiler = RequestProfiler(
+    directory=settings.profile_dir,
+    max_files=settings.profile_max_files,
+    sample_rate=settings.profile_sample_rate
+)
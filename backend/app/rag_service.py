@@ -1,52 +1,121 @@
 # backend/app/rag_service.py
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, Tuple
+import threading
+import time
 import logging
 from app.config import settings
+from app.context_builder import context_builder
+from app.llm_governor import LLMGovernor, LLMUnavailableError
+from app.metrics import llm_first_token_seconds
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump whenever the prompt template changes so cached answers are not reused
+PROMPT_VERSION = "v2"
+
 class RAGService:
     """Retrieval-Augmented Generation service"""
     
     def __init__(self):
-        self.model = None
-        self.use_llm = False
-        
-        # Try to initialize Gemini
-        logger.info(f"🔑 Checking for Gemini API key: {bool(settings.gemini_api_key)}")
+        # The LLM client is created on first use; importing google.generativeai is slow
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.use_llm = settings.llm_provider == "fake" or bool(settings.gemini_api_key)
+        self.answer_cache = None
+        self.governor = LLMGovernor.from_settings()
         
-        if settings.gemini_api_key:
-            try:
-                import google.generativeai as genai
-                logger.info("📦 Configuring Gemini API...")
-                genai.configure(api_key=settings.gemini_api_key)
-                self.model = genai.GenerativeModel('models/gemini-2.5-flash')
-                self.use_llm = True
-                logger.info("✅ RAG service initialized with Gemini AI")
-                logger.info(f"✅ Model ready: {self.model is not None}")
-            except Exception as e:
-                logger.error(f"❌ Failed to initialize Gemini: {e}", exc_info=True)
-                logger.info("💡 Falling back to summary mode")
-        else:
+        if not self.use_llm:
             logger.warning("⚠️  RAG service initialized without LLM (API keys not configured)")
             logger.info("💡 Search will work, but AI answer generation will be disabled")
     
-    def generate_answer(self, query: str, search_results: List[Dict]) -> str:
-        """Generate answer using LLM or fallback to summary"""
+    @property
+    def model(self):
+        """The LLM client, created on first access (None if unavailable)"""
+        if self._model is None and self.use_llm:
+            with self._model_lock:
+                if self._model is None and self.use_llm:
+                    self._model = self._create_model()
+        return self._model
+    
+    def _create_model(self):
+        # Local fake LLM for development and testing
+        if settings.llm_provider == "fake":
+            from app.fake_llm import FakeGenerativeModel
+            logger.info("✅ RAG service using local fake LLM")
+            return FakeGenerativeModel()
+        
+        try:
+            import google.generativeai as genai
+            logger.info("📦 Configuring Gemini API...")
+            genai.configure(api_key=settings.gemini_api_key)
+            model = genai.GenerativeModel(settings.llm_model)
+            logger.info("✅ RAG service initialized with Gemini AI")
+            return model
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize Gemini: {e}", exc_info=True)
+            logger.info("💡 Falling back to summary mode")
+            self.use_llm = False
+            return None
+    
+    def warm_up(self):
+        """Create the LLM client and load the tokenizer ahead of the first request"""
+        self.model  # property access creates the client
+        context_builder.count_tokens("warm up")
+    
+    def setup_cache(self):
+        """Create the answer cache (called once the database is connected)"""
+        from app.answer_cache import create_answer_cache
+        self.answer_cache = create_answer_cache()
+        if self.answer_cache:
+            logger.info(f"✅ RAG answer cache enabled (persistent: {self.answer_cache.backend is not None})")
+    
+    def get_cache_stats(self) -> dict:
+        """Return answer cache statistics including hit rate"""
+        if not self.answer_cache:
+            return {"enabled": False}
+        return self.answer_cache.stats()
+    
+    def get_governor_stats(self) -> dict:
+        """Return LLM concurrency, queue and circuit breaker metrics"""
+        return self.governor.stats()
+    
+    def _cache_key(self, query: str, search_results: List[Dict]) -> Optional[str]:
+        if not self.answer_cache:
+            return None
+        model_name = settings.llm_model if settings.llm_provider != "fake" else "fake"
+        return self.answer_cache.make_key(query, search_results, model_name, PROMPT_VERSION)
+    
+    def generate_answer(self, query: str, search_results: List[Dict],
+                        usage: Optional[Dict] = None, timeout: Optional[float] = None) -> str:
+        """Generate answer using LLM or fallback to summary
+        
+        If a usage dict is passed it is filled with prompt token counts, whether
+        the answer came from the cache and whether the LLM was skipped
+        ("degraded"). A timeout of 0 only serves cached answers.
+        """
         try:
             if not search_results:
                 return "No relevant information found in the documents."
             
-            # Debug logging
-            logger.info(f"🤖 Generate answer called - use_llm: {self.use_llm}, model: {self.model is not None}")
+            logger.debug("🤖 Generate answer called", extra={"use_llm": self.use_llm, "model": self.model is not None})
             
             # Use LLM if available
             if self.use_llm and self.model:
-                logger.info("✅ Calling Gemini to generate answer...")
-                answer = self._generate_answer_with_llm(query, search_results)
-                logger.info(f"✅ Gemini response received: {len(answer)} characters")
+                cache_key = self._cache_key(query, search_results)
+                if cache_key:
+                    cached = self.answer_cache.get(cache_key)
+                    if cached is not None:
+                        logger.info("⚡ Serving answer from RAG cache")
+                        if usage is not None:
+                            usage["cache_hit"] = True
+                        return cached
+                
+                logger.debug("✅ Calling LLM to generate answer")
+                answer = self._generate_answer_with_llm(
+                    query, search_results, cache_key=cache_key, usage=usage, timeout=timeout
+                )
+                logger.debug("✅ Answer ready", extra={"characters": len(answer)})
                 return answer
             else:
                 logger.info("⚠️  Falling back to summary mode (no LLM available)")
@@ -56,45 +125,164 @@ class RAGService:
             logger.error(f"❌ Error in generate_answer: {e}", exc_info=True)
             return self._generate_summary_without_llm(query, search_results)
     
-    def _generate_answer_with_llm(self, query: str, search_results: List[Dict]) -> str:
-        """Generate answer using Gemini AI"""
-        try:
-            logger.info(f"📝 Preparing context from {len(search_results)} results...")
-            
-            # Prepare context from search results
-            context = "\n\n".join([
-                f"Document: {result.get('file_name', 'Unknown')}\n{result.get('content', '')[:500]}"
-                for result in search_results[:5]
-            ])
-            
-            # Create prompt
-            prompt = f"""Based on the following documents, answer the user's question.
+    def _build_prompt(self, query: str, search_results: List[Dict],
+                      usage: Optional[Dict] = None) -> str:
+        """Build the LLM prompt from the query and a token-budgeted context"""
+        packed = context_builder.build(search_results)
+        
+        prompt = f"""Based on the following documents, answer the user's question.
 Be concise, accurate, and helpful. If the documents don't contain enough information, say so.
 
 Question: {query}
 
 Documents:
-{context}
+{packed['context']}
 
 Answer:"""
+        
+        logger.info("📝 Packed RAG context", extra={
+            "chunks": packed["chunks_used"],
+            "passages": packed["passages"],
+            "context_tokens": packed["tokens_used"],
+            "token_budget": packed["token_budget"]
+        })
+        if usage is not None:
+            usage["context_tokens"] = packed["tokens_used"]
+            usage["context_chunks"] = packed["chunks_used"]
+            usage["prompt_tokens"] = context_builder.count_tokens(prompt)
+        return prompt
+    
+    def _generate_answer_with_llm(self, query: str, search_results: List[Dict],
+                                  cache_key: Optional[str] = None, usage: Optional[Dict] = None,
+                                  timeout: Optional[float] = None) -> str:
+        """Generate answer using Gemini AI"""
+        try:
+            if timeout is not None and timeout <= 0:
+                raise LLMUnavailableError("No time left before the request deadline")
             
-            logger.info("🚀 Sending request to Gemini API...")
+            prompt = self._build_prompt(query, search_results, usage=usage)
             
-            # Generate response
-            response = self.model.generate_content(prompt)
+            logger.debug("🚀 Sending request to LLM")
+            
+            # Generate response (bounded concurrency, deadline, circuit breaker)
+            response = self.governor.call(self.model.generate_content, prompt, timeout=timeout)
             
             if response and response.text:
-                logger.info("✅ Gemini API response received successfully")
+                logger.debug("✅ LLM response received")
+                if cache_key:
+                    self.answer_cache.set(cache_key, response.text)
                 return response.text
             else:
                 logger.warning("⚠️  Gemini returned empty response")
                 return self._generate_summary_without_llm(query, search_results)
             
+        except LLMUnavailableError as e:
+            logger.warning(f"⚠️  LLM unavailable, using summary: {e}")
+            if usage is not None:
+                usage["degraded"] = True
+            return self._generate_summary_without_llm(query, search_results)
         except Exception as e:
             logger.error(f"❌ Error with Gemini API: {e}", exc_info=True)
             # Fallback to summary
             return self._generate_summary_without_llm(query, search_results)
     
+    def stream_answer(self, query: str, search_results: List[Dict],
+                      cancel_event: Optional[threading.Event] = None,
+                      usage: Optional[Dict] = None,
+                      timeout: Optional[float] = None) -> Iterator[Tuple[str, str]]:
+        """Stream the answer as ("token", text) events
+        
+        Yields a single ("fallback", summary) event when no LLM is configured or the
+        LLM fails. Setting cancel_event (or closing the generator) aborts the
+        upstream stream.
+        """
+        if not search_results:
+            yield "fallback", "No relevant information found in the documents."
+            return
+        
+        if not (self.use_llm and self.model):
+            yield "fallback", self._generate_summary_without_llm(query, search_results)
+            return
+        
+        cache_key = self._cache_key(query, search_results)
+        if cache_key:
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                logger.info("⚡ Serving streamed answer from RAG cache")
+                if usage is not None:
+                    usage["cache_hit"] = True
+                yield "token", cached
+                return
+        
+        response = None
+        requested = False
+        emitted = 0
+        failed = False
+        tokens = []
+        try:
+            if timeout is not None and timeout <= 0:
+                raise LLMUnavailableError("No time left before the request deadline")
+            prompt = self._build_prompt(query, search_results, usage=usage)
+            with self.governor.stream_slot(timeout=timeout) as slot:
+                logger.info("🚀 Streaming request to LLM...")
+                stream_started = time.monotonic()
+                # Both reads give up at the deadline even if the provider stalls
+                requested = True
+                response = self.governor.read(self.model.generate_content, prompt, stream=True, deadline=slot.deadline)
+                
+                for chunk in self.governor.iterate(response, slot.deadline):
+                    if cancel_event is not None and cancel_event.is_set():
+                        logger.info(f"🛑 Answer stream cancelled after {emitted} tokens")
+                        slot.cancel()
+                        return
+                    text = getattr(chunk, "text", "")
+                    if text:
+                        if not emitted:
+                            llm_first_token_seconds.observe(time.monotonic() - stream_started)
+                        emitted += 1
+                        tokens.append(text)
+                        yield "token", text
+            
+            if emitted:
+                self.governor.record_success()
+            else:
+                self.governor.record_failure()
+        except GeneratorExit:
+            self.governor.breaker.cancel_trial()
+            raise
+        except LLMUnavailableError as e:
+            logger.warning(f"⚠️  LLM unavailable, using summary: {e}")
+            if requested:
+                self.governor.record_failure(timed_out=True)
+            if usage is not None:
+                usage["degraded"] = True
+            failed = True
+        except Exception as e:
+            logger.error(f"❌ Error streaming from LLM: {e}", exc_info=True)
+            self.governor.record_failure()
+            failed = True
+        finally:
+            if response is not None:
+                self._abort_stream(response)
+        
+        if failed or emitted == 0:
+            yield "fallback", self._generate_summary_without_llm(query, search_results)
+        elif cache_key:
+            self.answer_cache.set(cache_key, "".join(tokens))
+    
+    @staticmethod
+    def _abort_stream(response):
+        """Best-effort cancellation of a streaming LLM response"""
+        for target in (response, getattr(response, "_iterator", None)):
+            for name in ("cancel", "close"):
+                method = getattr(target, name, None)
+                if callable(method):
+                    try:
+                        method()
+                    except Exception:
+                        pass
+                    return
+    
     def _generate_summary_without_llm(self, query: str, search_results: List[Dict]) -> str:
         """Create a formatted summary from search results"""
         logger.info("📋 Generating summary without LLM...")
@@ -112,12 +300,12 @@ Answer:"""
         summary += "💡 Tip: Enable Gemini API for AI-generated answers!"
         return summary
     
-    def generate_summary(self, text: str, max_length: int = 200) -> str:
-        """Generate a summary of text"""
+    def generate_summary(self, text: str, max_length: int = 200, timeout: Optional[float] = None) -> str:
+        """Generate a summary of text (truncated instead when the LLM fails or misses `timeout`)"""
         if self.use_llm and self.model:
             try:
                 prompt = f"Summarize the following text in {max_length} characters or less:\n\n{text}"
-                response = self.model.generate_content(prompt)
+                response = self.governor.call(self.model.generate_content, prompt, timeout=timeout)
                 return response.text
             except Exception as e:
                 logger.error(f"Error in generate_summary: {e}")
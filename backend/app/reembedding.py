@@ -0,0 +1,391 @@
+# backend/app/reembedding.py
+"""Switch the corpus to another embedding model without downtime
+
+A job (run as its own process, so it never competes with the API for the
+GIL) re-embeds every chunk with the target model in throttled batches and
+records its progress in the stats collection. It moves through phases:
+
+- backfill: new vectors go to `next_embedding`. Workers keep serving the old
+  index and also embed new uploads with the target model (dual write).
+- switch: every chunk has a new vector. Each worker builds a second index
+  from `next_embedding` beside the serving one and swaps it in together
+  with the query model.
+- finalize: after a grace period, `next_embedding` is copied over
+  `embedding`.
+- cleanup: once every worker has moved back to `embedding` (another grace
+  period), `next_embedding` is removed; then the migration is done.
+
+The checkpoint is saved after every batch, so a stopped job resumes where it
+left off when started again.
+
+Usage (from backend/):
+    python -m app.reembedding --model all-mpnet-base-v2
+    python -m app.reembedding --status
+    python -m app.reembedding --abort
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+from pymongo import ReturnDocument, UpdateOne
+from starlette.concurrency import run_in_threadpool
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import time
+from app.config import settings
+from app.content_compression import CONTENT_FIELDS, content_codec
+from app.database import db, MongoDB
+from app.embedding_service import EmbeddingService, embedding_service
+from app.vector_store import VectorStore, vector_store
+
+logger = logging.getLogger(__name__)
+
+# _id of the migration state document in the stats collection
+STATE_ID = "embedding_migration"
+
+BACKFILL, SWITCH, FINALIZE, CLEANUP, DONE = "backfill", "switch", "finalize", "cleanup", "done"
+
+# A job that has not checkpointed for this long is presumed dead and its migration can be taken over
+LEASE = timedelta(minutes=2)
+
+def serving(state: Optional[dict]) -> tuple:
+    """(model, vector field) that searches must use in a migration state"""
+    if state is None:
+        return settings.embedding_model, "embedding"
+    phase = state["phase"]
+    if phase == BACKFILL:
+        return state["source_model"], "embedding"
+    if phase in (SWITCH, FINALIZE):
+        return state["model"], "next_embedding"
+    return state["model"], "embedding"
+
+class EmbeddingMigration:
+    """A worker's view of the re-embedding job
+
+    Polls the job's state every `poll_seconds`, dual-writes new uploads while
+    a migration is running and switches the worker's index and query model
+    when the job reaches the switch phase.
+    """
+
+    def __init__(self, store: VectorStore, service: EmbeddingService, database: Optional[MongoDB] = None,
+                 poll_seconds: Optional[float] = None):
+        self.store = store
+        self.service = service
+        self.database = database or db
+        self.poll_seconds = settings.reembed_poll_seconds if poll_seconds is None else poll_seconds
+        self.state = None
+        self.status = {"phase": None, "model": service.model_name, "vector_field": store.vector_field}
+        self._target = None  # EmbeddingService for the migration's model
+        self._task: Optional[asyncio.Task] = None
+
+    def _read_state(self) -> Optional[dict]:
+        return self.database.stats.find_one({"_id": STATE_ID})
+
+    def load(self):
+        """Pick the model and vector field to serve (call before the index is loaded)"""
+        self.state = self._read_state()
+        model, field = serving(self.state)
+        if self.state is not None and self.state["phase"] == DONE and model != settings.embedding_model:
+            logger.warning("⚠️  The corpus was re-embedded; serving its model instead of EMBEDDING_MODEL",
+                           extra={"corpus_model": model, "embedding_model": settings.embedding_model})
+        if model != self.service.model_name:
+            self.service.switch_model(EmbeddingService(model_name=model))
+        self.store.vector_field = field
+        self._update_status()
+
+    def refresh(self):
+        """Re-read the job's state and follow it"""
+        self.state = self._read_state()
+        model, field = serving(self.state)
+        if model != self.service.model_name:
+            self._switch(model, field)
+        elif field != self.store.vector_field:
+            # Same vectors under another field name: nothing to rebuild
+            self.store.vector_field = field
+        self._update_status()
+
+    def _switch(self, model: str, field: str):
+        if not self.store.supports_model_switch:
+            logger.error(f"❌ The {self.store.name} vector store cannot switch models while running; restart the workers")
+            return
+        target = self._target_service(model)
+        started = time.monotonic()
+        target.warm_up()
+        self.store.switch_vectors(field)
+        self.service.switch_model(target)
+        self.status["switch_seconds"] = round(time.monotonic() - started, 3)
+        logger.info("✅ Switched to the re-embedded index", extra={
+            "model": model, "vectors": self.store.count(), "seconds": self.status["switch_seconds"]
+        })
+
+    def _target_service(self, model: str) -> EmbeddingService:
+        if self._target is None or self._target.model_name != model:
+            self._target = EmbeddingService(model_name=model)
+        return self._target
+
+    def _update_status(self):
+        state = self.state or {}
+        self.status.update(
+            phase=state.get("phase"),
+            target_model=state.get("model"),
+            processed=state.get("processed"),
+            total=state.get("total"),
+            model=self.service.model_name,
+            vector_field=self.store.vector_field
+        )
+
+    def dual_write(self, chunks: List[dict]):
+        """Give freshly embedded chunks a target-model vector while a migration is running
+
+        Reads the job's state afresh rather than waiting for the next poll, so
+        no upload slips past the job's final sweep.
+        """
+        self.state = self._read_state()
+        phase = self.state["phase"] if self.state is not None else None
+        if phase not in (BACKFILL, SWITCH, FINALIZE) and self.store.vector_field == "embedding":
+            return
+        target = self.state["model"] if self.state is not None else self.service.model_name
+        pending = []
+        for chunk in chunks:
+            chunk["next_embedding_model"] = target
+            if chunk.get("embedding_model") == target:
+                chunk["next_embedding"] = chunk["embedding"]
+            else:
+                pending.append(chunk)
+        if pending:
+            vectors = self._target_service(target).generate_embeddings_batch([chunk["content"] for chunk in pending])
+            for chunk, vector in zip(pending, vectors):
+                chunk["next_embedding"] = vector
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await run_in_threadpool(self.refresh)
+            except Exception as e:
+                logger.error(f"❌ Embedding migration refresh failed: {e}", exc_info=True)
+
+    def start(self):
+        """Start polling the job's state (call from the running event loop)"""
+        if self.poll_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+class ReembeddingJob:
+    """Re-embeds the corpus with `model` in throttled, checkpointed batches"""
+
+    def __init__(self, model: str, database: Optional[MongoDB] = None, batch_size: Optional[int] = None,
+                 max_chunks_per_second: Optional[float] = None, grace_seconds: Optional[float] = None):
+        self.model = model
+        self.database = database or db
+        self.batch_size = batch_size or settings.reembed_batch_size
+        self.max_rate = settings.reembed_max_chunks_per_second if max_chunks_per_second is None else max_chunks_per_second
+        self.grace = settings.reembed_switch_grace_seconds if grace_seconds is None else grace_seconds
+        self.runner = f"{socket.gethostname()}:{os.getpid()}"
+        # Always in-process: an embedding server runs the old model
+        self.embedder = EmbeddingService(use_server=False, model_name=model)
+        self._started = time.monotonic()
+        self._done_since_start = 0
+
+    @property
+    def stats(self):
+        return self.database.stats
+
+    def claim(self) -> dict:
+        """Start the migration, or take over an unfinished one for the same model"""
+        now = datetime.utcnow()
+        state = self.stats.find_one({"_id": STATE_ID})
+        if state is None or state["phase"] == DONE:
+            source = serving(state)[0]
+            if source == self.model:
+                raise ValueError(f"The corpus is already embedded with {self.model}")
+            self.stats.replace_one({"_id": STATE_ID}, {
+                "_id": STATE_ID,
+                "phase": BACKFILL,
+                "source_model": source,
+                "model": self.model,
+                "checkpoint": None,
+                "processed": 0,
+                "total": self.database.collection.count_documents({"embedding": {"$exists": True}}),
+                "started_at": now,
+                "runner": self.runner,
+                "lease_until": now + LEASE
+            }, upsert=True)
+        elif state["model"] != self.model:
+            raise ValueError(f"A migration to {state['model']} is in progress; finish or abort it first")
+        state = self.stats.find_one_and_update(
+            {"_id": STATE_ID, "$or": [{"runner": self.runner}, {"lease_until": {"$lt": now}}]},
+            {"$set": {"runner": self.runner, "lease_until": now + LEASE}},
+            return_document=ReturnDocument.AFTER
+        )
+        if state is None:
+            raise ValueError("Another re-embedding job is running")
+        return state
+
+    def _save(self, **fields) -> dict:
+        fields.update(updated_at=datetime.utcnow(), lease_until=datetime.utcnow() + LEASE)
+        return self.stats.find_one_and_update(
+            {"_id": STATE_ID, "runner": self.runner}, {"$set": fields}, return_document=ReturnDocument.AFTER
+        ) or self._lost()
+
+    def _lost(self):
+        raise RuntimeError("Another job took over the migration")
+
+    def _throttle(self, count: int):
+        """Sleep as needed to stay under max_chunks_per_second"""
+        self._done_since_start += count
+        if self.max_rate > 0:
+            ahead = self._done_since_start / self.max_rate - (time.monotonic() - self._started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def run(self) -> dict:
+        state = self.claim()
+        logger.info("🔁 Re-embedding corpus", extra={"model": self.model, "phase": state["phase"]})
+        while state["phase"] != DONE:
+            state = getattr(self, f"_{state['phase']}")(state)
+            logger.info("🔁 Re-embedding phase", extra={"phase": state["phase"], "processed": state.get("processed")})
+        return state
+
+    def _backfill(self, state: dict) -> dict:
+        collection = self.database.collection
+        while True:
+            query = {"embedding": {"$exists": True}}
+            if state["checkpoint"] is not None:
+                query["_id"] = {"$gt": state["checkpoint"]}
+            batch = list(collection.find(query, {"next_embedding_model": 1, **CONTENT_FIELDS})
+                         .sort("_id", 1).limit(self.batch_size))
+            if not batch:
+                break
+            embedded = self._embed([chunk for chunk in batch if chunk.get("next_embedding_model") != self.model])
+            state = self._save(checkpoint=batch[-1]["_id"], processed=state["processed"] + embedded)
+        # Chunks uploaded before every worker noticed the migration were not dual-written
+        while True:
+            stragglers = list(collection.find(
+                {"embedding": {"$exists": True}, "next_embedding_model": {"$ne": self.model}}, CONTENT_FIELDS
+            ).limit(self.batch_size))
+            if not stragglers:
+                break
+            state = self._save(processed=state["processed"] + self._embed(stragglers))
+        return self._save(phase=SWITCH, checkpoint=None, switch_at=datetime.utcnow())
+
+    def _embed(self, chunks: List[dict]) -> int:
+        if not chunks:
+            return 0
+        vectors = self.embedder.generate_embeddings_batch([content_codec.decode(chunk) for chunk in chunks])
+        self.database.collection.bulk_write([
+            UpdateOne({"_id": chunk["_id"]}, {"$set": {"next_embedding": vector, "next_embedding_model": self.model}})
+            for chunk, vector in zip(chunks, vectors)
+        ], ordered=False)
+        self._throttle(len(chunks))
+        return len(chunks)
+
+    def _wait_for_workers(self, state: dict, since: str) -> dict:
+        """Keep the lease until the grace period after state[since] is over
+
+        Workers only see a phase change on their next poll, and rebuilding an
+        index takes a while longer, so the wait is never shorter than a poll.
+        """
+        wait = max(self.grace, settings.reembed_poll_seconds)
+        while True:
+            remaining = (state[since] + timedelta(seconds=wait) - datetime.utcnow()).total_seconds()
+            if remaining <= 0:
+                return state
+            time.sleep(min(remaining, LEASE.total_seconds() / 4))
+            state = self._save()
+
+    def _switch(self, state: dict) -> dict:
+        # Workers pick up the switch on their next poll and rebuild their index
+        self._wait_for_workers(state, "switch_at")
+        return self._save(phase=FINALIZE)
+
+    def _finalize(self, state: dict) -> dict:
+        collection = self.database.collection
+        while True:
+            query = {"next_embedding_model": self.model, "embedding_model": {"$ne": self.model}}
+            if state["checkpoint"] is not None:
+                query["_id"] = {"$gt": state["checkpoint"]}
+            batch = list(collection.find(query, {"next_embedding": 1}).sort("_id", 1).limit(self.batch_size))
+            if not batch:
+                if state["checkpoint"] is None:
+                    break
+                # One more pass from the start for chunks a slow worker wrote meanwhile
+                state = self._save(checkpoint=None)
+                continue
+            collection.bulk_write([
+                UpdateOne({"_id": chunk["_id"]}, {"$set": {"embedding": chunk["next_embedding"], "embedding_model": self.model}})
+                for chunk in batch
+            ], ordered=False)
+            self._throttle(len(batch))
+            state = self._save(checkpoint=batch[-1]["_id"])
+        return self._save(phase=CLEANUP, checkpoint=None, cleanup_at=datetime.utcnow())
+
+    def _cleanup(self, state: dict) -> dict:
+        # Until their next poll, workers (the mongo engine in particular) still read next_embedding
+        state = self._wait_for_workers(state, "cleanup_at")
+        collection = self.database.collection
+        while True:
+            ids = [chunk["_id"] for chunk in collection.find(
+                {"next_embedding": {"$exists": True}}, {"_id": 1}
+            ).limit(self.batch_size * 10)]
+            if not ids:
+                break
+            collection.update_many({"_id": {"$in": ids}},
+                                   {"$unset": {"next_embedding": "", "next_embedding_model": ""}})
+            self._save()
+        return self._save(phase=DONE, completed_at=datetime.utcnow())
+
+def abort(database: Optional[MongoDB] = None):
+    """Abandon a migration that has not switched yet and drop its vectors"""
+    database = database or db
+    state = database.stats.find_one({"_id": STATE_ID})
+    if state is None or state["phase"] == DONE:
+        raise ValueError("No migration in progress")
+    if state["phase"] != BACKFILL:
+        raise ValueError(f"The migration is past the switch ({state['phase']}); let it finish")
+    database.stats.delete_one({"_id": STATE_ID})
+    database.collection.update_many({"next_embedding": {"$exists": True}},
+                                    {"$unset": {"next_embedding": "", "next_embedding_model": ""}})
+
+# Global migration watcher for the app's vector store and embedding service
+embedding_migration = EmbeddingMigration(vector_store, embedding_service)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Sentence Transformers model to re-embed the corpus with")
+    parser.add_argument("--status", action="store_true", help="Show the migration state")
+    parser.add_argument("--abort", action="store_true", help="Abandon a migration that has not switched yet")
+    args = parser.parse_args()
+
+    if args.status:
+        print(db.stats.find_one({"_id": STATE_ID}) or "No migration has run")
+        return
+    if args.abort:
+        abort()
+        print("✅ Migration aborted")
+        return
+    if not args.model:
+        parser.error("pass --model, --status or --abort")
+    if not vector_store.supports_model_switch:
+        raise SystemExit(f"The {vector_store.name} vector store cannot switch models while running")
+
+    # Leave the CPU to the API workers on the same host
+    os.nice(10)
+    try:
+        state = ReembeddingJob(args.model).run()
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"✅ Corpus re-embedded with {state['model']}: {state['processed']} chunks")
+
+if __name__ == "__main__":
+    main()
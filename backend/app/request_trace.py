@@ -0,0 +1,85 @@
+# backend/app/request_trace.py
+
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import threading
+import time
+from app.metrics import stage_seconds, stage_errors
+
+class StageEstimator:
+    """Exponentially weighted moving average of how long each stage takes"""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._estimates: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: tuple, seconds: float):
+        with self._lock:
+            previous = self._estimates.get(stage)
+            if previous is None:
+                self._estimates[stage] = seconds
+            else:
+                self._estimates[stage] = previous + self.alpha * (seconds - previous)
+
+    def estimate(self, stage: tuple) -> float:
+        """Expected duration of a stage in seconds (0 until first observed)"""
+        with self._lock:
+            return self._estimates.get(stage, 0.0)
+
+# Shared across requests so estimates reflect recent traffic
+stage_estimates = StageEstimator()
+
+class RequestTrace:
+    """Per-request stage timings, deadline and record of degraded stages
+
+    Each pipeline stage runs inside `trace.stage(name)`. Before an optional
+    stage, `can_run(name)` compares the time left with the stage's recent
+    average so it can be skipped instead of overrunning the deadline.
+    Stage durations also feed the `pipeline_stage_seconds` histogram.
+    """
+
+    def __init__(self, deadline_ms: Optional[int] = None, pipeline: str = "search"):
+        self.pipeline = pipeline
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline_ms / 1000 if deadline_ms else None
+        self.timings: Dict[str, float] = {}
+        self.degraded_stages: List[str] = []
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None when there is no deadline)"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def can_run(self, stage: str) -> bool:
+        """True if the stage is expected to finish before the deadline"""
+        if self.deadline is None:
+            return True
+        return self.remaining() > stage_estimates.estimate((self.pipeline, stage))
+
+    def degrade(self, stage: str):
+        """Record that a stage was skipped or cut short"""
+        if stage not in self.degraded_stages:
+            self.degraded_stages.append(stage)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage"""
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            stage_errors.inc(self.pipeline, name)
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            stage_estimates.observe((self.pipeline, name), elapsed)
+            stage_seconds.observe(elapsed, self.pipeline, name)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
@@ -0,0 +1,49 @@
+# backend/app/responses.py
+
+from datetime import datetime
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+def _default(value):
+    """Fallback for values neither serializer handles natively (ObjectId, numpy scalars, ...)"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+def dumps(content) -> bytes:
+    """Serialize to compact JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`
+
+    Handlers on hot paths return one of these with content already in its
+    final shape, which skips response_model validation and re-encoding.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZip large responses, except streams that must reach the client chunk by chunk"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, excluded_paths=()):
+        super().__init__(app, minimum_size=minimum_size)
+        self.excluded_paths = set(excluded_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,200 @@
+# backend/app/search_events.py
+
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import logging
+from pymongo import UpdateOne, DESCENDING
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+# _id of the search counters document in the stats collection
+SEARCH_STATS_ID = "searches"
+
+class SearchEventLog:
+    """Buffered search telemetry
+
+    `record` only appends to an in-process ring buffer, so the search path
+    never waits on the database. A background task drains the buffer in
+    batches into the events collection, updates per-minute and per-hour
+    rollups, and bumps the total search counter. When the buffer is full the
+    oldest unflushed events are dropped (and counted).
+    """
+
+    def __init__(self, capacity: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 2.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = deque(maxlen=capacity)
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.flushed = 0
+        self.dropped = 0
+
+    def record(self, query: str, latency: float, stage_timings: Dict[str, float],
+               result_count: int, cache_hit: bool = False, degraded_stages: Optional[List[str]] = None):
+        """Queue a search event (non-blocking)"""
+        event = {
+            "query": query,
+            "timestamp": datetime.utcnow(),
+            "latency_ms": round(latency * 1000, 2),
+            "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in stage_timings.items()},
+            "result_count": result_count,
+            "cache_hit": cache_hit,
+            "degraded_stages": degraded_stages or []
+        }
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(event)
+        self.recorded += 1
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def _take_batch(self) -> List[dict]:
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    @staticmethod
+    def _rollup_updates(batch: List[dict]) -> List[UpdateOne]:
+        """Aggregate a batch into per-minute and per-hour rollup increments"""
+        buckets = {}
+        for event in batch:
+            ts = event["timestamp"]
+            for granularity, start in (
+                ("minute", ts.replace(second=0, microsecond=0)),
+                ("hour", ts.replace(minute=0, second=0, microsecond=0)),
+            ):
+                key = (granularity, start)
+                inc = buckets.setdefault(key, {})
+                inc["count"] = inc.get("count", 0) + 1
+                inc["results"] = inc.get("results", 0) + event["result_count"]
+                inc["cache_hits"] = inc.get("cache_hits", 0) + int(event["cache_hit"])
+                inc["degraded"] = inc.get("degraded", 0) + int(bool(event["degraded_stages"]))
+                inc["latency_ms_sum"] = inc.get("latency_ms_sum", 0) + event["latency_ms"]
+                for stage, ms in event["stages_ms"].items():
+                    inc[f"stages_ms_sum.{stage}"] = inc.get(f"stages_ms_sum.{stage}", 0) + ms
+
+        return [
+            UpdateOne(
+                {"_id": f"{granularity}:{start.isoformat()}"},
+                {"$inc": inc, "$setOnInsert": {"granularity": granularity, "bucket": start}},
+                upsert=True
+            )
+            for (granularity, start), inc in buckets.items()
+        ]
+
+    def flush(self) -> int:
+        """Write all buffered events to storage in batches (blocking)"""
+        written = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                break
+            try:
+                db.get_collection(settings.search_events_collection).insert_many(batch, ordered=False)
+                db.get_collection(settings.search_rollups_collection).bulk_write(self._rollup_updates(batch), ordered=False)
+                db.stats.update_one({"_id": SEARCH_STATS_ID}, {"$inc": {"total": len(batch)}}, upsert=True)
+                written += len(batch)
+            except Exception as e:
+                logger.error(f"❌ Failed to flush {len(batch)} search events: {e}")
+                self.dropped += len(batch)
+                break
+
+        self.flushed += written
+        return written
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._buffer:
+                await run_in_threadpool(self.flush)
+
+    def start(self):
+        """Start the background flush task (call from the running event loop)"""
+        if self._task is None:
+            self._create_indexes()
+            self._task = asyncio.create_task(self._run())
+            logger.info("✅ Search event log started")
+
+    async def stop(self):
+        """Stop the background task and flush what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.flush)
+
+    def _create_indexes(self):
+        try:
+            ttl = {}
+            if settings.search_events_ttl_days:
+                ttl["expireAfterSeconds"] = int(timedelta(days=settings.search_events_ttl_days).total_seconds())
+            db.get_collection(settings.search_events_collection).create_index([("timestamp", DESCENDING)], **ttl)
+            db.get_collection(settings.search_rollups_collection).create_index([("granularity", 1), ("bucket", DESCENDING)])
+        except Exception as e:
+            logger.warning(f"⚠️ Could not create search event indexes: {e}")
+
+    def total_searches(self) -> int:
+        """Searches stored so far plus those still waiting in the buffer"""
+        doc = db.stats.find_one({"_id": SEARCH_STATS_ID})
+        stored = doc.get("total", 0) if doc else 0
+        return stored + len(self._buffer)
+
+    def recent_searches(self, limit: int = 10) -> List[dict]:
+        """Most recent searches across all workers, newest first
+
+        Flushed events come from the events collection; this worker's
+        unflushed ones are merged in. Other workers' unflushed events show up
+        after their next flush.
+        """
+        flushed = list(
+            db.get_collection(settings.search_events_collection)
+            .find({}, {"_id": 0})
+            .sort("timestamp", DESCENDING)
+            .limit(limit)
+        )
+        pending = list(self._buffer)[-limit:]
+        events = sorted(flushed + pending, key=lambda event: event["timestamp"], reverse=True)[:limit]
+        return [
+            {
+                "query": event["query"],
+                "timestamp": event["timestamp"],
+                "result_count": event["result_count"],
+                "latency_ms": event["latency_ms"]
+            }
+            for event in events
+        ]
+
+    def get_rollups(self, granularity: str = "hour", limit: int = 24) -> List[dict]:
+        """Latest rollup buckets for the given granularity, newest first"""
+        return list(
+            db.get_collection(settings.search_rollups_collection)
+            .find({"granularity": granularity}, {"_id": 0})
+            .sort("bucket", DESCENDING)
+            .limit(limit)
+        )
+
+    def stats(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "pending": len(self._buffer)
+        }
+
+# Global search event log
+search_events = SearchEventLog(
+    capacity=settings.search_events_buffer_size,
+    batch_size=settings.search_events_batch_size,
+    flush_interval=settings.search_events_flush_seconds
+)
@@ -1,19 +1,23 @@
 # backend/app/search_service.py
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 import numpy as np
+from app.content_compression import content_codec
 from app.database import db
+from app.vector_store import VectorStore, vector_store
 from app.embedding_service import embedding_service
 from app.config import settings
+from app.request_trace import RequestTrace
+from app.logging_config import log_sampled
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SearchService:
     """Handle semantic search operations"""
     
-    def __init__(self):
+    def __init__(self, store: Optional[VectorStore] = None):
+        self.vector_store = store or vector_store
         self.top_k = settings.top_k_results
         # Lower threshold for local embeddings (they produce lower scores)
         self.similarity_threshold = 0.10  # Changed from settings.similarity_threshold
@@ -36,40 +40,54 @@ class SearchService:
             logger.error(f"Error calculating cosine similarity: {e}")
             return 0.0
     
-    def search(self, query: str, top_k: int = None) -> List[Dict]:
-        """Perform semantic search"""
+    def search(self, query: str, top_k: int = None, trace: Optional[RequestTrace] = None) -> List[Dict]:
+        """Perform semantic search
+        
+        Stages are timed on the trace; when it carries a deadline, stages that
+        would overrun it are skipped or cut short and recorded as degraded.
+        """
         try:
             if top_k is None:
                 top_k = self.top_k
+            if trace is None:
+                trace = RequestTrace()
             
-            # Generate embedding for query
-            logger.info(f"🔍 Searching for: '{query}'")
-            query_embedding = embedding_service.generate_embedding(query)
-            
-            # Perform vector search in MongoDB
-            results = db.vector_search(query_embedding, top_k=top_k * 2)  # Get more for filtering
+            # Without time to embed the query, fall back to keyword matching
+            if not trace.can_run("embedding"):
+                logger.warning("⏱️  Not enough time left to embed the query, using keyword search")
+                trace.degrade("embedding")
+                with trace.stage("keyword_scan"):
+                    return self._keyword_search(query, top_k=top_k)
             
-            # Calculate similarity scores and filter
-            scored_results = []
-            for result in results:
-                # Get similarity score (already calculated in database.py)
-                similarity = result.get('similarity_score', 0.0)
+            # Generate embedding for query
+            with trace.stage("embedding"):
+                query_embedding = embedding_service.generate_embedding(query)
+            
+            # Perform vector search with the configured engine
+            results = self.vector_store.search(query_embedding, top_k=top_k * 2, trace=trace)  # Get more for filtering
+            
+            with trace.stage("rerank"):
+                # Calculate similarity scores and filter
+                scored_results = []
+                for result in results:
+                    # Get similarity score (already calculated by the vector store)
+                    similarity = result.get('similarity_score', 0.0)
+                    
+                    # Filter by lowered threshold (0.10 = 10%)
+                    if similarity >= self.similarity_threshold:
+                        scored_results.append(result)
+                        if log_sampled(logger):
+                            logger.debug("✓ Match", extra={"file_name": result.get('file_name', 'Unknown'),
+                                                           "score": round(similarity, 4)})
                 
-                # Filter by lowered threshold (0.10 = 10%)
-                if similarity >= self.similarity_threshold:
-                    scored_results.append(result)
-                    logger.info(f"  ✓ Match: {result.get('file_name', 'Unknown')} - Score: {similarity:.4f}")
-            
-            # Sort by similarity score
-            scored_results.sort(key=lambda x: x['similarity_score'], reverse=True)
-            
-            # Return top-k results
-            final_results = scored_results[:top_k]
+                # Sort by similarity score
+                scored_results.sort(key=lambda x: x['similarity_score'], reverse=True)
+                
+                # Return top-k results
+                final_results = scored_results[:top_k]
             
-            if final_results:
-                logger.info(f"✅ Found {len(final_results)} relevant results (threshold: {self.similarity_threshold})")
-            else:
-                logger.warning(f"⚠️  No results above threshold {self.similarity_threshold}")
+            logger.info("✅ Search finished", extra={"results": len(final_results),
+                                                     "threshold": self.similarity_threshold})
             
             return final_results
             
@@ -77,25 +95,32 @@ class SearchService:
             logger.error(f"Search error: {e}")
             raise
     
-    def hybrid_search(self, query: str, top_k: int = None) -> List[Dict]:
+    def hybrid_search(self, query: str, top_k: int = None, trace: Optional[RequestTrace] = None) -> List[Dict]:
         """Perform hybrid search (semantic + keyword)"""
         try:
             if top_k is None:
                 top_k = self.top_k
+            if trace is None:
+                trace = RequestTrace()
             
             # Semantic search
-            semantic_results = self.search(query, top_k=top_k)
+            semantic_results = self.search(query, top_k=top_k, trace=trace)
             
             # Keyword search (simple text matching)
-            keyword_results = self._keyword_search(query, top_k=top_k)
+            if not trace.can_run("keyword_scan"):
+                trace.degrade("keyword_scan")
+                return semantic_results
+            with trace.stage("keyword_scan"):
+                keyword_results = self._keyword_search(query, top_k=top_k)
             
             # Merge and re-rank results
-            merged_results = self._merge_results(
-                semantic_results, 
-                keyword_results,
-                semantic_weight=0.7,
-                keyword_weight=0.3
-            )
+            with trace.stage("rerank"):
+                merged_results = self._merge_results(
+                    semantic_results, 
+                    keyword_results,
+                    semantic_weight=0.7,
+                    keyword_weight=0.3
+                )
             
             return merged_results[:top_k]
             
@@ -108,11 +133,14 @@ class SearchService:
         try:
             # MongoDB text search
             results = list(db.collection.find(
-                {"$text": {"$search": query}},
+                {"$text": {"$search": query}, "duplicate_of": {"$exists": False}},
                 {"score": {"$meta": "textScore"}}
             ).sort([("score", {"$meta": "textScore"})]).limit(top_k))
             
             for result in results:
+                result['content'] = content_codec.decode(result)
+                result.pop('content_z', None)
+                result.pop('search_terms', None)
                 result['similarity_score'] = result.get('score', 0.5) / 10  # Normalize
             
             return results
@@ -0,0 +1,63 @@
+# backend/app/shard_sync.py
+
+from datetime import datetime
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import logging
+from app.config import settings
+from app.vector_store import VectorStore, vector_store
+
+logger = logging.getLogger(__name__)
+
+class ShardSync:
+    """Keeps an in-process index in step with MongoDB
+
+    An upload or delete only updates the index of the worker that served it,
+    so with the numpy, int8, pca or local sharded engine the other workers
+    would miss it until they restart. Likewise a remote shard (SHARD_PARTITION
+    set) misses changes when the coordinator's call fails or times out. Such
+    stores re-read recent changes every `interval` seconds: documents gone
+    from the catalog are dropped and chunks created or promoted since the last
+    sync are indexed.
+    """
+
+    def __init__(self, store: VectorStore, interval: float, enabled: Optional[bool] = None):
+        self.store = store
+        self.interval = interval
+        if enabled is None:
+            enabled = store.private_index or bool(settings.shard_partition)
+        self.status = {"enabled": enabled and interval > 0, "interval_seconds": interval}
+        self._task: Optional[asyncio.Task] = None
+
+    def sync(self) -> dict:
+        changes = self.store.sync()
+        self.status.update(last_synced=datetime.utcnow().isoformat(), **changes)
+        if changes.get("added") or changes.get("removed"):
+            logger.info("🔄 Vector index caught up with MongoDB", extra=changes)
+        return changes
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(self.sync)
+            except Exception as e:
+                logger.error(f"❌ Vector index sync failed: {e}", exc_info=True)
+
+    def start(self):
+        """Start the periodic sync (call from the running event loop)"""
+        if self.status["enabled"] and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global sync task for in-process indexes and remote shards
+shard_sync = ShardSync(vector_store, settings.shard_sync_interval_seconds)
@@ -0,0 +1,1097 @@
+# backend/app/vector_store.py
+
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor, wait
+import heapq
+import json
+import os
+import shutil
+import tempfile
+import threading
+import logging
+import urllib.request
+import weakref
+import zlib
+import numpy as np
+from app.config import settings
+from app.content_compression import CONTENT_FIELDS, content_codec
+from app.database import db, MongoDB
+from app.metrics import shard_failures
+from app.pca import PCAProjection
+from app.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+def _stage(trace, name: str):
+    """Time a stage on the trace if there is one"""
+    return trace.stage(name) if trace is not None else nullcontext()
+
+def shard_for(document_id: str, shard_count: int) -> int:
+    """Partition of a document: stable across processes, unlike hash()"""
+    return zlib.crc32(str(document_id).encode("utf-8")) % shard_count
+
+def parse_partition(value: str) -> Optional[tuple]:
+    """Parse SHARD_PARTITION ("i/N") into (i, N); empty means the whole corpus"""
+    if not value:
+        return None
+    index, _, count = value.partition("/")
+    index, count = int(index), int(count)
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard partition '{value}': expected i/N with 0 <= i < N")
+    return index, count
+
+# What a search result is built from: everything but vectors and dedup bands
+HYDRATE_FIELDS = {"document_id": 1, "file_name": 1, "chunk_id": 1, "metadata": 1, **CONTENT_FIELDS}
+
+def hydrate(database: MongoDB, ids: list, scores: List[float]) -> List[Dict]:
+    """Fetch content and metadata for the winning chunks, keeping rank order"""
+    docs = {
+        doc['_id']: doc
+        for doc in database.collection.find({"_id": {"$in": ids}}, HYDRATE_FIELDS)
+    }
+    results = []
+    for row_id, score in zip(ids, scores):
+        doc = docs.get(row_id)
+        if doc is None:
+            continue
+        results.append({
+            'document_id': doc.get('document_id', ''),
+            'file_name': doc.get('file_name', 'Unknown'),
+            'chunk_id': doc.get('chunk_id', 0),
+            'content': content_codec.decode(doc),
+            'metadata': doc.get('metadata', {}),
+            'similarity_score': score,
+            'score': score
+        })
+    return results
+
+class VectorStore(ABC):
+    """Interface for vector search engines
+
+    MongoDB stays the system of record for chunks. An engine indexes chunks
+    after they are inserted (`add`), forgets a document after its chunks are
+    deleted (`delete`) and answers nearest-neighbour queries (`search`).
+    Search results carry document_id, file_name, chunk_id, content, metadata
+    and similarity_score, best first.
+    
+    Filters map `document_id` or `file_name` to a value or {"$in": [...]}.
+    Engines time their own "vector_scan" (and "hydrate") stages on the trace.
+    """
+
+    name = "base"
+
+    # Whether export_state/restore_state work (see app.index_snapshot)
+    supports_snapshots = False
+
+    # Whether switch_vectors works (see app.reembedding)
+    supports_model_switch = False
+
+    # Whether SHARD_PARTITION is honoured, so the instance can serve as a remote shard
+    supports_partition = False
+
+    # Whether each process holds its own copy of the index, so it misses other
+    # workers' uploads and deletes until sync() runs (see app.shard_sync)
+    private_index = False
+
+    # Chunk field the vectors are read from; "next_embedding" while a model switch is serving new vectors
+    vector_field = "embedding"
+
+    def __init__(self, database: Optional[MongoDB] = None):
+        self.database = database or db
+
+    def load(self):
+        """Build any in-memory state from the database (called at startup)"""
+
+    @abstractmethod
+    def add(self, chunks: List[dict]) -> int:
+        """Index chunks that were just inserted; returns how many were indexed"""
+
+    @abstractmethod
+    def delete(self, document_id: str) -> int:
+        """Drop a document's chunks from the index; returns how many were dropped"""
+
+    @abstractmethod
+    def search(self, query_embedding: List[float], top_k: int = 5,
+               filters: Optional[dict] = None, trace=None) -> List[Dict]:
+        """Return the top_k chunks most similar to the query embedding"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of indexed vectors"""
+
+    def switch_vectors(self, field: str):
+        """Serve the vectors in chunk field `field` from now on (embedding model switch)"""
+        raise NotImplementedError(f"The {self.name} vector store cannot switch embedding models while running")
+
+    def sync(self) -> dict:
+        """Catch up with writes this store missed; returns what changed (engines that keep state override it)"""
+        return {}
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "vectors": self.count()}
+
+class MongoScanVectorStore(VectorStore):
+    """Brute-force cosine scan over the chunk collection
+
+    The collection is the index, so add/delete have nothing to do.
+    """
+
+    name = "mongo"
+
+    supports_model_switch = True
+
+    def add(self, chunks: List[dict]) -> int:
+        return len(chunks)
+
+    def switch_vectors(self, field: str):
+        self.vector_field = field
+
+    def delete(self, document_id: str) -> int:
+        return 0
+
+    def count(self) -> int:
+        return self.database.collection.estimated_document_count()
+
+    def search(self, query_embedding: List[float], top_k: int = 5,
+               filters: Optional[dict] = None, trace=None) -> List[Dict]:
+        """Perform vector similarity search using manual cosine similarity
+
+        With a RequestTrace that has a deadline, the scan stops early once the
+        deadline passes and returns the best matches seen so far.
+        """
+        with _stage(trace, "vector_scan"):
+            return self._scan(query_embedding, top_k, filters, trace)
+
+    def _scan(self, query_embedding: List[float], top_k: int,
+              filters: Optional[dict], trace) -> List[Dict]:
+        try:
+            # Stream chunks from the database so the scan can be cut short; only
+            # the served vectors are read, not dedup bands or a model switch's copies
+            cursor = self.database.collection.find(filters or {}, {**HYDRATE_FIELDS, self.vector_field: 1})
+
+            # Calculate cosine similarity manually for each document
+            results_with_scores = []
+            query_vec = np.array(query_embedding)
+            scanned = 0
+
+            for doc in cursor:
+                scanned += 1
+                if trace is not None and scanned % 256 == 0 and trace.expired():
+                    logger.warning(f"⏱️  Deadline reached, vector scan cut short after {scanned} chunks")
+                    trace.degrade("vector_scan")
+                    cursor.close()
+                    break
+
+                if doc.get(self.vector_field):
+                    try:
+                        doc_vec = np.array(doc[self.vector_field])
+
+                        # Calculate cosine similarity
+                        dot_product = np.dot(query_vec, doc_vec)
+                        query_norm = np.linalg.norm(query_vec)
+                        doc_norm = np.linalg.norm(doc_vec)
+
+                        if query_norm > 0 and doc_norm > 0:
+                            similarity = dot_product / (query_norm * doc_norm)
+                        else:
+                            similarity = 0.0
+
+                        results_with_scores.append({
+                            'document_id': doc.get('document_id', ''),
+                            'file_name': doc.get('file_name', 'Unknown'),
+                            'chunk_id': doc.get('chunk_id', 0),
+                            # Decoded below, for the returned chunks only
+                            'content': {field: doc[field] for field in CONTENT_FIELDS if field in doc},
+                            'metadata': doc.get('metadata', {}),
+                            'similarity_score': float(similarity),
+                            'score': float(similarity)
+                        })
+                    except Exception as e:
+                        logger.warning(f"Error processing document chunk: {e}")
+                        continue
+
+            if scanned == 0:
+                logger.warning("⚠️  No documents found in database")
+                return []
+
+            logger.debug("🔍 Vector scan finished", extra={"scanned": scanned})
+
+            # Sort by similarity score (highest first)
+            results_with_scores.sort(key=lambda x: x['similarity_score'], reverse=True)
+
+            # Return top-k results
+            top_results = results_with_scores[:top_k]
+            for result in top_results:
+                result['content'] = content_codec.decode(result['content'])
+
+            return top_results
+
+        except Exception as e:
+            logger.error(f"❌ Vector search failed: {e}")
+            # Fallback: Return recent documents if search fails
+            try:
+                fallback_results = list(self.database.collection.find(filters or {}).limit(top_k))
+                for doc in fallback_results:
+                    doc['content'] = content_codec.decode(doc)
+                logger.info(f"Using fallback: returning {len(fallback_results)} recent documents")
+                return fallback_results
+            except:
+                return []
+
+class NumpyVectorStore(VectorStore):
+    """In-process index: all embeddings in one normalized float32 matrix
+
+    A query is a single matrix-vector product plus a partial sort; only the
+    top_k winners are read back ("hydrated") from MongoDB.
+
+    With a partition (i, N), only documents with shard_for(document_id, N) == i
+    are indexed, so an instance can serve as one shard of a sharded index.
+    """
+
+    name = "numpy"
+
+    supports_snapshots = True
+    supports_model_switch = True
+    supports_partition = True
+    private_index = True
+
+    # Catch-ups also look at chunks created this long before their starting point,
+    # to cover uploads that were in flight
+    CATCH_UP_MARGIN = timedelta(minutes=5)
+
+    def __init__(self, database: Optional[MongoDB] = None, partition: Optional[tuple] = None):
+        super().__init__(database)
+        self.partition = partition if partition is not None else parse_partition(settings.shard_partition)
+        self._lock = threading.Lock()
+        self._set_index(np.zeros((0, 0), dtype=np.float32), [], [], [])
+        # Chunks created before this were all read from MongoDB; later ones only arrive through add()
+        self.synced_at: Optional[datetime] = None
+
+    def _set_index(self, matrix: np.ndarray, ids: list, document_ids: list, file_names: list):
+        # Searches read this tuple once, so a swap never exposes a half-built index
+        self._index = (matrix, ids, np.array(document_ids, dtype=object), np.array(file_names, dtype=object))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _rows(self, chunks) -> tuple:
+        ids, document_ids, file_names, vectors = [], [], [], []
+        for chunk in chunks:
+            if not chunk.get(self.vector_field):
+                continue
+            if self.partition and shard_for(chunk.get('document_id', ''), self.partition[1]) != self.partition[0]:
+                continue
+            ids.append(chunk['_id'])
+            document_ids.append(chunk.get('document_id', ''))
+            file_names.append(chunk.get('file_name', 'Unknown'))
+            vectors.append(chunk[self.vector_field])
+        matrix = np.asarray(vectors, dtype=np.float32) if vectors else None
+        return ids, document_ids, file_names, matrix
+
+    def load(self):
+        """Read every embedding from MongoDB into memory"""
+        started = datetime.utcnow()
+        cursor = self.database.collection.find(
+            {self.vector_field: {"$exists": True}},
+            {self.vector_field: 1, "document_id": 1, "file_name": 1}
+        )
+        ids, document_ids, file_names, matrix = self._rows(cursor)
+        with self._lock:
+            if matrix is None:
+                self._set_index(np.zeros((0, 0), dtype=np.float32), [], [], [])
+            else:
+                self._set_index(self._normalize(matrix), ids, document_ids, file_names)
+        self.synced_at = started
+        logger.info(f"✅ NumPy vector index loaded with {len(ids)} vectors")
+
+    @staticmethod
+    def _unindexed(ids: list, indexed: list) -> list:
+        """Positions in `ids` of chunks not indexed yet (catch-ups may offer a chunk twice)"""
+        known = set(indexed)
+        fresh = []
+        for position, row_id in enumerate(ids):
+            if row_id not in known:
+                known.add(row_id)
+                fresh.append(position)
+        return fresh
+
+    def add(self, chunks: List[dict]) -> int:
+        ids, document_ids, file_names, matrix = self._rows(chunks)
+        if matrix is None:
+            return 0
+        with self._lock:
+            current, cur_ids, cur_docs, cur_names = self._index
+            fresh = self._unindexed(ids, cur_ids)
+            if not fresh:
+                return 0
+            rows = self._normalize(matrix[fresh])
+            merged = np.vstack([current, rows]) if len(cur_ids) else rows
+            self._set_index(
+                merged,
+                cur_ids + [ids[i] for i in fresh],
+                list(cur_docs) + [document_ids[i] for i in fresh],
+                list(cur_names) + [file_names[i] for i in fresh]
+            )
+        return len(fresh)
+
+    def delete(self, document_id: str) -> int:
+        return self._remove(lambda document_ids: document_ids != document_id)
+
+    def _remove(self, keep_rows) -> int:
+        """Drop the rows whose document ids fail `keep_rows` (vectorized); returns how many were dropped"""
+        with self._lock:
+            matrix, ids, document_ids, file_names = self._index
+            keep = keep_rows(document_ids)
+            removed = int(len(ids) - keep.sum())
+            if removed:
+                self._set_index(
+                    matrix[keep],
+                    [row_id for row_id, kept in zip(ids, keep) if kept],
+                    list(document_ids[keep]),
+                    list(file_names[keep])
+                )
+        return removed
+
+    def prune(self) -> int:
+        """Drop documents that are no longer in the catalog; returns how many rows were dropped"""
+        live = [doc["_id"] for doc in self.database.documents.find({}, {"_id": 1})]
+        return self._remove(lambda document_ids: np.isin(document_ids, live))
+
+    def replay(self, since: datetime) -> int:
+        """Index chunks created (or promoted from duplicates) since `since` that are missing"""
+        cursor = self.database.collection.find(
+            {"$or": [{"created_at": {"$gte": since}}, {"promoted_at": {"$gte": since}}],
+             self.vector_field: {"$exists": True}},
+            {self.vector_field: 1, "document_id": 1, "file_name": 1}
+        )
+        return self.add(list(cursor))
+
+    def sync(self) -> dict:
+        """Catch up with deletes and uploads this store missed since it last read MongoDB"""
+        started = datetime.utcnow()
+        removed = self.prune()
+        added = self.replay((self.synced_at or started) - self.CATCH_UP_MARGIN)
+        self.synced_at = started
+        return {"added": added, "removed": removed}
+
+    def _snapshot(self) -> tuple:
+        """The (matrix, ids, document_ids, file_names) index a search reads"""
+        return self._index
+
+    def count(self) -> int:
+        return len(self._snapshot()[1])
+
+    def export_state(self) -> tuple:
+        """(normalized float32 matrix, ids, document_ids, file_names) of every indexed row"""
+        matrix, ids, document_ids, file_names = self._snapshot()
+        return matrix, list(ids), list(document_ids), list(file_names)
+
+    def restore_state(self, matrix: np.ndarray, ids: list, document_ids: list, file_names: list):
+        """Replace the index with previously exported state"""
+        with self._lock:
+            if len(ids):
+                self._set_index(np.asarray(matrix, dtype=np.float32), ids, document_ids, file_names)
+            else:
+                self._set_index(np.zeros((0, 0), dtype=np.float32), [], [], [])
+
+    def _model_changed(self):
+        """Drop state derived from the previous embedding model (called under the lock)"""
+
+    def switch_vectors(self, field: str):
+        """Build an index of `field` beside the serving one, then swap it in
+
+        Searches keep using the current index while the new one loads. Chunks
+        added during the build are caught up afterwards.
+        """
+        shadow = NumpyVectorStore(self.database, self.partition)
+        shadow.vector_field = field
+        shadow.load()
+        matrix, ids, document_ids, file_names = shadow.export_state()
+        with self._lock:
+            self._model_changed()
+            self.vector_field = field
+            if len(ids):
+                self._set_index(matrix, ids, document_ids, file_names)
+            else:
+                self._set_index(np.zeros((0, 0), dtype=np.float32), [], [], [])
+            self.synced_at = shadow.synced_at
+        # add() skips chunks already indexed, including uploads added since the swap
+        self.replay(shadow.synced_at - self.CATCH_UP_MARGIN)
+
+    def _filter_mask(self, filters: dict, document_ids: np.ndarray, file_names: np.ndarray) -> np.ndarray:
+        columns = {"document_id": document_ids, "file_name": file_names}
+        mask = np.ones(len(document_ids), dtype=bool)
+        for field, condition in filters.items():
+            column = columns.get(field)
+            if column is None:
+                raise ValueError(f"Unsupported filter field: {field}")
+            if isinstance(condition, dict):
+                mask &= np.isin(column, list(condition.get("$in", [])))
+            else:
+                mask &= column == condition
+        return mask
+
+    def search(self, query_embedding: List[float], top_k: int = 5,
+               filters: Optional[dict] = None, trace=None) -> List[Dict]:
+        with _stage(trace, "vector_scan"):
+            ids, scores = self.rank(query_embedding, top_k, filters)
+        if not ids:
+            return []
+
+        with _stage(trace, "hydrate"):
+            return hydrate(self.database, ids, scores)
+
+    def rank(self, query_embedding: List[float], top_k: int,
+             filters: Optional[dict] = None) -> tuple:
+        """Chunk ids and scores of the top_k matches, best first, without hydrating"""
+        matrix, ids, document_ids, file_names = self._snapshot()
+        if not ids or top_k <= 0:
+            return [], []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        scores = matrix @ query
+        if filters:
+            scores = np.where(self._filter_mask(filters, document_ids, file_names), scores, -np.inf)
+
+        k = min(top_k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = [int(i) for i in top if np.isfinite(scores[i])]
+        return [ids[i] for i in top], [float(scores[i]) for i in top]
+
+class _MappedVectors:
+    """Float32 vectors kept in a file and memory-mapped, for exact rescoring
+
+    Each write creates a new file and unlinks the previous one; searches
+    still holding the old mapping keep reading it after the unlink.
+    """
+
+    def __init__(self, directory: str = ""):
+        self.directory = tempfile.mkdtemp(prefix="vector-index-", dir=directory or None)
+        weakref.finalize(self, shutil.rmtree, self.directory, True)
+        self._version = 0
+
+    def write(self, matrix: np.ndarray) -> np.ndarray:
+        """Write the vectors and map them back read-only"""
+        if not len(matrix):
+            # Zero-length arrays cannot be memory-mapped
+            return np.zeros((0, 0), dtype=np.float32)
+        previous = os.path.join(self.directory, f"vectors-{self._version}.npy")
+        self._version += 1
+        path = os.path.join(self.directory, f"vectors-{self._version}.npy")
+        np.save(path, np.ascontiguousarray(matrix, dtype=np.float32))
+        if os.path.exists(previous):
+            os.remove(previous)
+        return np.load(path, mmap_mode="r")
+
+def _rescore(approx: np.ndarray, full: np.ndarray, query: np.ndarray, ids: list,
+             top_k: int, candidates: int) -> tuple:
+    """Rescore the best approximate hits exactly and keep the top_k"""
+    n_candidates = min(max(top_k, candidates), len(ids))
+    shortlist = np.argpartition(-approx, n_candidates - 1)[:n_candidates]
+    shortlist = np.sort(shortlist[np.isfinite(approx[shortlist])])  # Sequential reads from the mmap
+    if not len(shortlist):
+        return [], []
+
+    exact = full[shortlist] @ query
+    k = min(top_k, len(shortlist))
+    best = np.argpartition(-exact, k - 1)[:k]
+    best = best[np.argsort(-exact[best])]
+    return [ids[int(shortlist[i])] for i in best], [float(exact[i]) for i in best]
+
+def _unit(query_embedding: List[float]) -> np.ndarray:
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    return query / norm if norm > 0 else query
+
+class Int8VectorStore(NumpyVectorStore):
+    """Scalar-quantized in-memory scan with exact float32 rescoring
+
+    Every normalized embedding is kept as int8 codes with one scale per
+    dimension (code = round(x / scale), scale = max |x| / 127 over the
+    corpus), a quarter of the float32 footprint. A query is scored against
+    the codes in blocks, then the best INT8_RESCORE_CANDIDATES are rescored
+    exactly against float32 vectors memory-mapped from disk, so returned
+    scores are exact and only the candidate rows are paged in.
+    """
+
+    name = "int8"
+
+    BLOCK_ROWS = 512  # Upcast blocks small enough to stay in cache
+
+    def __init__(self, database: Optional[MongoDB] = None, partition: Optional[tuple] = None,
+                 rescore_candidates: Optional[int] = None):
+        self.rescore_candidates = rescore_candidates or settings.int8_rescore_candidates
+        self._full = _MappedVectors(settings.rescore_vectors_dir)
+        super().__init__(database, partition)
+
+    def _set_index(self, matrix: np.ndarray, ids: list, document_ids: list, file_names: list):
+        if len(ids):
+            scales = np.abs(matrix).max(axis=0) / 127
+            scales[scales == 0] = 1.0
+            codes = np.clip(np.rint(matrix / scales), -127, 127).astype(np.int8)
+        else:
+            scales = np.ones(0, dtype=np.float32)
+            codes = np.zeros((0, 0), dtype=np.int8)
+        super()._set_index(self._full.write(matrix), ids, document_ids, file_names)
+        # rank() reads this tuple once, so codes and the rescoring matrix always match
+        self._quantized = (codes, scales.astype(np.float32), *self._index)
+
+    def rank(self, query_embedding: List[float], top_k: int,
+             filters: Optional[dict] = None) -> tuple:
+        codes, scales, full, ids, document_ids, file_names = self._quantized
+        if not ids or top_k <= 0:
+            return [], []
+        query = _unit(query_embedding)
+
+        # Folding the scales into the query leaves one product per block
+        scaled_query = query * scales
+        approx = np.empty(len(ids), dtype=np.float32)
+        for start in range(0, len(ids), self.BLOCK_ROWS):
+            block = codes[start:start + self.BLOCK_ROWS]
+            approx[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        if filters:
+            approx = np.where(self._filter_mask(filters, document_ids, file_names), approx, -np.inf)
+        return _rescore(approx, full, query, ids, top_k, self.rescore_candidates)
+
+    def stats(self) -> dict:
+        codes, scales = self._quantized[:2]
+        return {
+            **super().stats(),
+            "rescore_candidates": self.rescore_candidates,
+            "quantized_bytes": int(codes.nbytes + scales.nbytes)
+        }
+
+class PCAVectorStore(NumpyVectorStore):
+    """Reduced-dimension first pass with exact full-dimension rescoring
+
+    Vectors are projected onto PCA_DIMENSIONS principal components (see
+    app.pca) and a query scans that small matrix first; the best
+    PCA_RESCORE_CANDIDATES are rescored at full dimension against float32
+    vectors memory-mapped from disk. The projection is loaded from
+    PCA_PROJECTION_PATH. If there is none, it is fitted on the corpus once
+    there are enough vectors (and saved there if the path is set); until
+    then searches are exact.
+    """
+
+    name = "pca"
+
+    MIN_FIT_FACTOR = 10  # Fit only with at least this many vectors per reduced dimension
+
+    def __init__(self, database: Optional[MongoDB] = None, partition: Optional[tuple] = None,
+                 rescore_candidates: Optional[int] = None, projection: Optional[PCAProjection] = None):
+        self.rescore_candidates = rescore_candidates or settings.pca_rescore_candidates
+        self.projection = projection or PCAProjection.load(settings.pca_projection_path)
+        self._full = _MappedVectors(settings.rescore_vectors_dir)
+        super().__init__(database, partition)
+
+    def _ensure_projection(self, matrix: np.ndarray):
+        if self.projection is not None and self.projection.input_dimensions != matrix.shape[1]:
+            logger.warning("⚠️  PCA projection does not match the embedding size, refitting",
+                           extra={"projection": self.projection.input_dimensions, "embeddings": matrix.shape[1]})
+            self.projection = None
+        if (self.projection is None and settings.pca_dimensions < matrix.shape[1]
+                and len(matrix) >= self.MIN_FIT_FACTOR * settings.pca_dimensions):
+            self.projection = PCAProjection.fit(matrix, settings.pca_dimensions)
+            if settings.pca_projection_path:
+                self.projection.save(settings.pca_projection_path)
+            logger.info("✅ PCA projection fitted", extra={
+                "dimensions": self.projection.dimensions,
+                "explained_variance": round(self.projection.explained_variance, 4)
+            })
+
+    def _model_changed(self):
+        # A projection fitted on the old model's vectors says nothing about the new one's
+        self.projection = None
+
+    def _set_index(self, matrix: np.ndarray, ids: list, document_ids: list, file_names: list):
+        reduced = None
+        if len(ids):
+            self._ensure_projection(matrix)
+            if self.projection is not None:
+                reduced = self.projection.project_corpus(matrix)
+        super()._set_index(self._full.write(matrix), ids, document_ids, file_names)
+        # rank() reads this tuple once, so the reduced and full matrices always match
+        self._reduced = (reduced, self.projection, *self._index)
+
+    def rank(self, query_embedding: List[float], top_k: int,
+             filters: Optional[dict] = None) -> tuple:
+        reduced, projection, full, ids, document_ids, file_names = self._reduced
+        if reduced is None:
+            return super().rank(query_embedding, top_k, filters)
+        if not ids or top_k <= 0:
+            return [], []
+        query = _unit(query_embedding)
+
+        approx = reduced @ projection.project_query(query)
+        if filters:
+            approx = np.where(self._filter_mask(filters, document_ids, file_names), approx, -np.inf)
+        return _rescore(approx, full, query, ids, top_k, self.rescore_candidates)
+
+    def stats(self) -> dict:
+        reduced, projection = self._reduced[:2]
+        return {
+            **super().stats(),
+            "rescore_candidates": self.rescore_candidates,
+            "dimensions": projection.dimensions if projection is not None else None,
+            "explained_variance": round(projection.explained_variance, 4) if projection is not None else None,
+            "reduced_bytes": int(reduced.nbytes) if reduced is not None else 0
+        }
+
+def _default_shared_dir(database_name: str) -> str:
+    """tmpfs (/dev/shm) when available so the index lives in shared memory, not on disk"""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"enterprise-ai-search-{database_name}")
+
+class FileLock:
+    """Exclusive advisory lock on a file, held across processes (POSIX flock)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __enter__(self):
+        import fcntl
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        import fcntl
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+class SharedMemoryVectorStore(NumpyVectorStore):
+    """NumPy index memory-mapped from one shared file, for multi-worker deployments
+
+    Each version of the index is an immutable .npy matrix plus a JSON file of
+    row ids in SHARED_INDEX_DIR (tmpfs by default). A small manifest names the
+    current version. Every worker maps the matrix read-only, so the vectors
+    occupy physical memory once per host however many workers there are.
+
+    Writers (startup rebuilds, uploads, deletes) take a file lock, build the
+    next version from the current one and publish it by atomically replacing
+    the manifest. Readers notice the manifest change on their next search and
+    remap; a search already running keeps the old mapping, which stays valid
+    after its file is unlinked.
+    """
+
+    name = "shared"
+
+    # The mapped index files already outlive worker restarts
+    supports_snapshots = False
+    supports_model_switch = False
+    # Every worker maps the same index, so writes are seen on the next search
+    private_index = False
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, database: Optional[MongoDB] = None, directory: Optional[str] = None,
+                 partition: Optional[tuple] = None):
+        super().__init__(database, partition)
+        self.directory = directory or settings.shared_index_dir or _default_shared_dir(self.database.database_name)
+        if self.partition:
+            self.directory = os.path.join(self.directory, f"shard-{self.partition[0]}-of-{self.partition[1]}")
+        os.makedirs(self.directory, exist_ok=True)
+        self._manifest_path = os.path.join(self.directory, self.MANIFEST)
+        self._manifest_stamp = None
+        self.generation = 0
+
+    def _writer_lock(self) -> FileLock:
+        return FileLock(os.path.join(self.directory, "writer.lock"))
+
+    def _snapshot(self) -> tuple:
+        self._refresh()
+        return self._index
+
+    def _refresh(self):
+        """Attach to the published version if it changed since the last look"""
+        try:
+            stat = os.stat(self._manifest_path)
+        except FileNotFoundError:
+            return
+        stamp = (stat.st_mtime_ns, stat.st_ino)
+        if stamp == self._manifest_stamp:
+            return
+        with self._lock:
+            if stamp == self._manifest_stamp:
+                return
+            try:
+                with open(self._manifest_path) as f:
+                    manifest = json.load(f)
+                self._attach(manifest)
+            except FileNotFoundError:
+                # Raced with a writer removing that version; keep ours and retry next search
+                return
+            self._manifest_stamp = stamp
+
+    def _attach(self, manifest: dict):
+        with open(os.path.join(self.directory, manifest["meta"])) as f:
+            meta = json.load(f)
+        if manifest["count"]:
+            matrix = np.load(os.path.join(self.directory, manifest["vectors"]), mmap_mode="r")
+        else:
+            # Zero-length arrays cannot be memory-mapped
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        ids = [ObjectId(row_id) if ObjectId.is_valid(row_id) else row_id for row_id in meta["ids"]]
+        self._set_index(matrix, ids, meta["document_ids"], meta["file_names"])
+        self.generation = manifest["generation"]
+
+    def _publish(self, matrix: np.ndarray, ids: list, document_ids: list, file_names: list):
+        """Write the next version and swap the manifest to it (caller holds the writer lock)"""
+        generation = self.generation + 1
+        vectors_name = f"vectors-{generation}.npy"
+        meta_name = f"meta-{generation}.json"
+        np.save(os.path.join(self.directory, vectors_name), np.ascontiguousarray(matrix, dtype=np.float32))
+        with open(os.path.join(self.directory, meta_name), "w") as f:
+            json.dump({
+                "ids": [str(row_id) for row_id in ids],
+                "document_ids": list(document_ids),
+                "file_names": list(file_names)
+            }, f)
+
+        manifest = {"generation": generation, "vectors": vectors_name, "meta": meta_name, "count": len(ids)}
+        tmp_path = self._manifest_path + f".{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+        self._refresh()
+
+        # Keep the previous version for workers that are attaching right now;
+        # workers still mapping anything older keep their pages until they remap
+        keep = {f"{prefix}-{g}.{ext}" for g in (generation, generation - 1)
+                for prefix, ext in (("vectors", "npy"), ("meta", "json"))}
+        for entry in os.listdir(self.directory):
+            if entry.startswith(("vectors-", "meta-")) and entry not in keep:
+                os.remove(os.path.join(self.directory, entry))
+
+    def load(self):
+        """Attach to the shared index, rebuilding it from MongoDB if it is missing or stale
+
+        The first worker to start rebuilds; the others find a version whose
+        vector count matches the database and attach to it.
+        """
+        started = datetime.utcnow()
+        with self._writer_lock():
+            self._refresh()
+            expected = self._expected_count()
+            if self._manifest_stamp is not None and self.count() == expected:
+                self.synced_at = started
+                logger.info(f"✅ Attached to shared vector index v{self.generation} with {self.count()} vectors")
+                return
+            cursor = self.database.collection.find(
+                {"embedding": {"$exists": True}},
+                {"embedding": 1, "document_id": 1, "file_name": 1}
+            )
+            ids, document_ids, file_names, matrix = self._rows(cursor)
+            if matrix is None:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+            else:
+                matrix = self._normalize(matrix)
+            self._publish(matrix, ids, document_ids, file_names)
+        self.synced_at = started
+        logger.info(f"✅ Shared vector index v{self.generation} built with {len(ids)} vectors")
+
+    def _expected_count(self) -> int:
+        """Embedded chunks in the database that belong in this index"""
+        embedded = {"embedding": {"$exists": True}}
+        if not self.partition:
+            return self.database.collection.count_documents(embedded)
+        index, count = self.partition
+        return sum(
+            1 for doc in self.database.collection.find(embedded, {"document_id": 1})
+            if shard_for(doc.get('document_id', ''), count) == index
+        )
+
+    def add(self, chunks: List[dict]) -> int:
+        ids, document_ids, file_names, matrix = self._rows(chunks)
+        if matrix is None:
+            return 0
+        with self._writer_lock():
+            current, cur_ids, cur_docs, cur_names = self._snapshot()
+            fresh = self._unindexed(ids, cur_ids)
+            if not fresh:
+                return 0
+            rows = self._normalize(matrix[fresh])
+            self._publish(
+                np.vstack([current, rows]) if len(cur_ids) else rows,
+                cur_ids + [ids[i] for i in fresh],
+                list(cur_docs) + [document_ids[i] for i in fresh],
+                list(cur_names) + [file_names[i] for i in fresh]
+            )
+        return len(fresh)
+
+    def _remove(self, keep_rows) -> int:
+        with self._writer_lock():
+            matrix, ids, document_ids, file_names = self._snapshot()
+            keep = keep_rows(document_ids)
+            removed = int(len(ids) - keep.sum())
+            if removed:
+                self._publish(
+                    matrix[keep],
+                    [row_id for row_id, kept in zip(ids, keep) if kept],
+                    list(document_ids[keep]),
+                    list(file_names[keep])
+                )
+        return removed
+
+    def stats(self) -> dict:
+        matrix = self._snapshot()[0]
+        return {
+            **super().stats(),
+            "generation": self.generation,
+            "directory": self.directory,
+            "shared_bytes": int(matrix.nbytes)
+        }
+
+class _LocalShard:
+    """One partition of the corpus held in this process"""
+
+    def __init__(self, database: MongoDB, partition: tuple):
+        self.label = f"local-{partition[0]}"
+        self.store = NumpyVectorStore(database, partition)
+
+    def reset(self):
+        self.store._set_index(np.zeros((0, 0), dtype=np.float32), [], [], [])
+
+    def search(self, query_embedding: List[float], top_k: int, filters: Optional[dict]) -> List[Dict]:
+        # Unhydrated hits; the coordinator hydrates the merged winners in one query
+        ids, scores = self.store.rank(query_embedding, top_k, filters)
+        return [{'_id': row_id, 'similarity_score': score} for row_id, score in zip(ids, scores)]
+
+    def add(self, chunks: List[dict]) -> int:
+        return self.store.add(chunks)
+
+    def delete(self, document_id: str) -> int:
+        return self.store.delete(document_id)
+
+    def count(self) -> int:
+        return self.store.count()
+
+class _RemoteShard:
+    """A partition served over HTTP by another instance started with SHARD_PARTITION=i/N"""
+
+    def __init__(self, url: str, index: int):
+        self.label = f"remote-{index}"
+        self.url = url.rstrip("/")
+
+    def _call(self, path: str, payload: Optional[dict] = None):
+        headers = {"Content-Type": "application/json"}
+        if settings.shard_token:
+            headers["X-Shard-Token"] = settings.shard_token
+        request = urllib.request.Request(
+            self.url + path,
+            data=dumps(payload) if payload is not None else None,
+            headers=headers,
+            method="POST" if payload is not None else "GET"
+        )
+        with urllib.request.urlopen(request, timeout=settings.shard_timeout_ms / 1000) as response:
+            return json.loads(response.read())
+
+    def search(self, query_embedding: List[float], top_k: int, filters: Optional[dict]) -> List[Dict]:
+        payload = {"embedding": [float(x) for x in query_embedding], "top_k": top_k, "filters": filters}
+        return self._call("/shard/search", payload)["results"]
+
+    def add(self, chunks: List[dict]) -> int:
+        # The shard reads the chunks back from the shared database
+        return self._call("/shard/add", {"ids": [str(chunk['_id']) for chunk in chunks]})["added"]
+
+    def delete(self, document_id: str) -> int:
+        return self._call("/shard/delete", {"document_id": document_id})["deleted"]
+
+    def count(self) -> int:
+        return self._call("/shard/stats")["vectors"]
+
+class ShardedVectorStore(VectorStore):
+    """Scatter-gather over N index shards partitioned by document_id
+
+    Shards are NumpyVectorStore partitions in this process (SEARCH_SHARDS),
+    searched in parallel threads since NumPy releases the GIL, or remote
+    instances listed in SHARD_URLS, each started with SHARD_PARTITION=i/N.
+    Every shard returns its own top_k and the coordinator merges them with
+    a heap. A shard that errors or misses SHARD_TIMEOUT_MS (or the request
+    deadline) is left out and recorded as a degraded "shard:<label>" stage,
+    so the response carries partial results instead of failing.
+    """
+
+    name = "sharded"
+
+    def __init__(self, database: Optional[MongoDB] = None, shard_urls: Optional[List[str]] = None,
+                 shard_count: Optional[int] = None):
+        super().__init__(database)
+        if shard_urls is None:
+            shard_urls = [url.strip() for url in settings.shard_urls.split(",") if url.strip()]
+        self.remote = bool(shard_urls)
+        # Remote shards each follow the switch in their own process and sync themselves
+        self.supports_model_switch = not self.remote
+        self.private_index = not self.remote
+        if self.remote:
+            self.shards = [_RemoteShard(url, i) for i, url in enumerate(shard_urls)]
+        else:
+            shard_count = shard_count or settings.search_shards
+            self.shards = [_LocalShard(self.database, (i, shard_count)) for i in range(shard_count)]
+        # Room for a few concurrent requests to fan out at once
+        self._pool = ThreadPoolExecutor(max_workers=4 * len(self.shards), thread_name_prefix="shard")
+
+    def _owner(self, document_id: str):
+        return self.shards[shard_for(document_id, len(self.shards))]
+
+    def load(self):
+        """Read the corpus once and route each chunk to its local shard"""
+        if self.remote:
+            logger.info(f"✅ Sharded search over {len(self.shards)} remote shards")
+            return
+        started = datetime.utcnow()
+        buckets = [[] for _ in self.shards]
+        cursor = self.database.collection.find(
+            {self.vector_field: {"$exists": True}},
+            {self.vector_field: 1, "document_id": 1, "file_name": 1}
+        )
+        for chunk in cursor:
+            buckets[shard_for(chunk.get('document_id', ''), len(self.shards))].append(chunk)
+        for shard, bucket in zip(self.shards, buckets):
+            shard.reset()
+            shard.add(bucket)
+            shard.store.synced_at = started
+        logger.info("✅ Sharded vector index loaded", extra={"shards": [shard.count() for shard in self.shards]})
+
+    def add(self, chunks: List[dict]) -> int:
+        groups = {}
+        for chunk in chunks:
+            groups.setdefault(shard_for(chunk.get('document_id', ''), len(self.shards)), []).append(chunk)
+        return sum(self._write(self.shards[index], "add", group) for index, group in groups.items())
+
+    def delete(self, document_id: str) -> int:
+        return self._write(self._owner(document_id), "delete", document_id)
+
+    def _write(self, shard, operation: str, argument) -> int:
+        """Apply an add or delete to one shard
+
+        The database write already happened, so a remote shard that fails is
+        counted and skipped rather than failing the request; it catches up
+        from MongoDB on its next sync (see app.shard_sync).
+        """
+        try:
+            return getattr(shard, operation)(argument)
+        except Exception as e:
+            if not self.remote:
+                raise
+            logger.warning("⚠️  Shard write failed", extra={"shard": shard.label, "operation": operation, "error": str(e)})
+            shard_failures.inc(shard.label, f"{operation}_error")
+            return 0
+
+    @property
+    def vector_field(self) -> str:
+        return VectorStore.vector_field if self.remote else self.shards[0].store.vector_field
+
+    @vector_field.setter
+    def vector_field(self, field: str):
+        if not self.remote:
+            for shard in self.shards:
+                shard.store.vector_field = field
+
+    def switch_vectors(self, field: str):
+        if self.remote:
+            super().switch_vectors(field)
+        for shard in self.shards:
+            shard.store.switch_vectors(field)
+
+    def sync(self) -> dict:
+        if self.remote:
+            return {}
+        changes = [shard.store.sync() for shard in self.shards]
+        return {key: sum(change[key] for change in changes) for key in ("added", "removed")}
+
+    def count(self) -> int:
+        return sum(shard.count() for shard in self.shards)
+
+    def search(self, query_embedding: List[float], top_k: int = 5,
+               filters: Optional[dict] = None, trace=None) -> List[Dict]:
+        if top_k <= 0:
+            return []
+        with _stage(trace, "vector_scan"):
+            hits = self._gather(query_embedding, top_k, filters, trace)
+        if self.remote or not hits:
+            return hits
+
+        with _stage(trace, "hydrate"):
+            return hydrate(self.database, [hit['_id'] for hit in hits], [hit['similarity_score'] for hit in hits])
+
+    def _gather(self, query_embedding: List[float], top_k: int, filters: Optional[dict], trace) -> List[Dict]:
+        timeout = settings.shard_timeout_ms / 1000
+        if trace is not None and trace.deadline is not None:
+            timeout = min(timeout, trace.remaining())
+
+        futures = {
+            self._pool.submit(shard.search, query_embedding, top_k, filters): shard
+            for shard in self.shards
+        }
+        done, pending = wait(futures, timeout=timeout)
+
+        hits = []
+        for future in done:
+            shard = futures[future]
+            try:
+                hits.extend(future.result())
+            except Exception as e:
+                logger.warning("⚠️  Shard search failed", extra={"shard": shard.label, "error": str(e)})
+                self._missed(shard, "error", trace)
+        for future in pending:
+            future.cancel()
+            self._missed(futures[future], "timeout", trace)
+
+        return heapq.nlargest(top_k, hits, key=lambda hit: hit['similarity_score'])
+
+    @staticmethod
+    def _missed(shard, reason: str, trace):
+        shard_failures.inc(shard.label, reason)
+        if trace is not None:
+            trace.degrade(f"shard:{shard.label}")
+
+    def stats(self) -> dict:
+        shards = {}
+        for shard in self.shards:
+            try:
+                shards[shard.label] = shard.count()
+            except Exception as e:
+                shards[shard.label] = f"unavailable: {e}"
+        return {
+            "backend": self.name,
+            "vectors": sum(count for count in shards.values() if isinstance(count, int)),
+            "shards": shards
+        }
+
+VECTOR_STORES = {
+    MongoScanVectorStore.name: MongoScanVectorStore,
+    NumpyVectorStore.name: NumpyVectorStore,
+    Int8VectorStore.name: Int8VectorStore,
+    PCAVectorStore.name: PCAVectorStore,
+    SharedMemoryVectorStore.name: SharedMemoryVectorStore,
+    ShardedVectorStore.name: ShardedVectorStore,
+}
+
+def create_vector_store(backend: Optional[str] = None, database: Optional[MongoDB] = None) -> VectorStore:
+    """Instantiate the configured vector store engine"""
+    backend = backend or settings.vector_store_backend
+    try:
+        store_class = VECTOR_STORES[backend]
+    except KeyError:
+        raise ValueError(f"Unknown vector store backend '{backend}'. Choose from: {', '.join(VECTOR_STORES)}")
+    if settings.shard_partition and not store_class.supports_partition:
+        partitioned = ", ".join(name for name, cls in VECTOR_STORES.items() if cls.supports_partition)
+        raise ValueError(f"SHARD_PARTITION is set but the '{backend}' vector store indexes the whole corpus. "
+                         f"A shard must use one of: {partitioned}")
+    return store_class(database)
+
+# Global vector store instance
+vector_store = create_vector_store()
@@ -0,0 +1,119 @@
+# backend/benchmarks/approximate_recall.py
+"""Recall and latency of the approximate vector stores against the exact float32 scan
+
+Seeds a synthetic corpus (fake embedder and in-memory MongoDB by default),
+then for each engine and rescoring depth reports recall@k against the
+numpy engine, rank latency percentiles and first-pass bytes per vector.
+Rescoring only top_k candidates shows the recall of the first pass alone.
+
+Feature-hashed fake embeddings have almost no low-rank structure, so they
+understate PCA recall; run with EMBEDDING_PROVIDER=local for real numbers.
+
+Usage (from backend/):
+    python -m benchmarks.approximate_recall --chunks 100000 --candidates 10,50,200,1000
+    EMBEDDING_PROVIDER=local python -m benchmarks.approximate_recall --engines pca --pca-dimensions 64,128
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.pipeline_benchmark import _configure_environment, _percentiles, seed_chunks
+
+def measure(store, query_embeddings, top_k: int) -> tuple:
+    """Ranked ids per query and rank() latencies in ms"""
+    ranked, latencies = [], []
+    for embedding in query_embeddings:
+        start = time.perf_counter()
+        ids, _ = store.rank(embedding, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ranked.append(ids)
+    return ranked, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--engines", default="int8,pca", help="Approximate engines to measure")
+    parser.add_argument("--candidates", default="10,50,200,1000", help="Rescoring depths to sweep")
+    parser.add_argument("--pca-dimensions", default="96", help="PCA projection sizes to sweep")
+    parser.add_argument("--words-per-chunk", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-url", default="mongomock://", help="MongoDB URL (default: in-memory stand-in)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    _configure_environment(args)
+    import logging
+    logging.disable(logging.INFO)
+
+    from benchmarks.corpus import CorpusGenerator
+    from app.database import db
+    from app.embedding_service import embedding_service
+    from app.config import settings
+    from app.vector_store import NumpyVectorStore, create_vector_store
+
+    try:
+        db.connect()
+        generator = CorpusGenerator(args.seed)
+        print(f"⏱️  Seeding {args.chunks:,} chunks...")
+        seed_chunks(generator, args.chunks, args.words_per_chunk)
+        query_embeddings = embedding_service.generate_embeddings_batch(
+            [generator.query() for _ in range(args.queries)]
+        )
+
+        exact_store = NumpyVectorStore(db)
+        exact_store.load()
+        exact, exact_latencies = measure(exact_store, query_embeddings, args.top_k)
+        float_bytes = exact_store._index[0].nbytes / max(exact_store.count(), 1)
+
+        results = {
+            "chunks": args.chunks,
+            "top_k": args.top_k,
+            "float32": {**_percentiles(exact_latencies), "bytes_per_vector": round(float_bytes, 1)},
+            "approximate": []
+        }
+        print(f"  float32 exact: p50 {results['float32']['p50_ms']:.2f} ms  {float_bytes:.0f} B/vector")
+
+        variants = []
+        for engine in args.engines.split(","):
+            if engine == "pca":
+                variants += [(engine, int(d)) for d in args.pca_dimensions.split(",")]
+            else:
+                variants.append((engine, None))
+
+        for engine, dimensions in variants:
+            if dimensions:
+                settings.pca_dimensions = dimensions
+            store = create_vector_store(engine, db)
+            store.load()
+            stats = store.stats()
+            first_pass_bytes = stats.get("quantized_bytes", stats.get("reduced_bytes", 0)) / max(store.count(), 1)
+            label = f"{engine}-{dimensions}" if dimensions else engine
+
+            for candidates in (int(c) for c in args.candidates.split(",")):
+                store.rescore_candidates = candidates
+                ranked, latencies = measure(store, query_embeddings, args.top_k)
+                hits = sum(len(set(got) & set(want)) for got, want in zip(ranked, exact))
+                recall = hits / sum(len(want) for want in exact)
+                results["approximate"].append({
+                    "engine": label,
+                    "rescore_candidates": candidates,
+                    f"recall_at_{args.top_k}": round(recall, 4),
+                    **_percentiles(latencies),
+                    "bytes_per_vector": round(first_pass_bytes, 1)
+                })
+                print(f"  {label:>8} rescore {candidates:>5}: recall@{args.top_k} {recall:.4f}  "
+                      f"p50 {results['approximate'][-1]['p50_ms']:.2f} ms  {first_pass_bytes:.0f} B/vector")
+    finally:
+        db.client.drop_database(db.database_name)
+        db.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# backend/benchmarks/content_compression.py
+"""Storage saved by compressed chunk content versus the decode cost of hydration
+
+Chunks a synthetic corpus with the app's DocumentProcessor (so neighbouring
+chunks overlap as in production), then for each encoding reports stored
+bytes per chunk, the share of a whole chunk document (with a 384-d
+embedding) that saves, and the latency of decoding and of hydrating top-k
+results. Hydration runs against the in-memory database by default, which
+hides the network and cache savings a real MongoDB would see; pass
+--mongo-url to measure those.
+
+Usage (from backend/):
+    python -m benchmarks.content_compression --chunks 5000 --top-k 5,10,50
+    python -m benchmarks.content_compression --mongo-url mongodb://localhost:27017
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.pipeline_benchmark import _configure_environment, _percentiles
+
+def make_chunks(generator, count: int) -> list:
+    """Overlapping chunks of synthetic documents, as uploads produce them"""
+    from app.config import settings
+    from app.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor(chunk_size=settings.chunk_size, chunk_overlap=settings.chunk_overlap)
+    chunks = []
+    while len(chunks) < count:
+        chunks += [chunk["content"] for chunk in processor.chunk_text(generator.text(settings.chunk_size))]
+    return chunks[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--top-k", default="5,10,50", help="Result counts to hydrate")
+    parser.add_argument("--queries", type=int, default=300, help="Hydrations per top-k")
+    parser.add_argument("--dictionary-size", type=int, default=32768)
+    parser.add_argument("--train-samples", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-url", default="mongomock://", help="MongoDB URL (default: in-memory stand-in)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    _configure_environment(args)
+    import logging
+    logging.disable(logging.INFO)
+
+    import bson
+    from benchmarks.corpus import CorpusGenerator
+    from app.content_compression import ContentCodec, zstandard
+    from app.database import db
+    from app.vector_store import hydrate
+
+    generator = CorpusGenerator(args.seed)
+    rng = random.Random(args.seed)
+    print(f"⏱️  Chunking {args.chunks:,} chunks...")
+    texts = make_chunks(generator, args.chunks)
+    embedding = [rng.random() for _ in range(384)]
+    top_ks = [int(k) for k in args.top_k.split(",")]
+
+    variants = [("none", ContentCodec("none", db)), ("zlib", ContentCodec("zlib", db))]
+    if zstandard is not None:
+        variants.append(("zstd", ContentCodec("zstd", db)))
+        trained = ContentCodec("zstd", db)
+        trained.train(rng.sample(texts, min(args.train_samples, len(texts))), args.dictionary_size)
+        variants.append(("zstd+dictionary", trained))
+    else:
+        print("⚠️  zstandard is not installed; measuring zlib only")
+
+    results = {"chunks": len(texts), "dictionary_size": args.dictionary_size, "encodings": []}
+    try:
+        db.connect()
+        plain_bytes = None
+        for label, codec in variants:
+            start = time.perf_counter()
+            encoded = [codec.encode(text) for text in texts]
+            encode_us = (time.perf_counter() - start) / len(texts) * 1e6
+            content_bytes = sum(len(bson.encode(fields)) for fields in encoded) / len(texts)
+            document_bytes = sum(len(bson.encode({**fields, "embedding": embedding})) for fields in encoded) / len(texts)
+            plain_bytes = plain_bytes or (content_bytes, document_bytes)
+
+            db.collection.delete_many({})
+            ids = db.collection.insert_many([
+                {"document_id": "bench", "file_name": "bench.txt", "chunk_id": i, "metadata": {}, **fields}
+                for i, fields in enumerate(encoded)
+            ]).inserted_ids
+            # Warm up: a dictionary is fetched from the database once per process
+            hydrate(db, ids[:1], [1.0])
+
+            entry = {
+                "encoding": label,
+                "content_bytes_per_chunk": round(content_bytes, 1),
+                "content_ratio": round(plain_bytes[0] / content_bytes, 2),
+                "document_bytes_saved": round(1 - document_bytes / plain_bytes[1], 4),
+                "encode_us_per_chunk": round(encode_us, 1),
+                "decode": {},
+                "hydrate": {}
+            }
+            for k in top_ks:
+                decode_ms, hydrate_ms = [], []
+                for _ in range(args.queries):
+                    picks = rng.sample(range(len(texts)), k)
+                    stored = [{"_id": ids[i], **encoded[i]} for i in picks]
+                    start = time.perf_counter()
+                    for chunk in stored:
+                        codec.decode(chunk)
+                    decode_ms.append((time.perf_counter() - start) * 1000)
+                    start = time.perf_counter()
+                    hydrate(db, [ids[i] for i in picks], [1.0] * k)
+                    hydrate_ms.append((time.perf_counter() - start) * 1000)
+                entry["decode"][f"top_{k}"] = _percentiles(decode_ms)
+                entry["hydrate"][f"top_{k}"] = _percentiles(hydrate_ms)
+            results["encodings"].append(entry)
+
+            largest = f"top_{top_ks[-1]}"
+            print(f"  {label:>16}: {content_bytes:7.0f} B/chunk ({entry['content_ratio']:.2f}x, "
+                  f"{entry['document_bytes_saved']:.1%} of the document)  encode {encode_us:6.1f} us  "
+                  f"decode {largest} p50 {entry['decode'][largest]['p50_ms']:.3f} ms  "
+                  f"hydrate {largest} p50 {entry['hydrate'][largest]['p50_ms']:.2f} ms")
+    finally:
+        db.client.drop_database(db.database_name)
+        db.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# backend/benchmarks/corpus.py
+"""Deterministic synthetic corpus: TXT, PDF and DOCX documents from a seeded vocabulary"""
+
+import os
+import random
+import textwrap
+from typing import List, Tuple
+
+CONTENT_TYPES = {
+    "txt": "text/plain",
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+class CorpusGenerator:
+    """Generates reproducible pseudo-English text
+
+    Words are drawn from a fixed vocabulary with a Zipf-like distribution so
+    that term frequencies (and therefore embeddings and text search) behave
+    roughly like real prose. The same seed always yields the same corpus.
+    """
+
+    def __init__(self, seed: int = 42, vocabulary_size: int = 5000):
+        self.rng = random.Random(seed)
+        syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "de", "an", "or", "el", "is", "un", "pra", "qua"]
+        words = set()
+        while len(words) < vocabulary_size:
+            words.add("".join(self.rng.choice(syllables) for _ in range(self.rng.randint(1, 4))))
+        self.vocabulary = sorted(words)
+        self.weights = [1.0 / (rank + 1) for rank in range(len(self.vocabulary))]
+
+    def words(self, count: int) -> List[str]:
+        return self.rng.choices(self.vocabulary, weights=self.weights, k=count)
+
+    def sentence(self) -> str:
+        words = self.words(self.rng.randint(8, 20))
+        return " ".join(words).capitalize() + "."
+
+    def text(self, word_count: int) -> str:
+        sentences, words = [], 0
+        while words < word_count:
+            sentence = self.sentence()
+            sentences.append(sentence)
+            words += sentence.count(" ") + 1
+        return " ".join(sentences)
+
+    def query(self, min_words: int = 2, max_words: int = 5) -> str:
+        # Skip the most frequent words so queries look like keywords, not stop words
+        return " ".join(self.rng.choice(self.vocabulary[50:500]) for _ in range(self.rng.randint(min_words, max_words)))
+
+def write_txt(path: str, text: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def write_docx(path: str, text: str, sentences_per_paragraph: int = 5):
+    import docx
+    document = docx.Document()
+    sentences = text.split(". ")
+    for i in range(0, len(sentences), sentences_per_paragraph):
+        document.add_paragraph(". ".join(sentences[i:i + sentences_per_paragraph]))
+    document.save(path)
+
+def write_pdf(path: str, text: str, lines_per_page: int = 50, width: int = 90):
+    """Write a minimal text-only PDF (Helvetica, one text object per page)"""
+    lines = textwrap.wrap(text, width=width) or [""]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    def escape(line: str) -> str:
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    # Objects: 1 catalog, 2 pages, 3 font, then (page, content) pairs
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for index, page_lines in enumerate(pages):
+        page_id, content_id = 4 + index * 2, 5 + index * 2
+        kids.append(f"{page_id} 0 R")
+        stream = "BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(f"({escape(line)}) Tj T*" for line in page_lines) + " ET"
+        stream_bytes = stream.encode("latin-1", "replace")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream_bytes) + stream_bytes + b"\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(output)
+        output += b"%d 0 obj\n" % object_id + objects[object_id] + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for object_id in sorted(objects):
+        output += b"%010d 00000 n \n" % offsets[object_id]
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(bytes(output))
+
+WRITERS = {"txt": write_txt, "pdf": write_pdf, "docx": write_docx}
+
+def generate_documents(directory: str, count: int, words_per_document: int = 1500,
+                       types: Tuple[str, ...] = ("txt", "pdf", "docx"), seed: int = 42) -> List[Tuple[str, str]]:
+    """Write `count` documents cycling through `types`; returns (path, content_type) pairs"""
+    generator = CorpusGenerator(seed=seed)
+    os.makedirs(directory, exist_ok=True)
+    documents = []
+    for i in range(count):
+        file_type = types[i % len(types)]
+        path = os.path.join(directory, f"doc_{i:05d}.{file_type}")
+        WRITERS[file_type](path, generator.text(words_per_document))
+        documents.append((path, CONTENT_TYPES[file_type]))
+    return documents
@@ -0,0 +1,260 @@
+# backend/benchmarks/load_test.py
+"""HTTP load test with concurrency sweeps
+
+Drives a running app with a weighted mix of /search, /upload, /documents
+and auth traffic. Each concurrency level runs closed-loop workers for a
+fixed duration and reports throughput, error rate and latency percentiles
+per operation. A separate probe hits /health a few times per second: if
+its latency climbs with concurrency, something is blocking the event loop.
+
+By default the app is started locally on a free port with the in-memory
+MongoDB stand-in, the fake embedder and the fake LLM
+(pip install -r benchmarks/requirements.txt).
+
+Usage (from backend/):
+    python -m benchmarks.load_test --concurrency 1,8,32,64 --duration 20 --output load.json
+    python -m benchmarks.load_test --url http://localhost:8000 --mix search=80,documents=20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+from benchmarks.corpus import CorpusGenerator
+
+DEFAULT_MIX = "search=60,documents=15,auth=20,upload=5"
+
+class Workload:
+    """Builds the requests of the traffic mix"""
+
+    def __init__(self, mix: dict, seed: int, upload_words: int, use_rag: bool):
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.rng = random.Random(seed)
+        self.corpus = CorpusGenerator(seed=seed)
+        self.upload_words = upload_words
+        self.use_rag = use_rag
+        self.users = []
+
+    def pick(self) -> str:
+        return self.rng.choices(self.operations, weights=self.weights)[0]
+
+    async def setup(self, client: httpx.AsyncClient, users: int, documents: int):
+        """Create accounts and a small corpus so every operation has something to hit"""
+        for _ in range(users):
+            email = f"load-{uuid.uuid4().hex[:10]}@example.com"
+            response = await client.post("/api/auth/signup", json={
+                "full_name": "Load Test", "email": email, "password": "load-test-password"
+            })
+            response.raise_for_status()
+            self.users.append(email)
+        for _ in range(documents):
+            (await self.upload(client)).raise_for_status()
+
+    async def run(self, client: httpx.AsyncClient, operation: str) -> httpx.Response:
+        return await getattr(self, operation)(client)
+
+    async def search(self, client):
+        return await client.post("/search", json={"query": self.corpus.query(), "top_k": 5, "use_rag": self.use_rag})
+
+    async def documents(self, client):
+        return await client.get("/documents")
+
+    async def auth(self, client):
+        response = await client.post("/api/auth/login", json={
+            "email": self.rng.choice(self.users), "password": "load-test-password"
+        })
+        if response.status_code != 200:
+            return response
+        token = response.json()["access_token"]
+        return await client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+    async def upload(self, client):
+        text = self.corpus.text(self.upload_words).encode("utf-8")
+        return await client.post("/upload", files={"file": (f"load_{uuid.uuid4().hex[:8]}.txt", text, "text/plain")})
+
+def _summarize(latencies_ms):
+    if not latencies_ms:
+        return {"requests": 0}
+    values = np.asarray(latencies_ms)
+    return {
+        "requests": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+async def run_level(client: httpx.AsyncClient, workload: Workload, concurrency: int,
+                    duration: float, probe_interval: float) -> dict:
+    latencies = {name: [] for name in workload.operations}
+    errors = {name: 0 for name in workload.operations}
+    probe_latencies = []
+    stop_at = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < stop_at:
+            operation = workload.pick()
+            start = time.perf_counter()
+            try:
+                response = await workload.run(client, operation)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies[operation].append((time.perf_counter() - start) * 1000)
+            if failed:
+                errors[operation] += 1
+
+    async def probe():
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                await client.get("/health")
+                probe_latencies.append((time.perf_counter() - start) * 1000)
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(probe_interval)
+
+    started = time.perf_counter()
+    await asyncio.gather(probe(), *(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(values) for values in latencies.values())
+    total_errors = sum(errors.values())
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2),
+        "error_rate": round(total_errors / total, 4) if total else 0.0,
+        "overall": _summarize([v for values in latencies.values() for v in values]),
+        "operations": {
+            name: {**_summarize(values), "errors": errors[name]} for name, values in latencies.items()
+        },
+        "health_probe": _summarize(probe_latencies),
+    }
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_app(workers: int, mongo_url: str, env_overrides: dict, show_logs: bool = False) -> tuple:
+    """Start uvicorn with the fake embedder and LLM; returns (process, base_url)"""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "MONGODB_URL": mongo_url,
+        "EMBEDDING_PROVIDER": "fake",
+        "LLM_PROVIDER": "fake",
+        **env_overrides,
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+        stdout=None if show_logs else subprocess.DEVNULL,
+        stderr=None if show_logs else subprocess.DEVNULL
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+async def wait_until_ready(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).json().get("status") == "healthy":
+                    return
+            except (httpx.HTTPError, ValueError):
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"App at {base_url} did not become healthy within {timeout}s")
+
+def _parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("search", "documents", "auth", "upload"):
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+async def main_async(args) -> dict:
+    process = None
+    base_url = args.url
+    if base_url is None:
+        if args.workers > 1 and args.mongo_url.startswith("mongomock://"):
+            # Each worker would get its own private in-memory database
+            raise SystemExit("--workers > 1 needs a real MongoDB; pass --mongo-url")
+        overrides = dict(item.split("=", 1) for item in args.env)
+        process, base_url = start_app(args.workers, args.mongo_url, overrides, args.app_logs)
+    try:
+        await wait_until_ready(base_url)
+        limits = httpx.Limits(max_connections=max(args.concurrency) + 1, max_keepalive_connections=max(args.concurrency) + 1)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            workload = Workload(_parse_mix(args.mix), args.seed, args.upload_words, not args.no_rag)
+            await workload.setup(client, users=args.users, documents=args.seed_documents)
+
+            levels = []
+            for concurrency in args.concurrency:
+                level = await run_level(client, workload, concurrency, args.duration, args.probe_interval)
+                levels.append(level)
+                print(f"  c={concurrency:>4}  {level['throughput_rps']:>8.1f} req/s  "
+                      f"p50 {level['overall'].get('p50_ms', 0):>8.1f} ms  p99 {level['overall'].get('p99_ms', 0):>8.1f} ms  "
+                      f"errors {level['error_rate']:.2%}  health p99 {level['health_probe'].get('p99_ms', 0):.1f} ms")
+            return {
+                "meta": {
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "target": args.url or "local (in-memory stand-ins)",
+                    "args": vars(args),
+                },
+                "levels": levels,
+            }
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target a running app instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local app")
+    parser.add_argument("--mongo-url", default="mongomock://", help="MongoDB for the local app (default: in-memory)")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra environment for the local app, e.g. FAKE_LLM_LATENCY_MS=300")
+    parser.add_argument("--app-logs", action="store_true", help="Show the local app's log output")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted operations, e.g. search=80,documents=20")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--seed-documents", type=int, default=20)
+    parser.add_argument("--upload-words", type=int, default=800)
+    parser.add_argument("--no-rag", action="store_true", help="Send searches with use_rag=false")
+    parser.add_argument("--probe-interval", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+# backend/benchmarks/pipeline_benchmark.py
+"""Reproducible ingestion and search benchmarks
+
+Runs offline by default: embeddings come from the deterministic fake
+embedder and MongoDB is the in-memory mongomock stand-in
+(pip install -r benchmarks/requirements.txt). Pass --mongo-url to measure
+against a real server; corpus sizes around 1M chunks need one.
+
+Usage (from backend/):
+    python -m benchmarks.pipeline_benchmark --sizes 1000,10000,100000 --output results.json
+    python -m benchmarks.pipeline_benchmark --baseline results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+def _configure_environment(args):
+    # Must run before any app module reads settings
+    os.environ.setdefault("EMBEDDING_PROVIDER", "fake")
+    os.environ["MONGODB_URL"] = args.mongo_url
+    os.environ["DATABASE_NAME"] = f"benchmark_{uuid.uuid4().hex[:8]}"
+
+def _percentiles(samples_ms):
+    import numpy as np
+    values = np.asarray(samples_ms)
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+    }
+
+def bench_chunking(generator, words: int, repeat: int) -> dict:
+    """Throughput of DocumentProcessor.chunk_text on one large text"""
+    from app.config import settings
+    from app.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor(chunk_size=settings.chunk_size, chunk_overlap=settings.chunk_overlap)
+    text = generator.text(words)
+    durations, chunks = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = len(processor.chunk_text(text))
+        durations.append(time.perf_counter() - start)
+
+    best = min(durations)
+    return {
+        "words": words,
+        "megabytes": round(len(text.encode("utf-8")) / 1e6, 3),
+        "chunks": chunks,
+        "words_per_sec": round(words / best),
+        "mb_per_sec": round(len(text.encode("utf-8")) / 1e6 / best, 3),
+        "chunks_per_sec": round(chunks / best, 1),
+    }
+
+def bench_ingestion(documents) -> dict:
+    """Run the upload pipeline (extract, chunk, embed, insert) over generated files"""
+    from datetime import datetime as dt
+    from app.config import settings
+    from app.database import db
+    from app.document_processor import DocumentProcessor
+    from app.embedding_service import embedding_service
+    from app.request_trace import RequestTrace
+
+    processor = DocumentProcessor(chunk_size=settings.chunk_size, chunk_overlap=settings.chunk_overlap)
+    stage_totals, per_type, total_chunks = {}, {}, 0
+    start = time.perf_counter()
+
+    for path, content_type in documents:
+        doc_start = time.perf_counter()
+        trace = RequestTrace(pipeline="upload")
+        file_name = os.path.basename(path)
+        document_id = str(uuid.uuid4())
+
+        chunks = processor.process_document(path, content_type, trace=trace)
+        with trace.stage("embedding"):
+            embeddings = embedding_service.generate_embeddings_batch([c["content"] for c in chunks])
+        chunks_data = [
+            {
+                "document_id": document_id,
+                "file_name": file_name,
+                "chunk_id": chunk["chunk_id"],
+                "content": chunk["content"],
+                "embedding": embedding,
+                "metadata": {"word_count": chunk.get("word_count", 0), "file_size": os.path.getsize(path)},
+                "created_at": dt.utcnow(),
+            }
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+        with trace.stage("insert"):
+            db.insert_chunks(chunks_data)
+            db.add_document_to_catalog(document_id, file_name, os.path.getsize(path), len(chunks_data))
+
+        total_chunks += len(chunks_data)
+        for stage, seconds in trace.timings.items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+        file_type = os.path.splitext(path)[1].lstrip(".")
+        seconds, count = per_type.get(file_type, (0.0, 0))
+        per_type[file_type] = (seconds + time.perf_counter() - doc_start, count + 1)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": len(documents),
+        "chunks": total_chunks,
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(len(documents) / elapsed, 2),
+        "chunks_per_sec": round(total_chunks / elapsed, 1),
+        "stage_seconds": {stage: round(seconds, 3) for stage, seconds in stage_totals.items()},
+        "docs_per_sec_by_type": {t: round(n / s, 2) for t, (s, n) in per_type.items()},
+    }
+
+def seed_chunks(generator, count: int, words_per_chunk: int, batch_size: int = 5000):
+    """Insert `count` synthetic chunks directly, bypassing extraction and chunking"""
+    from datetime import datetime as dt
+    from app.database import db
+    from app.embedding_service import embedding_service
+
+    db.collection.delete_many({})
+    documents = max(count // 50, 1)
+    for offset in range(0, count, batch_size):
+        texts = [generator.text(words_per_chunk) for _ in range(min(batch_size, count - offset))]
+        embeddings = embedding_service.generate_embeddings_batch(texts)
+        db.insert_chunks([
+            {
+                "document_id": f"bench-{(offset + i) % documents}",
+                "file_name": f"bench_{(offset + i) % documents}.txt",
+                "chunk_id": (offset + i) // documents,
+                "content": text,
+                "embedding": embedding,
+                "metadata": {"word_count": words_per_chunk},
+                "created_at": dt.utcnow(),
+            }
+            for i, (text, embedding) in enumerate(zip(texts, embeddings))
+        ])
+
+def bench_search(generator, size: int, engines, queries: int, top_k: int, words_per_chunk: int) -> list:
+    """Search latency percentiles for each vector store engine at one corpus size"""
+    from app.request_trace import RequestTrace
+    from app.search_service import SearchService
+    from app.vector_store import create_vector_store
+
+    seed_start = time.perf_counter()
+    seed_chunks(generator, size, words_per_chunk)
+    seed_seconds = time.perf_counter() - seed_start
+    query_texts = [generator.query() for _ in range(queries)]
+
+    rows = []
+    for engine in engines:
+        store = create_vector_store(engine)
+        load_start = time.perf_counter()
+        store.load()
+        load_seconds = time.perf_counter() - load_start
+        service = SearchService(store=store)
+
+        service.search(query_texts[0], top_k=top_k)  # warm-up
+        latencies, stage_totals = [], {}
+        for query in query_texts:
+            trace = RequestTrace()
+            start = time.perf_counter()
+            service.search(query, top_k=top_k, trace=trace)
+            latencies.append((time.perf_counter() - start) * 1000)
+            for stage, seconds in trace.timings.items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+        rows.append({
+            "chunks": size,
+            "engine": engine,
+            "queries": queries,
+            **_percentiles(latencies),
+            "qps": round(queries / (sum(latencies) / 1000), 2),
+            "stage_mean_ms": {stage: round(s * 1000 / queries, 3) for stage, s in stage_totals.items()},
+            "seed_seconds": round(seed_seconds, 2),
+            "load_seconds": round(load_seconds, 3),
+        })
+        print(f"  search {size:>9,} chunks  {engine:>6}: p50 {rows[-1]['p50_ms']:.2f} ms  "
+              f"p95 {rows[-1]['p95_ms']:.2f} ms  p99 {rows[-1]['p99_ms']:.2f} ms")
+        if hasattr(store, "directory"):
+            shutil.rmtree(store.directory, ignore_errors=True)
+    return rows
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+def _metrics(results: dict) -> dict:
+    flat = _flatten("chunking", results.get("chunking", {}), {})
+    _flatten("ingestion", results.get("ingestion", {}), flat)
+    for row in results.get("search", []):
+        _flatten(f"search.{row['engine']}.{row['chunks']}", {k: v for k, v in row.items() if k.endswith("_ms") or k == "qps"}, flat)
+    return flat
+
+def compare(results: dict, baseline_path: str):
+    """Print the relative change of every metric present in both runs"""
+    with open(baseline_path) as f:
+        baseline = _metrics(json.load(f))
+    current = _metrics(results)
+    print(f"\nChange vs {baseline_path} (latency: lower is better, throughput: higher is better)")
+    for name in sorted(set(baseline) & set(current)):
+        if baseline[name]:
+            change = (current[name] - baseline[name]) / baseline[name] * 100
+            print(f"  {name:<60} {baseline[name]:>12} -> {current[name]:>12}  ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000", help="Comma-separated corpus sizes in chunks")
+    parser.add_argument("--engines", default="mongo,numpy", help="Vector store engines to search with")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--words-per-chunk", type=int, default=60)
+    parser.add_argument("--ingest-docs", type=int, default=30, help="Documents (TXT/PDF/DOCX mix) to ingest")
+    parser.add_argument("--words-per-doc", type=int, default=1500)
+    parser.add_argument("--chunking-words", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-url", default="mongomock://", help="MongoDB URL (default: in-memory stand-in)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result")
+    args = parser.parse_args()
+
+    _configure_environment(args)
+    import logging
+    logging.disable(logging.INFO)
+
+    from benchmarks.corpus import CorpusGenerator, generate_documents
+    from app.database import db
+
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "mongo": "in-memory" if args.mongo_url.startswith("mongomock://") else "server",
+            "embedding_provider": os.environ["EMBEDDING_PROVIDER"],
+            "args": vars(args),
+        }
+    }
+
+    try:
+        db.connect()
+
+        print("⏱️  Chunking...")
+        results["chunking"] = bench_chunking(CorpusGenerator(args.seed), args.chunking_words, repeat=3)
+        print(f"  {results['chunking']['words_per_sec']:,} words/s, {results['chunking']['chunks_per_sec']} chunks/s")
+
+        print("⏱️  Ingestion...")
+        with tempfile.TemporaryDirectory() as directory:
+            documents = generate_documents(directory, args.ingest_docs, args.words_per_doc, seed=args.seed)
+            results["ingestion"] = bench_ingestion(documents)
+        print(f"  {results['ingestion']['docs_per_sec']} docs/s, {results['ingestion']['chunks_per_sec']} chunks/s")
+
+        print("⏱️  Search...")
+        results["search"] = []
+        for size in (int(s) for s in args.sizes.split(",")):
+            results["search"] += bench_search(CorpusGenerator(args.seed + size), size, args.engines.split(","),
+                                              args.queries, args.top_k, args.words_per_chunk)
+    finally:
+        db.client.drop_database(db.database_name)
+        db.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"✅ Results written to {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# backend/benchmarks/startup_benchmark.py
+"""Cold-start benchmark: import time of app.main and time until /health is healthy
+
+Each measurement runs in a fresh interpreter. Exits non-zero when the median
+import time or time-to-ready exceeds its budget, so it can gate CI.
+
+Usage (from backend/):
+    python -m benchmarks.startup_benchmark --import-budget 1.5 --ready-budget 5
+    python -m benchmarks.startup_benchmark --warmup --top-imports 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.load_test import _free_port
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+def _env(args) -> dict:
+    env = {**os.environ, "MONGODB_URL": args.mongo_url, "LOG_LEVEL": "WARNING"}
+    if args.fake:
+        env.update(EMBEDDING_PROVIDER="fake", LLM_PROVIDER="fake")
+    if args.warmup:
+        env["WARMUP_ON_STARTUP"] = "true"
+    return env
+
+def measure_import(env: dict) -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+def measure_ready(env: dict, timeout: float) -> float:
+    """Seconds from spawning uvicorn until /health reports healthy"""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if client.get("/health").json().get("status") == "healthy":
+                        return time.perf_counter() - started
+                except (httpx.HTTPError, ValueError):
+                    pass
+                time.sleep(0.02)
+        raise RuntimeError(f"App did not become healthy within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+def top_imports(env: dict, limit: int) -> list:
+    """Slowest imports by cumulative time, from python -X importtime"""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], env=env,
+                            capture_output=True, text=True).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        if module == "app.main":
+            continue
+        # Attribute time to the top-level package that was imported first (largest cumulative)
+        package = module.split(".")[0] if not module.startswith("app.") else module
+        packages[package] = max(packages.get(package, 0.0), int(cumulative) / 1000)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{"module": module, "cumulative_ms": ms} for module, ms in ranked]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET", 2.0)),
+                        help="Max median seconds to import app.main")
+    parser.add_argument("--ready-budget", type=float, default=float(os.getenv("STARTUP_READY_BUDGET", 10.0)),
+                        help="Max median seconds until /health is healthy")
+    parser.add_argument("--warmup", action="store_true", help="Measure with WARMUP_ON_STARTUP=true")
+    parser.add_argument("--real-models", dest="fake", action="store_false",
+                        help="Use the configured embedding model and LLM instead of the fakes")
+    parser.add_argument("--mongo-url", default="mongomock://", help="MongoDB for the app (default: in-memory)")
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    parser.add_argument("--top-imports", type=int, default=0, help="Also list the N slowest imports")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    env = _env(args)
+    import_times = [measure_import(env) for _ in range(args.runs)]
+    ready_times = [measure_ready(env, args.ready_timeout) for _ in range(args.runs)]
+
+    results = {
+        "import_seconds": {"median": round(statistics.median(import_times), 3), "max": round(max(import_times), 3)},
+        "ready_seconds": {"median": round(statistics.median(ready_times), 3), "max": round(max(ready_times), 3)},
+        "budgets": {"import_seconds": args.import_budget, "ready_seconds": args.ready_budget},
+        "warmup": args.warmup,
+        "fake_models": args.fake,
+    }
+    print(f"import app.main: median {results['import_seconds']['median']:.3f}s (budget {args.import_budget}s)")
+    print(f"time to ready:   median {results['ready_seconds']['median']:.3f}s (budget {args.ready_budget}s)")
+
+    if args.top_imports:
+        results["top_imports"] = top_imports(env, args.top_imports)
+        for row in results["top_imports"]:
+            print(f"  {row['cumulative_ms']:>9.1f} ms  {row['module']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    over_budget = []
+    if results["import_seconds"]["median"] > args.import_budget:
+        over_budget.append("import")
+    if results["ready_seconds"]["median"] > args.ready_budget:
+        over_budget.append("time to ready")
+    if over_budget:
+        print(f"❌ Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+    print("✅ Within startup budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# backend/benchmarks/vector_store_conformance.py
+"""Run the same queries against every vector store engine and compare results.
+
+Seeds a throwaway database with synthetic chunks, then checks each engine
+against an exact float64 reference for plain search, filtered search,
+incremental add and delete.
+
+Usage (from backend/):
+    python -m benchmarks.vector_store_conformance --chunks 2000 --queries 50
+"""
+
+import argparse
+import shutil
+import sys
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from app.database import MongoDB
+from app.vector_store import VECTOR_STORES, create_vector_store
+
+def make_chunks(rng, n_chunks: int, n_docs: int, dims: int):
+    doc_ids = [str(uuid.UUID(int=int(rng.integers(0, 2**63)))) for _ in range(n_docs)]
+    chunks = []
+    for i in range(n_chunks):
+        document_id = doc_ids[i % n_docs]
+        chunks.append({
+            "document_id": document_id,
+            "file_name": f"doc_{i % n_docs}.txt",
+            "chunk_id": i // n_docs,
+            "content": f"synthetic chunk {i}",
+            "embedding": rng.standard_normal(dims).tolist(),
+            "metadata": {"word_count": 3},
+            "created_at": datetime.utcnow()
+        })
+    return doc_ids, chunks
+
+def reference_search(chunks, query, top_k, filters=None):
+    """Exact cosine top-k in float64"""
+    candidates = [c for c in chunks if _matches(c, filters)]
+    if not candidates:
+        return []
+    matrix = np.array([c["embedding"] for c in candidates], dtype=np.float64)
+    q = np.asarray(query, dtype=np.float64)
+    scores = matrix @ q / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(q))
+    order = np.argsort(-scores)[:top_k]
+    return [((candidates[i]["document_id"], candidates[i]["chunk_id"]), float(scores[i])) for i in order]
+
+def _matches(chunk, filters):
+    for field, condition in (filters or {}).items():
+        if isinstance(condition, dict):
+            if chunk.get(field) not in condition["$in"]:
+                return False
+        elif chunk.get(field) != condition:
+            return False
+    return True
+
+def compare(engine, label, got, expected, tolerance, failures):
+    got_keys = [(r["document_id"], r["chunk_id"]) for r in got]
+    expected_keys = [key for key, _ in expected]
+    if len(got) != len(expected):
+        failures.append(f"{engine}/{label}: returned {len(got)} results, expected {len(expected)}")
+        return
+    for rank, (result, (key, score)) in enumerate(zip(got, expected)):
+        if abs(result["similarity_score"] - score) > tolerance:
+            failures.append(f"{engine}/{label}: rank {rank} score {result['similarity_score']:.6f} != {score:.6f}")
+            return
+    # Near-ties may swap places; require the same set and ordered scores
+    if set(got_keys) != set(expected_keys):
+        failures.append(f"{engine}/{label}: result set differs from reference")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    parser.add_argument("--engines", default=",".join(VECTOR_STORES))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    doc_ids, chunks = make_chunks(rng, args.chunks, args.documents, args.dims)
+    queries = [rng.standard_normal(args.dims).tolist() for _ in range(args.queries)]
+
+    database = MongoDB(database_name=f"vector_store_conformance_{uuid.uuid4().hex[:8]}")
+    failures = []
+    directories = []
+    try:
+        # Half the corpus exists before load(), the rest arrives through add()
+        initial, later = chunks[: len(chunks) // 2], chunks[len(chunks) // 2:]
+        database.insert_chunks(initial)
+        removed_doc = doc_ids[0]
+        remaining = [c for c in chunks if c["document_id"] != removed_doc]
+
+        for engine in args.engines.split(","):
+            store = create_vector_store(engine, database)
+            if hasattr(store, "directory"):
+                directories.append(store.directory)
+            if hasattr(store, "rescore_candidates"):
+                # Rescoring everything must give exact results; recall at
+                # realistic depths is measured by benchmarks.approximate_recall
+                store.rescore_candidates = args.chunks
+            store.load()
+            added = [dict(c) for c in later]
+            database.insert_chunks(added)
+            store.add(added)
+
+            for i, query in enumerate(queries):
+                compare(engine, f"query {i}", store.search(query, args.top_k),
+                        reference_search(chunks, query, args.top_k), args.tolerance, failures)
+
+            doc_filter = {"document_id": doc_ids[1]}
+            in_filter = {"document_id": {"$in": doc_ids[2:5]}}
+            for label, filters in (("eq filter", doc_filter), ("$in filter", in_filter)):
+                compare(engine, label, store.search(queries[0], args.top_k, filters=filters),
+                        reference_search(chunks, queries[0], args.top_k, filters), args.tolerance, failures)
+
+            print(f"{engine:>8}: {store.count()} vectors checked")
+
+            # Delete one document, check it is gone, then restore it for the next engine
+            removed = list(database.collection.find({"document_id": removed_doc}))
+            database.collection.delete_many({"document_id": removed_doc})
+            store.delete(removed_doc)
+            compare(engine, "after delete", store.search(queries[0], args.top_k),
+                    reference_search(remaining, queries[0], args.top_k), args.tolerance, failures)
+            database.collection.insert_many(removed)
+            database.collection.delete_many({"_id": {"$in": [c["_id"] for c in added]}})
+
+    finally:
+        database.client.drop_database(database.database_name)
+        database.close()
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if failures:
+        print(f"❌ {len(failures)} conformance failures:")
+        for failure in failures[:50]:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("✅ All engines agree with the reference")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+# backend/tests/conftest.py
+"""Tests run offline: in-memory MongoDB stand-in, fake embedder and fake LLM"""
+
+import os
+import sys
+
+# Must run before any app module reads settings
+os.environ.update(
+    MONGODB_URL="mongomock://",
+    DATABASE_NAME="test_document_search",
+    EMBEDDING_PROVIDER="fake",
+    LLM_PROVIDER="fake",
+    LOG_LEVEL="WARNING",
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,48 @@
+# backend/tests/test_dedup.py
+
+import uuid
+import pytest
+from app.database import MongoDB
+from app.dedup import NearDuplicateDetector
+
+TEXT = "the quick brown fox jumps over the lazy dog while the cat sleeps on the warm mat all day"
+
+@pytest.fixture
+def detector():
+    database = MongoDB(database_name=f"dedup_{uuid.uuid4().hex[:8]}")
+    yield NearDuplicateDetector(database, threshold=0.7, bands=20, rows=5, shingle_size=3)
+    database.client.drop_database(database.database_name)
+    database.close()
+
+def _store(detector, document_id, text):
+    chunk = {"document_id": document_id, "file_name": f"{document_id}.txt", "content": text}
+    detector.mark([chunk])
+    detector.database.insert_chunks([chunk])
+    return chunk
+
+def test_duplicate_links_to_stored_chunk(detector):
+    original = _store(detector, "a", TEXT)
+    copy = _store(detector, "b", TEXT + " today")
+    assert copy["duplicate_of"] == original["_id"]
+    assert "lsh_bands" not in copy
+
+def test_duplicate_of_a_chunk_deleted_mid_upload_is_restored(detector):
+    original = _store(detector, "a", TEXT)
+    # The upload links its chunk, then the canonical's document is deleted before the insert
+    copy = {"document_id": "b", "file_name": "b.txt", "content": TEXT}
+    detector.mark([copy])
+    assert detector.promote_duplicates("a") == []
+    detector.database.delete_document("a")
+    detector.database.insert_chunks([copy])
+
+    dangling = detector.dangling([original["_id"]])
+    assert [chunk["_id"] for chunk in dangling] == [copy["_id"]]
+    assert dangling[0]["content"] == TEXT
+    dangling[0]["embedding"] = [1.0, 0.0]
+    assert detector.restore(dangling) == 1
+
+    stored = detector.database.collection.find_one({"_id": copy["_id"]})
+    assert "duplicate_of" not in stored
+    assert stored["embedding"] == [1.0, 0.0]
+    assert stored["lsh_bands"] and stored["promoted_at"]
+    assert detector.dangling([original["_id"]]) == []
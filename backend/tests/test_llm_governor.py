@@ -0,0 +1,143 @@
+# backend/tests/test_llm_governor.py
+
+import threading
+import time
+import pytest
+from app.fake_llm import FakeGenerativeModel
+from app.llm_governor import CircuitBreaker, LLMGovernor, LLMUnavailableError
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # one trial at a time
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_open_breaker_rejects_calls():
+    governor = LLMGovernor(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    model = FakeGenerativeModel(error_rate=1.0)
+    with pytest.raises(RuntimeError):
+        governor.call(model.generate_content, "prompt")
+    with pytest.raises(LLMUnavailableError):
+        governor.call(model.generate_content, "prompt")
+    assert model.calls == 1
+    assert governor.stats()["breaker_state"] == CircuitBreaker.OPEN
+
+def test_call_returns_the_answer():
+    governor = LLMGovernor()
+    response = governor.call(FakeGenerativeModel(answer="hello").generate_content, "prompt")
+    assert response.text == "hello"
+    assert governor.stats()["successes"] == 1
+    assert governor.stats()["in_flight"] == 0
+
+def test_rejects_when_every_slot_is_taken():
+    governor = LLMGovernor(max_concurrency=1, queue_timeout=0.02)
+    slow = FakeGenerativeModel(latency_ms=300)
+    worker = threading.Thread(target=governor.call, args=(slow.generate_content, "prompt"))
+    worker.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(LLMUnavailableError):
+            governor.call(FakeGenerativeModel().generate_content, "prompt")
+        assert governor.stats()["rejected"] == 1
+    finally:
+        worker.join()
+    assert governor.stats()["in_flight"] == 0
+
+def test_deadline_gives_up_on_a_slow_provider():
+    governor = LLMGovernor(timeout=0.05)
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailableError):
+        governor.call(FakeGenerativeModel(latency_ms=300).generate_content, "prompt")
+    assert time.monotonic() - started < 0.25
+    stats = governor.stats()
+    assert stats["timeouts"] == 1
+    assert stats["consecutive_failures"] == 1
+
+def test_hedged_call_wins_over_a_slow_first_attempt():
+    governor = LLMGovernor(max_concurrency=2, timeout=2.0, hedge_delay=0.05)
+    models = iter([FakeGenerativeModel(answer="slow", latency_ms=500), FakeGenerativeModel(answer="fast")])
+    lock = threading.Lock()
+
+    def generate(prompt):
+        with lock:
+            model = next(models)
+        return model.generate_content(prompt)
+
+    started = time.monotonic()
+    assert governor.call(generate, "prompt").text == "fast"
+    assert time.monotonic() - started < 0.4
+    stats = governor.stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+def test_stalled_stream_is_abandoned_at_the_deadline():
+    governor = LLMGovernor(max_concurrency=1)
+    model = FakeGenerativeModel(answer="one two three", token_delay_ms=1000)
+    started = time.monotonic()
+    tokens = []
+    with pytest.raises(LLMUnavailableError):
+        with governor.stream_slot(timeout=0.1) as slot:
+            stream = governor.read(model.generate_content, "prompt", stream=True, deadline=slot.deadline)
+            for chunk in governor.iterate(stream, slot.deadline):
+                tokens.append(chunk.text)
+    model.last_stream.cancel()
+    assert tokens == []
+    assert time.monotonic() - started < 0.5
+    assert governor.stats()["in_flight"] == 0
+
+def test_stalled_answer_stream_falls_back_and_frees_its_slot():
+    from app.rag_service import RAGService
+    rag = RAGService()
+    rag._model = FakeGenerativeModel(answer="never arrives", token_delay_ms=1000)
+    results = [{"file_name": "a.txt", "content": "alpha beta", "similarity_score": 0.9}]
+    usage = {}
+    started = time.monotonic()
+    events = list(rag.stream_answer("alpha?", results, usage=usage, timeout=0.1))
+    assert [kind for kind, _ in events] == ["fallback"]
+    assert usage["degraded"]
+    assert time.monotonic() - started < 0.5
+    assert rag.governor.stats()["in_flight"] == 0
+    assert rag.governor.stats()["timeouts"] == 1
+
+def test_cancelled_answer_stream_is_recorded_as_cancelled():
+    from app.metrics import llm_call_seconds
+    from app.rag_service import RAGService
+
+    def outcomes():
+        return {key[1]: series[2] for key, series in llm_call_seconds._series.items() if key[0] == "stream"}
+
+    rag = RAGService()
+    rag._model = FakeGenerativeModel(answer="one two three four")
+    results = [{"file_name": "a.txt", "content": "alpha beta", "similarity_score": 0.9}]
+    cancel_event = threading.Event()
+    before = outcomes()
+    events = []
+    for event in rag.stream_answer("alpha?", results, cancel_event=cancel_event):
+        events.append(event)
+        cancel_event.set()
+    after = outcomes()
+    assert [kind for kind, _ in events] == ["token"]
+    assert after.get("cancelled", 0) == before.get("cancelled", 0) + 1
+    assert after.get("completed", 0) == before.get("completed", 0)
+    assert rag.governor.stats()["in_flight"] == 0
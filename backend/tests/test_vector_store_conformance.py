@@ -0,0 +1,104 @@
+# backend/tests/test_vector_store_conformance.py
+"""Every vector store engine against an exact float64 reference (see benchmarks.vector_store_conformance)"""
+
+import shutil
+import uuid
+
+import numpy as np
+import pytest
+
+from app.database import MongoDB
+from app.vector_store import VECTOR_STORES, create_vector_store
+from benchmarks.vector_store_conformance import compare, make_chunks, reference_search
+
+CHUNKS = 400
+DOCUMENTS = 20
+DIMS = 64
+TOP_K = 10
+TOLERANCE = 1e-4
+
+@pytest.fixture
+def database():
+    database = MongoDB(database_name=f"vector_store_conformance_{uuid.uuid4().hex[:8]}")
+    yield database
+    database.client.drop_database(database.database_name)
+    database.close()
+
+@pytest.fixture
+def make_store(database):
+    directories = []
+
+    def make(engine):
+        store = create_vector_store(engine, database)
+        if hasattr(store, "directory"):
+            directories.append(store.directory)
+        if hasattr(store, "rescore_candidates"):
+            # Rescoring everything must give exact results; recall at
+            # realistic depths is measured by benchmarks.approximate_recall
+            store.rescore_candidates = CHUNKS
+        return store
+
+    yield make
+    for directory in directories:
+        shutil.rmtree(directory, ignore_errors=True)
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(7)
+    doc_ids, chunks = make_chunks(rng, CHUNKS, DOCUMENTS, DIMS)
+    queries = [rng.standard_normal(DIMS).tolist() for _ in range(10)]
+    return doc_ids, chunks, queries
+
+@pytest.mark.parametrize("engine", list(VECTOR_STORES))
+def test_engine_matches_reference(engine, database, make_store, corpus):
+    doc_ids, chunks, queries = corpus
+    failures = []
+    # Half the corpus exists before load(), the rest arrives through add()
+    initial, later = chunks[: CHUNKS // 2], [dict(c) for c in chunks[CHUNKS // 2:]]
+    database.insert_chunks(initial)
+    store = make_store(engine)
+    store.load()
+    database.insert_chunks(later)
+    store.add(later)
+    assert store.count() == CHUNKS
+
+    for i, query in enumerate(queries):
+        compare(engine, f"query {i}", store.search(query, TOP_K),
+                reference_search(chunks, query, TOP_K), TOLERANCE, failures)
+
+    doc_filter = {"document_id": doc_ids[1]}
+    in_filter = {"document_id": {"$in": doc_ids[2:5]}}
+    for label, filters in (("eq filter", doc_filter), ("$in filter", in_filter)):
+        compare(engine, label, store.search(queries[0], TOP_K, filters=filters),
+                reference_search(chunks, queries[0], TOP_K, filters), TOLERANCE, failures)
+
+    removed_doc = doc_ids[0]
+    database.collection.delete_many({"document_id": removed_doc})
+    store.delete(removed_doc)
+    remaining = [c for c in chunks if c["document_id"] != removed_doc]
+    compare(engine, "after delete", store.search(queries[0], TOP_K),
+            reference_search(remaining, queries[0], TOP_K), TOLERANCE, failures)
+
+    assert not failures
+
+# Engines whose workers each hold their own index
+@pytest.mark.parametrize("engine", ["numpy", "int8", "pca", "sharded"])
+def test_sync_picks_up_other_workers_writes(engine, database, make_store, corpus):
+    doc_ids, chunks, queries = corpus
+    worker, other = make_store(engine), make_store(engine)
+    assert other.private_index
+    worker.load()
+    other.load()
+
+    database.insert_chunks(chunks)
+    for document_id in doc_ids:
+        database.documents.insert_one({"_id": document_id})
+    worker.add(chunks)
+    assert other.count() == 0
+    assert other.sync() == {"added": CHUNKS, "removed": 0}
+    assert other.search(queries[0], TOP_K) == worker.search(queries[0], TOP_K)
+
+    database.delete_document(doc_ids[0])
+    worker.delete(doc_ids[0])
+    assert other.sync()["removed"] == CHUNKS // DOCUMENTS
+    assert other.count() == worker.count()